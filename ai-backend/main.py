@@ -8,20 +8,48 @@ AI 动作分析后端 - FastAPI 主应用
 - 异步任务处理
 """
 
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import os
 from dotenv import load_dotenv
 from routers import analyze
+from routers.analyze import register_job_handlers
+from services.process_executor import get_analysis_executor
+from services.landmark_cache import get_landmark_cache
+from services.job_scheduler import get_job_scheduler
+from services.task_dedup import get_task_deduplicator
+from services.task_progress import get_task_progress
 
 # 加载环境变量
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期: 启动时拉起分析工作进程（连接进度通道）、预热 Pose 实例池，
+    并启动任务调度器（恢复上次未完成的任务），关闭时释放
+    """
+    executor = get_analysis_executor()
+    scheduler = get_job_scheduler()
+    progress = get_task_progress()
+    register_job_handlers(scheduler)
+    progress.bind(asyncio.get_running_loop())
+    executor.progress_handler = progress.report_frames
+    await asyncio.to_thread(executor.start)
+    await scheduler.start()
+    yield
+    await scheduler.shutdown()
+    executor.shutdown()
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="MoveChecker AI Backend",
     description="AI-powered movement analysis for fitness exercises",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置 CORS（允许前端访问）
@@ -53,12 +81,16 @@ async def health_check():
         "services": {
             "api": "running",
             "mediapipe": "ready",
+            "executor": get_analysis_executor().stats(),
+            "scheduler": get_job_scheduler().stats(),
+            "dedup": get_task_deduplicator().stats(),
+            "progress": get_task_progress().stats(),
+            "landmark_cache": get_landmark_cache().stats(),
             "database": "connected"
         }
     }
 
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(
         "main:app",
@@ -0,0 +1,363 @@
+"""
+姿态关键点序列（列式存储）
+
+功能:
+- 用 (T, 33, 4) float32 数组保存整段视频的关键点 (x, y, z, visibility)
+- 附带有效帧掩码、时间戳、原始帧号、检测置信度和产出模型复杂度向量
+- 仅在 API / 持久化边界转换为逐帧字典
+"""
+
+import numpy as np
+from typing import List, Dict, Optional, Any, BinaryIO, Tuple, Union
+
+# MediaPipe Pose 关键点数量
+NUM_LANDMARKS = 33
+
+# 最后一维的字段顺序
+LANDMARK_FIELDS = ("x", "y", "z", "visibility")
+X, Y, Z, VISIBILITY = range(4)
+
+
+class PoseSequence:
+    """姿态关键点序列"""
+
+    def __init__(
+        self,
+        landmarks: np.ndarray,
+        valid: np.ndarray,
+        timestamps: np.ndarray,
+        frame_indices: np.ndarray,
+        detection_confidence: np.ndarray,
+        fps: float = 0.0,
+        width: int = 0,
+        height: int = 0,
+        total_frames: int = 0,
+        stride: int = 1,
+        model_complexity: Optional[np.ndarray] = None
+    ):
+        """
+        Args:
+            landmarks: (T, 33, 4) float32，无效帧为 NaN
+            valid: (T,) bool，该帧是否检测到人体
+            timestamps: (T,) float64，秒
+            frame_indices: (T,) int32，原始视频帧号（单调递增）
+            detection_confidence: (T,) float32，无效帧为 0
+            fps: 原视频帧率
+            width, height: 原视频分辨率
+            total_frames: 原视频总帧数
+            stride: 采样步长（每 stride 个原始帧保留 1 帧）
+            model_complexity: (T,) int8，产出该帧结果的模型复杂度（-1 表示未知）
+        """
+        self.landmarks = landmarks
+        self.valid = valid
+        self.timestamps = timestamps
+        self.frame_indices = frame_indices
+        self.detection_confidence = detection_confidence
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.total_frames = total_frames
+        self.stride = stride
+        if model_complexity is None:
+            model_complexity = np.full(len(frame_indices), -1, dtype=np.int8)
+        self.model_complexity = model_complexity
+
+    def __len__(self) -> int:
+        return len(self.frame_indices)
+
+    def __repr__(self) -> str:
+        return (
+            f"PoseSequence(frames={len(self)}, valid={self.valid_count}, "
+            f"fps={self.fps}, stride={self.stride})"
+        )
+
+    @property
+    def sample_fps(self) -> float:
+        """序列的实际采样帧率"""
+        return self.fps / self.stride if self.stride > 0 else self.fps
+
+    @property
+    def valid_count(self) -> int:
+        """有效帧数"""
+        return int(np.count_nonzero(self.valid))
+
+    @property
+    def nbytes(self) -> int:
+        """数组占用的字节数"""
+        return (
+            self.landmarks.nbytes + self.valid.nbytes + self.timestamps.nbytes
+            + self.frame_indices.nbytes + self.detection_confidence.nbytes
+            + self.model_complexity.nbytes
+        )
+
+    def _subset(self, index) -> "PoseSequence":
+        """按位置索引（切片或掩码）取子序列，保留视频元数据"""
+        return PoseSequence(
+            landmarks=self.landmarks[index],
+            valid=self.valid[index],
+            timestamps=self.timestamps[index],
+            frame_indices=self.frame_indices[index],
+            detection_confidence=self.detection_confidence[index],
+            fps=self.fps,
+            width=self.width,
+            height=self.height,
+            total_frames=self.total_frames,
+            stride=self.stride,
+            model_complexity=self.model_complexity[index]
+        )
+
+    def frame_range(self, start_frame: int, end_frame: int) -> slice:
+        """原始帧号区间（两端均包含）对应的位置切片"""
+        start = int(np.searchsorted(self.frame_indices, start_frame, side="left"))
+        end = int(np.searchsorted(self.frame_indices, end_frame, side="right"))
+        return slice(start, end)
+
+    def slice_frames(self, start_frame: int, end_frame: int) -> "PoseSequence":
+        """
+        按原始帧号截取子序列（两端均包含）
+
+        返回的是原数组的视图，不复制关键点数据
+        """
+        return self._subset(self.frame_range(start_frame, end_frame))
+
+    def only_valid(self) -> "PoseSequence":
+        """仅保留检测到人体的帧"""
+        return self._subset(self.valid)
+
+    def pad_slices(self, bounds: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按原始帧号截取多段子序列并补齐到相同长度（两端均包含，一次索引完成）
+
+        Args:
+            bounds: [(start_frame, end_frame), ...]
+
+        Returns:
+            (landmarks (n, T, 33, 4), valid (n, T))，T 为最长一段的帧数，补齐部分 valid 为 False
+        """
+        bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+        starts = np.searchsorted(self.frame_indices, bounds[:, 0], side="left")
+        ends = np.searchsorted(self.frame_indices, bounds[:, 1], side="right")
+        lengths = ends - starts
+        steps = np.arange(max(1, int(lengths.max(initial=0))))
+
+        inside = steps[None, :] < lengths[:, None]
+        if len(self) == 0:
+            return np.zeros(inside.shape + (NUM_LANDMARKS, 4), dtype=np.float32), inside
+        index = np.minimum(starts[:, None] + steps[None, :], len(self) - 1)
+        return self.landmarks[index], self.valid[index] & inside
+
+    @classmethod
+    def concatenate(cls, parts: List["PoseSequence"]) -> "PoseSequence":
+        """
+        按顺序拼接同一视频的多个分段（帧号需互不重叠且递增）
+
+        视频元数据取第一个分段
+        """
+        if not parts:
+            raise ValueError("没有可拼接的分段")
+        first = parts[0]
+        return cls(
+            landmarks=np.concatenate([p.landmarks for p in parts]),
+            valid=np.concatenate([p.valid for p in parts]),
+            timestamps=np.concatenate([p.timestamps for p in parts]),
+            frame_indices=np.concatenate([p.frame_indices for p in parts]),
+            detection_confidence=np.concatenate([p.detection_confidence for p in parts]),
+            fps=first.fps,
+            width=first.width,
+            height=first.height,
+            total_frames=first.total_frames,
+            stride=first.stride,
+            model_complexity=np.concatenate([p.model_complexity for p in parts])
+        )
+
+    def position_of_frame(self, frame_index: int) -> int:
+        """原始帧号对应的数组下标（不存在时返回 -1）"""
+        pos = int(np.searchsorted(self.frame_indices, frame_index))
+        if pos < len(self) and self.frame_indices[pos] == frame_index:
+            return pos
+        return -1
+
+    # ================================
+    # 二进制序列化
+    # ================================
+
+    def to_arrays(self, prefix: str = "") -> Dict[str, np.ndarray]:
+        """导出为命名数组字典（用于 np.savez）"""
+        return {
+            f"{prefix}landmarks": self.landmarks,
+            f"{prefix}valid": self.valid,
+            f"{prefix}timestamps": self.timestamps,
+            f"{prefix}frame_indices": self.frame_indices,
+            f"{prefix}detection_confidence": self.detection_confidence,
+            f"{prefix}model_complexity": self.model_complexity,
+            f"{prefix}meta": np.array(
+                [self.fps, self.width, self.height, self.total_frames, self.stride],
+                dtype=np.float64
+            )
+        }
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str = "") -> "PoseSequence":
+        """由 to_arrays() 导出的命名数组（或 np.load 结果）还原序列"""
+        fps, width, height, total_frames, stride = data[f"{prefix}meta"].tolist()
+        model_complexity_key = f"{prefix}model_complexity"
+        return cls(
+            landmarks=data[f"{prefix}landmarks"],
+            valid=data[f"{prefix}valid"],
+            timestamps=data[f"{prefix}timestamps"],
+            frame_indices=data[f"{prefix}frame_indices"],
+            detection_confidence=data[f"{prefix}detection_confidence"],
+            fps=fps,
+            width=int(width),
+            height=int(height),
+            total_frames=int(total_frames),
+            stride=int(stride),
+            model_complexity=(
+                data[model_complexity_key] if model_complexity_key in data else None
+            )
+        )
+
+    def save(self, file: Union[str, BinaryIO]):
+        """以 .npz（未压缩）格式写入文件路径或二进制文件对象"""
+        np.savez(file, **self.to_arrays())
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> "PoseSequence":
+        """读取 save() 写入的序列"""
+        with np.load(file) as data:
+            return cls.from_arrays(data)
+
+    # ================================
+    # API / 持久化边界
+    # ================================
+
+    def to_frames(self) -> List[Dict[str, Any]]:
+        """
+        转换为逐帧字典列表（与 FrameLandmarks 模型一致）
+
+        仅用于 API 响应和数据库持久化
+        """
+        frames = []
+        landmarks = self.landmarks.tolist()
+        for i in range(len(self)):
+            frame_landmarks = None
+            if self.valid[i]:
+                frame_landmarks = [
+                    dict(zip(LANDMARK_FIELDS, point)) for point in landmarks[i]
+                ]
+            frames.append({
+                "frame_index": int(self.frame_indices[i]),
+                "timestamp": round(float(self.timestamps[i]), 3),
+                "landmarks": frame_landmarks,
+                "detection_confidence": round(float(self.detection_confidence[i]), 3)
+            })
+        return frames
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: List[Dict[str, Any]],
+        fps: float = 0.0,
+        width: int = 0,
+        height: int = 0,
+        total_frames: int = 0,
+        stride: int = 1
+    ) -> "PoseSequence":
+        """由逐帧字典列表构建序列（to_frames 的逆操作）"""
+        builder = PoseSequenceBuilder(capacity=max(len(frames), 1))
+        for frame in frames:
+            points = None
+            if frame.get("landmarks") is not None:
+                points = np.array(
+                    [[lm[field] for field in LANDMARK_FIELDS] for lm in frame["landmarks"]],
+                    dtype=np.float32
+                )
+            builder.append(frame["frame_index"], frame["timestamp"], points)
+        return builder.build(
+            fps=fps, width=width, height=height, total_frames=total_frames,
+            stride=stride
+        )
+
+
+class PoseSequenceBuilder:
+    """逐帧追加并构建 PoseSequence（容量按倍数增长，避免逐帧分配）"""
+
+    def __init__(self, capacity: int = 256):
+        capacity = max(int(capacity), 1)
+        self._size = 0
+        self._landmarks = np.full((capacity, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._frame_indices = np.zeros(capacity, dtype=np.int32)
+        self._confidence = np.zeros(capacity, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        capacity = len(self._valid) * 2
+        landmarks = np.full((capacity, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        landmarks[:self._size] = self._landmarks[:self._size]
+        self._landmarks = landmarks
+        for name in ("_valid", "_timestamps", "_frame_indices", "_confidence"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(
+        self,
+        frame_index: int,
+        timestamp: float,
+        landmarks: Optional[np.ndarray] = None
+    ):
+        """
+        追加一帧
+
+        Args:
+            frame_index: 原始视频帧号
+            timestamp: 时间戳（秒）
+            landmarks: (33, 4) 关键点数组，None 表示未检测到人体
+        """
+        if self._size == len(self._valid):
+            self._grow()
+
+        i = self._size
+        self._frame_indices[i] = frame_index
+        self._timestamps[i] = timestamp
+        if landmarks is not None:
+            self._landmarks[i] = landmarks
+            self._valid[i] = True
+            # 检测置信度 = 关键点平均可见度
+            self._confidence[i] = landmarks[:, VISIBILITY].mean()
+        self._size += 1
+
+    def build(
+        self,
+        fps: float = 0.0,
+        width: int = 0,
+        height: int = 0,
+        total_frames: int = 0,
+        stride: int = 1,
+        model_complexity: int = -1
+    ) -> PoseSequence:
+        """
+        裁剪到实际长度并生成序列
+
+        Args:
+            model_complexity: 产出全部帧的模型复杂度（-1 表示未知）
+        """
+        n = self._size
+        return PoseSequence(
+            landmarks=self._landmarks[:n].copy(),
+            valid=self._valid[:n].copy(),
+            timestamps=self._timestamps[:n].copy(),
+            frame_indices=self._frame_indices[:n].copy(),
+            detection_confidence=self._confidence[:n].copy(),
+            fps=fps,
+            width=width,
+            height=height,
+            total_frames=total_frames,
+            stride=stride,
+            model_complexity=np.full(n, model_complexity, dtype=np.int8)
+        )
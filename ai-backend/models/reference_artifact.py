@@ -0,0 +1,88 @@
+"""
+参考视频预处理产物
+
+功能:
+- 保存参考视频的关键点序列、动作周期切分结果和逐帧特征
+- 序列化为单个 .npz 二进制文件，存放在 Storage 中参考视频旁边
+- 记录提取参数和格式版本，参数变化后产物自动失效
+"""
+
+import io
+import json
+import numpy as np
+from typing import Any, Dict, List
+
+from models.pose_sequence import PoseSequence
+
+# 产物格式版本（格式或特征定义变化时递增）
+ARTIFACT_VERSION = 1
+
+_FEATURE_PREFIX = "feature_"
+_SEQUENCE_PREFIX = "sequence_"
+
+
+class ReferenceArtifact:
+    """参考视频预处理产物"""
+
+    def __init__(
+        self,
+        sequence: PoseSequence,
+        cycles: List[Dict[str, int]],
+        features: Dict[str, np.ndarray],
+        params: Dict[str, Any],
+        version: int = ARTIFACT_VERSION
+    ):
+        """
+        Args:
+            sequence: 关键点序列
+            cycles: segment_squat_cycles 的输出
+            features: compute_frame_features 的输出（与 sequence 逐帧对齐）
+            params: 提取参数（MediaPipeService.extraction_params）
+            version: 产物格式版本
+        """
+        self.sequence = sequence
+        self.cycles = cycles
+        self.features = features
+        self.params = params
+        self.version = version
+
+    def is_compatible(self, params: Dict[str, Any]) -> bool:
+        """产物是否可用于当前的提取参数和格式版本"""
+        return self.version == ARTIFACT_VERSION and self.params == params
+
+    def to_bytes(self) -> bytes:
+        """序列化为 .npz 字节串"""
+        cycles = np.array(
+            [[c["start_frame"], c["bottom_frame"], c["end_frame"]] for c in self.cycles],
+            dtype=np.int64
+        ).reshape(-1, 3)
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            **self.sequence.to_arrays(prefix=_SEQUENCE_PREFIX),
+            **{_FEATURE_PREFIX + name: values for name, values in self.features.items()},
+            cycles=cycles,
+            params=np.array(json.dumps(self.params, sort_keys=True)),
+            version=np.array(self.version)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ReferenceArtifact":
+        """由 to_bytes() 的输出还原"""
+        with np.load(io.BytesIO(data)) as arrays:
+            features = {
+                name[len(_FEATURE_PREFIX):]: arrays[name]
+                for name in arrays.files if name.startswith(_FEATURE_PREFIX)
+            }
+            cycles = [
+                {"start_frame": int(s), "bottom_frame": int(b), "end_frame": int(e)}
+                for s, b, e in arrays["cycles"].tolist()
+            ]
+            return cls(
+                sequence=PoseSequence.from_arrays(arrays, prefix=_SEQUENCE_PREFIX),
+                cycles=cycles,
+                features=features,
+                params=json.loads(str(arrays["params"])),
+                version=int(arrays["version"])
+            )
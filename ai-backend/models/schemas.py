@@ -39,7 +39,17 @@ class AnalysisRequest(BaseModel):
     user_id: str = Field(..., description="用户 ID (UUID)")
     reference_video_id: str = Field(..., description="参考视频 ID")
     user_video_id: str = Field(..., description="用户视频 ID")
-    exercise_type_id: int = Field(..., description="动作类型 ID (1=深蹲)")
+    exercise_type_id: int = Field(..., description="动作类型 ID (1=深蹲, 2=弓步蹲, 3=硬拉)")
+    idempotency_key: Optional[str] = Field(
+        None, max_length=128, description="幂等键（同一用户重复提交相同的键时返回已创建的任务）"
+    )
+
+class BatchAnalysisRequest(BaseModel):
+    """批量分析请求（一个参考视频对多个用户视频）"""
+    user_id: str = Field(..., description="用户 ID (UUID)")
+    reference_video_id: str = Field(..., description="参考视频 ID")
+    user_video_ids: List[str] = Field(..., min_length=1, description="用户视频 ID 列表")
+    exercise_type_id: int = Field(..., description="动作类型 ID (1=深蹲, 2=弓步蹲, 3=硬拉)")
 
 class AnalysisTaskQuery(BaseModel):
     """任务查询"""
@@ -71,12 +81,56 @@ class ComparisonDimension(BaseModel):
     message: str
     suggestion: str
 
+class RepResult(BaseModel):
+    """单次深蹲的分析结果"""
+    rep: int
+    start_frame: int
+    bottom_frame: int
+    end_frame: int
+    depth: ComparisonDimension
+    knee_tracking: ComparisonDimension
+    torso_lean: ComparisonDimension
+    balance: ComparisonDimension
+    score: int
+
+class FatigueTrend(BaseModel):
+    """疲劳趋势"""
+    score_slope: float
+    depth_slope: float
+    status: str
+
+class RepSummary(BaseModel):
+    """多次深蹲汇总"""
+    rep_count: int
+    best_rep: int
+    worst_rep: int
+    fatigue_trend: FatigueTrend
+
+class PhaseDeviation(BaseModel):
+    """轨迹对比中单个动作阶段的偏差"""
+    phase: str
+    reference_frames: int
+    user_frames: int
+    tempo_ratio: float
+    deviations: Dict[str, float]
+    statuses: Dict[str, ComparisonStatus]
+    pass_rate: Dict[str, float]
+
+class TrajectoryComparison(BaseModel):
+    """时间对齐后的全程轨迹对比"""
+    alignment_cost: float
+    tempo_ratio: float
+    phases: List[PhaseDeviation]
+
 class AnalysisResult(BaseModel):
-    """完整分析结果"""
+    """完整分析结果（顶层维度为第一次深蹲的结果）"""
     depth: ComparisonDimension
     knee_tracking: ComparisonDimension
     torso_lean: ComparisonDimension
     balance: ComparisonDimension
+    reps: Optional[List[RepResult]] = None
+    summary: Optional[RepSummary] = None
+    trajectory: Optional[TrajectoryComparison] = None
 
 class TaskStatusResponse(BaseModel):
     """任务状态响应"""
@@ -105,6 +159,25 @@ class AnalysisTaskResponse(BaseModel):
     status: TaskStatus
     message: str
 
+class BatchSubmission(BaseModel):
+    """批量分析中的单个提交（对应一个独立的分析任务）"""
+    user_video_id: str
+    task_id: str
+    status: TaskStatus
+
+class BatchAnalysisResponse(BaseModel):
+    """批量分析响应"""
+    reference_video_id: str
+    submissions: List[BatchSubmission]
+    message: str
+
+class ReferencePreparationResponse(BaseModel):
+    """参考视频预处理响应"""
+    video_id: str
+    status: TaskStatus
+    features_path: Optional[str] = None
+    message: str
+
 # ================================
 # 数据库模型
 # ================================
@@ -120,6 +193,8 @@ class VideoUploadDB(BaseModel):
     duration_seconds: Optional[float] = None
     width: Optional[int] = None
     height: Optional[int] = None
+    features_path: Optional[str] = None
+    features_prepared_at: Optional[datetime] = None
     uploaded_at: datetime
     created_at: datetime
 
@@ -3,21 +3,47 @@
 对应任务: T2.6 - 实现 FastAPI 路由
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from models.schemas import (
     AnalysisRequest,
     AnalysisTaskResponse,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
+    BatchSubmission,
     TaskStatusResponse,
     AnalysisResultResponse,
-    TaskStatus
+    ReferencePreparationResponse,
+    TaskStatus,
+    VideoType
 )
 from services.supabase_service import get_supabase_service
+from services.process_executor import get_analysis_executor
+from services.job_scheduler import JobScheduler, SchedulerSaturated, get_job_scheduler
+from services.task_dedup import TaskDeduplicator, get_task_deduplicator
+from services.task_progress import ProgressKey, STAGES, TERMINAL_STAGES, get_task_progress
+from services.analysis_pipeline import (
+    extract_chunk,
+    extract_video_stream,
+    analyze_batch,
+    analyze_sequences,
+    get_max_cycles,
+    plan_chunks,
+    prepare_reference_artifact,
+    probe_video,
+    stitch_chunks
+)
+from services.exercise_registry import SQUAT, get_exercise
+from services.landmark_cache import get_landmark_cache, storage_content_id
 from services.mediapipe_service import get_mediapipe_service
-from services.squat_segmentation import get_segmentation_service
-from services.squat_analyzer import get_squat_analyzer
+from models.pose_sequence import PoseSequence
+from models.reference_artifact import ReferenceArtifact
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
 import logging
-import tempfile
 import os
+import numpy as np
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["analysis"])
@@ -26,134 +52,577 @@ router = APIRouter(prefix="/api", tags=["analysis"])
 # 后台任务处理函数 (T2.7 异步任务)
 # ================================
 
+async def load_pose_sequence(
+    video: Dict,
+    max_cycles: Optional[int] = None,
+    exercise_type_id: int = SQUAT.exercise_type_id,
+    progress_key: Optional[ProgressKey] = None
+) -> PoseSequence:
+    """
+    获取视频的关键点序列
+    
+    1. Storage 路径已知内容哈希且缓存命中 → 直接返回，不下载
+    2. Storage 对象有强 ETag 时以 ETag 作为内容标识查询缓存（相同内容不同路径也能命中）
+    3. 否则在工作进程中边下载边提取（内存缓冲区，不写临时文件），
+       没有 ETag 时同时计算内容哈希；记录路径映射并写入缓存
+       （长视频、未限制周期数且有 ETag 时分段并行提取，见 extract_video_chunked）
+    
+    max_cycles 不为 None 时按 exercise_type_id 的切分信号凑够周期即停止提取，
+    截断的序列按周期数和动作类型单独缓存；
+    progress_key 不为 None 时工作进程上报解码进度（见 TaskProgress.report_frames）
+    """
+    supabase = get_supabase_service()
+    executor = get_analysis_executor()
+    cache = get_landmark_cache()
+    params = get_mediapipe_service().extraction_params()
+    if max_cycles:
+        params = {**params, "max_cycles": max_cycles, "exercise_type_id": exercise_type_id}
+    file_path = video["file_path"]
+    
+    content_hash = await asyncio.to_thread(cache.resolve_alias, file_path)
+    if content_hash:
+        sequence = await asyncio.to_thread(cache.get, cache.make_key(content_hash, params))
+        if sequence is not None:
+            logger.info(f"关键点缓存命中: {file_path}")
+            return sequence
+    
+    url = await supabase.create_video_url(file_path)
+    if not url:
+        raise Exception("视频下载失败")
+    
+    content_hash = await asyncio.to_thread(storage_content_id, url)
+    if content_hash:
+        sequence = await asyncio.to_thread(cache.get, cache.make_key(content_hash, params))
+        if sequence is not None:
+            logger.info(f"关键点缓存命中 (ETag): {file_path}")
+            await asyncio.to_thread(cache.record_alias, file_path, content_hash)
+            return sequence
+    
+    sequence = None
+    if max_cycles is None and content_hash:
+        # 分段的工作进程各自 seek 读取，内容标识来自 ETag，不再整段下载计算哈希
+        sequence = await extract_video_chunked(url, progress_key)
+    if sequence is None:
+        sequence, stream_hash = await executor.run(
+            extract_video_stream, url, max_cycles, progress_key, exercise_type_id
+        )
+        content_hash = content_hash or stream_hash
+    await asyncio.to_thread(cache.record_alias, file_path, content_hash)
+    await asyncio.to_thread(cache.put, cache.make_key(content_hash, params), sequence)
+    
+    return sequence
+
+
+async def extract_video_chunked(
+    url: str,
+    progress_key: Optional[ProgressKey] = None
+) -> Optional[PoseSequence]:
+    """
+    分段并行提取长视频
+    
+    每段提交到不同的工作进程，各自直接读取签名 URL 并 seek 到分段起点；
+    每段的解码进度分别上报（不计算内容哈希，缓存标识由调用方通过 ETag 获得）
+    
+    Returns:
+        拼接后的序列；不满足分段条件时返回 None
+    """
+    executor = get_analysis_executor()
+    if executor.workers < 2:
+        return None
+    
+    video_info = await asyncio.to_thread(probe_video, url)
+    chunks = plan_chunks(video_info, executor.workers)
+    if not chunks:
+        return None
+    
+    logger.info(f"分段并行提取: {len(chunks)} 段 {chunks}")
+    chunk_keys = [
+        (progress_key[0], f"{progress_key[1]}#{i}") if progress_key else None
+        for i in range(len(chunks))
+    ]
+    parts = await asyncio.gather(*[
+        executor.run(extract_chunk, url, *chunk, key)
+        for chunk, key in zip(chunks, chunk_keys)
+    ])
+    return stitch_chunks(parts)
+
+
+def reference_features_path(file_path: str) -> str:
+    """参考视频预处理产物的 Storage 路径（与视频文件放在一起）"""
+    return f"{file_path}.features.npz"
+
+
+def reference_artifact_params(exercise_type_id: int) -> Dict:
+    """预处理产物的参数（提取参数 + 动作类型，任一变化时产物失效）"""
+    return {
+        **get_mediapipe_service().extraction_params(),
+        "exercise_type_id": exercise_type_id
+    }
+
+
+async def load_reference_sequence(
+    video: Dict,
+    max_cycles: Optional[int] = None,
+    exercise_type_id: int = SQUAT.exercise_type_id,
+    progress_key: Optional[ProgressKey] = None
+) -> Tuple[PoseSequence, Optional[List[Dict[str, int]]], Optional[Dict[str, np.ndarray]]]:
+    """
+    获取参考视频的关键点序列、动作周期和逐帧特征
+    
+    优先使用预处理产物（无需下载视频、推理、切分和计算参考侧特征）；
+    未预处理、产物已过期或动作类型不同时退回 load_pose_sequence，
+    周期和特征为 None（现场切分和计算）
+    """
+    features_path = video.get("features_path")
+    if features_path:
+        supabase = get_supabase_service()
+        data = await supabase.download_artifact(features_path)
+        if data is not None:
+            artifact = await asyncio.to_thread(ReferenceArtifact.from_bytes, data)
+            if artifact.is_compatible(reference_artifact_params(exercise_type_id)):
+                logger.info(f"使用参考视频预处理产物: {features_path}")
+                return artifact.sequence, artifact.cycles, artifact.features
+            logger.warning(f"参考视频预处理产物已过期: {features_path}")
+    
+    return await load_pose_sequence(video, max_cycles, exercise_type_id, progress_key), None, None
+
+
+async def prepare_reference_task(video_id: str):
+    """
+    后台预处理参考视频
+    
+    流程: 获取关键点序列 → 周期切分 + 逐帧特征 (工作进程) → 上传产物 → 记录路径
+    失败时抛出异常，由调度器按退避重试
+    """
+    supabase = get_supabase_service()
+    executor = get_analysis_executor()
+    
+    video = await supabase.get_video_metadata(video_id)
+    if not video:
+        raise Exception("视频元数据不存在")
+    
+    exercise_type_id = video.get("exercise_type_id") or SQUAT.exercise_type_id
+    sequence = await load_pose_sequence(video)
+    data = await executor.run(
+        prepare_reference_artifact,
+        sequence,
+        reference_artifact_params(exercise_type_id),
+        exercise_type_id
+    )
+    
+    features_path = reference_features_path(video["file_path"])
+    if not await supabase.upload_artifact(features_path, data):
+        raise Exception("预处理产物上传失败")
+    await supabase.update_reference_features(video_id, features_path)
+    
+    logger.info(f"参考视频 {video_id} 预处理完成")
+
+
+async def on_prepare_failure(payload: Dict, error: str, final: bool):
+    """参考视频预处理失败（预处理没有状态记录，只记录日志）"""
+    if final:
+        logger.error(f"参考视频 {payload['video_id']} 预处理失败: {error}")
+
+
 async def process_analysis_task(task_id: str):
     """
     后台处理分析任务
     
+    API 进程只负责编排和 I/O，CPU 密集的流水线在执行引擎的工作进程中运行
+    失败时抛出异常，由调度器按退避重试；状态由 on_analysis_failure 更新
+    各阶段和解码进度推送到 TaskProgress（/api/tasks/{task_id}/events）
+    
     流程:
-    1. 更新任务状态为 processing
-    2. 下载视频文件
-    3. 提取姿态关键点 (MediaPipe)
-    4. 切分动作周期
-    5. 对比分析
-    6. 保存结果
-    7. 更新任务状态为 completed
+    1. 获取任务信息 (已完成的任务直接跳过，重启恢复时不会重复处理)
+    2. 更新任务状态为 processing
+    3. 并行下载参考视频与用户视频 (参考视频已预处理 / 关键点缓存命中时跳过)
+    4. 边下载边提取两个视频的姿态关键点 ┐
+    5. 切分动作周期                    │ 工作进程
+    6. 对比分析                        ┘
+    7. 保存结果
+    8. 更新任务状态为 completed
     """
     supabase = get_supabase_service()
-    mediapipe = get_mediapipe_service()
-    segmentation = get_segmentation_service()
-    analyzer = get_squat_analyzer()
+    executor = get_analysis_executor()
+    progress = get_task_progress()
     
-    try:
-        # 1. 更新状态为 processing
-        await supabase.update_task_status(task_id, TaskStatus.PROCESSING)
-        logger.info(f"任务 {task_id} 开始处理")
-        
-        # 2. 获取任务信息
-        task = await supabase.get_analysis_task(task_id)
-        if not task:
-            raise Exception("任务不存在")
-        
-        # 3. 获取视频元数据
-        ref_video = await supabase.get_video_metadata(task["reference_video_id"])
-        user_video = await supabase.get_video_metadata(task["user_video_id"])
-        
-        if not ref_video or not user_video:
+    # 1. 获取任务信息
+    task = await supabase.get_analysis_task(task_id)
+    if not task:
+        raise Exception("任务不存在")
+    if task["status"] == TaskStatus.COMPLETED.value:
+        logger.info(f"任务 {task_id} 已完成，跳过")
+        progress.publish([task_id], "completed")
+        return
+    
+    # 2. 更新状态为 processing
+    await supabase.update_task_status(task_id, TaskStatus.PROCESSING)
+    progress.publish([task_id], "loading")
+    logger.info(f"任务 {task_id} 开始处理")
+    
+    # 3. 获取视频元数据
+    ref_video = await supabase.get_video_metadata(task["reference_video_id"])
+    user_video = await supabase.get_video_metadata(task["user_video_id"])
+    
+    if not ref_video or not user_video:
+        raise Exception("视频元数据不存在")
+    
+    # 4. 并行获取两个视频的关键点序列
+    #    (参考视频优先使用预处理产物；缓存命中时跳过下载和推理)
+    #    (凑够所需周期后提前停止提取)
+    max_cycles = get_max_cycles()
+    exercise_type_id = task.get("exercise_type_id") or SQUAT.exercise_type_id
+    (ref_sequence, ref_cycles, ref_features), user_sequence = await asyncio.gather(
+        load_reference_sequence(
+            ref_video, max_cycles, exercise_type_id, ((task_id,), "reference")
+        ),
+        load_pose_sequence(user_video, max_cycles, exercise_type_id, ((task_id,), "user"))
+    )
+    
+    logger.info("姿态识别完成")
+    
+    # 5. 动作切分 → 对比分析 → 评分 (工作进程，按动作类型的定义执行)
+    progress.publish([task_id], "analyzing")
+    pipeline_result = await executor.run(
+        analyze_sequences,
+        ref_sequence,
+        user_sequence,
+        ref_cycles,
+        exercise_type_id,
+        ref_features
+    )
+    
+    # 6. 保存结果
+    progress.publish([task_id], "saving")
+    await supabase.save_analysis_result(
+        task_id=task_id,
+        comparison_result=pipeline_result["comparison_result"],
+        skeleton_data=pipeline_result["skeleton_data"],
+        overall_score=pipeline_result["overall_score"],
+        overall_grade=pipeline_result["overall_grade"]
+    )
+    
+    # 7. 更新任务状态为 completed
+    await supabase.update_task_status(task_id, TaskStatus.COMPLETED)
+    progress.publish([task_id], "completed", overall_score=pipeline_result["overall_score"])
+    logger.info(f"任务 {task_id} 处理完成, 得分: {pipeline_result['overall_score']}")
+
+
+async def mark_task_failure(task_id: str, error: str, final: bool):
+    """
+    记录任务的一次失败
+    
+    最终失败时标记为 failed；还会重试时恢复为 pending（等待重新领取）
+    """
+    supabase = get_supabase_service()
+    progress = get_task_progress()
+    if final:
+        logger.error(f"任务 {task_id} 处理失败: {error}")
+        await supabase.update_task_status(task_id, TaskStatus.FAILED, error_message=error)
+        progress.publish([task_id], "failed", error_message=error)
+    else:
+        await supabase.update_task_status(task_id, TaskStatus.PENDING)
+        progress.publish([task_id], "queued", "处理失败，等待重试")
+
+
+async def on_analysis_failure(payload: Dict, error: str, final: bool):
+    """分析任务失败回调"""
+    await mark_task_failure(payload["task_id"], error, final)
+
+
+async def process_batch_task(
+    reference_video_id: str,
+    submissions: List[Tuple[str, str]],
+    exercise_type_id: int = SQUAT.exercise_type_id
+):
+    """
+    后台处理批量分析任务（一个参考视频对多个用户视频）
+    
+    每个提交仍是独立的分析任务，状态和结果按提交分别写入；
+    单个用户视频失败只影响对应任务，参考视频或批量评分失败时抛出异常，
+    由调度器重试尚未结束的提交
+    
+    流程:
+    1. 跳过已结束 (completed / failed) 的任务，其余状态更新为 processing
+    2. 参考视频只获取一次关键点序列 (优先使用预处理产物)
+    3. 并行获取所有用户视频的关键点序列
+    4. 切分 → 一次批量评分 (工作进程)
+    5. 逐个保存结果并更新状态
+    
+    Args:
+        reference_video_id: 参考视频 ID
+        submissions: [(task_id, user_video_id), ...]
+        exercise_type_id: 动作类型
+    """
+    supabase = get_supabase_service()
+    executor = get_analysis_executor()
+    progress = get_task_progress()
+    max_cycles = get_max_cycles()
+    
+    async def fail(task_id: str, error: str):
+        logger.error(f"任务 {task_id} 处理失败: {error}")
+        await supabase.update_task_status(task_id, TaskStatus.FAILED, error_message=error)
+        progress.publish([task_id], "failed", error_message=error)
+    
+    async def load_user_sequence(task_id: str, user_video_id: str) -> PoseSequence:
+        video = await supabase.get_video_metadata(user_video_id)
+        if not video:
             raise Exception("视频元数据不存在")
-        
-        # 4. 下载视频到临时目录
-        temp_dir = tempfile.mkdtemp()
-        ref_video_path = os.path.join(temp_dir, "reference.mp4")
-        user_video_path = os.path.join(temp_dir, "user.mp4")
-        
-        await supabase.download_video_from_storage(ref_video["file_path"], ref_video_path)
-        await supabase.download_video_from_storage(user_video["file_path"], user_video_path)
-        
-        logger.info("视频下载完成")
-        
-        # 5. 提取姿态关键点
-        ref_result = mediapipe.extract_pose_landmarks(ref_video_path)
-        user_result = mediapipe.extract_pose_landmarks(user_video_path)
-        
-        if not ref_result["success"] or not user_result["success"]:
-            raise Exception("姿态识别失败")
-        
-        logger.info("姿态识别完成")
-        
-        # 6. 切分动作周期 (仅处理第一个周期)
-        ref_cycles = segmentation.segment_squat_cycles(ref_result["frames"])
-        user_cycles = segmentation.segment_squat_cycles(user_result["frames"])
-        
-        if not ref_cycles or not user_cycles:
-            raise Exception("动作切分失败")
-        
-        # 取第一个周期
-        ref_cycle_frames = ref_result["frames"][
-            ref_cycles[0]["start_frame"]:ref_cycles[0]["end_frame"]+1
-        ]
-        user_cycle_frames = user_result["frames"][
-            user_cycles[0]["start_frame"]:user_cycles[0]["end_frame"]+1
-        ]
-        
-        logger.info("动作切分完成")
-        
-        # 7. 对比分析
-        comparison_result = analyzer.analyze_squat_comparison(
-            ref_cycle_frames,
-            user_cycle_frames
+        return await load_pose_sequence(
+            video, max_cycles, exercise_type_id, ((task_id,), "user")
         )
-        
-        logger.info("对比分析完成")
-        
-        # 8. 计算总体评分
-        status_scores = {"pass": 100, "warn": 60, "fail": 30}
-        scores = [
-            status_scores[comparison_result["depth"]["status"]],
-            status_scores[comparison_result["knee_tracking"]["status"]],
-            status_scores[comparison_result["torso_lean"]["status"]],
-            status_scores[comparison_result["balance"]["status"]]
-        ]
-        overall_score = int(sum(scores) / len(scores))
-        
-        if overall_score >= 85:
-            overall_grade = "excellent"
-        elif overall_score >= 70:
-            overall_grade = "good"
-        elif overall_score >= 50:
-            overall_grade = "needs_improvement"
+    
+    # 1. 跳过已结束的任务（重试或重启恢复时）
+    submissions = await unfinished_submissions(submissions)
+    if not submissions:
+        logger.info(f"批量任务已全部结束，跳过: 参考视频 {reference_video_id}")
+        return
+    await asyncio.gather(*[
+        supabase.update_task_status(task_id, TaskStatus.PROCESSING)
+        for task_id, _ in submissions
+    ])
+    task_ids = tuple(task_id for task_id, _ in submissions)
+    progress.publish(task_ids, "loading")
+    logger.info(f"批量任务开始处理: 参考视频 {reference_video_id}, {len(submissions)} 个提交")
+    
+    ref_video = await supabase.get_video_metadata(reference_video_id)
+    if not ref_video:
+        raise Exception("视频元数据不存在")
+    
+    # 2-3. 参考视频与所有用户视频并行获取关键点序列
+    #      (参考视频的解码进度计入每个提交)
+    (ref_sequence, ref_cycles, ref_features), loaded = await asyncio.gather(
+        load_reference_sequence(
+            ref_video, max_cycles, exercise_type_id, (task_ids, "reference")
+        ),
+        asyncio.gather(
+            *[
+                load_user_sequence(task_id, user_video_id)
+                for task_id, user_video_id in submissions
+            ],
+            return_exceptions=True
+        )
+    )
+    
+    ready = []
+    for (task_id, _), sequence in zip(submissions, loaded):
+        if isinstance(sequence, BaseException):
+            await fail(task_id, str(sequence))
         else:
-            overall_grade = "poor"
-        
-        # 9. 保存结果
-        skeleton_data = {
-            "reference": ref_cycle_frames,
-            "user": user_cycle_frames
-        }
-        
+            ready.append((task_id, sequence))
+    
+    logger.info(f"姿态识别完成: {len(ready)}/{len(submissions)} 个用户视频")
+    if not ready:
+        return
+    
+    # 4. 动作切分 → 批量对比分析 → 评分 (工作进程)
+    progress.publish([task_id for task_id, _ in ready], "analyzing")
+    results = await executor.run(
+        analyze_batch,
+        ref_sequence,
+        [sequence for _, sequence in ready],
+        ref_cycles,
+        exercise_type_id,
+        ref_features
+    )
+    
+    # 5. 逐个保存结果
+    for (task_id, _), result in zip(ready, results):
+        if "error" in result:
+            await fail(task_id, result["error"])
+            continue
+        progress.publish([task_id], "saving")
         await supabase.save_analysis_result(
             task_id=task_id,
-            comparison_result=comparison_result,
-            skeleton_data=skeleton_data,
-            overall_score=overall_score,
-            overall_grade=overall_grade
+            comparison_result=result["comparison_result"],
+            skeleton_data=result["skeleton_data"],
+            overall_score=result["overall_score"],
+            overall_grade=result["overall_grade"]
         )
-        
-        # 10. 更新任务状态为 completed
         await supabase.update_task_status(task_id, TaskStatus.COMPLETED)
-        logger.info(f"任务 {task_id} 处理完成, 得分: {overall_score}")
-        
-        # 11. 清理临时文件
-        os.remove(ref_video_path)
-        os.remove(user_video_path)
-        os.rmdir(temp_dir)
+        progress.publish([task_id], "completed", overall_score=result["overall_score"])
+        logger.info(f"任务 {task_id} 处理完成, 得分: {result['overall_score']}")
+
+
+async def unfinished_submissions(submissions: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """过滤出尚未结束（不是 completed / failed）的提交"""
+    supabase = get_supabase_service()
+    finished = {TaskStatus.COMPLETED.value, TaskStatus.FAILED.value}
+    tasks = await asyncio.gather(*[supabase.get_analysis_task(task_id) for task_id, _ in submissions])
+    return [
+        (task_id, user_video_id)
+        for (task_id, user_video_id), task in zip(submissions, tasks)
+        if task and task["status"] not in finished
+    ]
+
+
+async def on_batch_failure(payload: Dict, error: str, final: bool):
+    """批量任务失败: 尚未结束的提交按是否最终失败分别处理"""
+    for task_id, _ in await unfinished_submissions(payload["submissions"]):
+        await mark_task_failure(task_id, error, final)
+
+
+async def reap_stale_tasks():
+    """
+    回收僵尸任务: 处于 processing 超过 ANALYSIS_STALE_TASK_SECONDS 的记录
+    （如持久化队列之外启动、或队列文件丢失的任务）标记为失败
+    """
+    supabase = get_supabase_service()
+    stale_seconds = float(os.getenv("ANALYSIS_STALE_TASK_SECONDS", 1800))
+    for task_id in await supabase.list_stale_tasks(stale_seconds):
+        await mark_task_failure(task_id, "处理超时，请重新提交", final=True)
+
+
+def register_job_handlers(scheduler: JobScheduler):
+    """注册分析相关的任务类型（API 进程启动时调用）"""
+    scheduler.register("analysis", process_analysis_task, on_analysis_failure)
+    scheduler.register("batch", process_batch_task, on_batch_failure)
+    scheduler.register("prepare_reference", prepare_reference_task, on_prepare_failure)
+    scheduler.register_reaper(reap_stale_tasks)
+
+
+def validate_exercise_type(exercise_type_id: int):
+    """校验动作类型已在注册表中登记，否则返回 400"""
+    try:
+        get_exercise(exercise_type_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def service_busy(error: SchedulerSaturated) -> HTTPException:
+    """调度器已满时的响应: 503 + Retry-After"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def get_dispatch_mode() -> str:
+    """
+    分析任务的执行位置（环境变量 ANALYSIS_DISPATCH）
+    
+    - local: 在 API 进程内由调度器执行（默认）
+    - workers: API 只创建 pending 任务，由独立 Worker (worker.py) 从 analysis_tasks 领取
+    """
+    return os.getenv("ANALYSIS_DISPATCH", "local")
+
+
+async def check_capacity():
+    """创建任务记录之前检查队列容量，已满时直接返回 503"""
+    scheduler = get_job_scheduler()
+    try:
+        if get_dispatch_mode() == "workers":
+            # 由 Worker 处理时以数据库中等待领取的任务数作为队列深度
+            pending = await get_supabase_service().count_pending_tasks()
+            if pending >= scheduler.max_queue:
+                scheduler.rejected += 1
+                raise SchedulerSaturated(scheduler.retry_after(pending))
+        else:
+            await scheduler.check_capacity()
+    except SchedulerSaturated as e:
+        raise service_busy(e)
+
+
+async def schedule_tasks(task_ids: List[str], kind: str, payload: Dict):
+    """
+    将已创建的任务交给调度器（由 Worker 处理时任务记录本身就是队列，无需入队）
+    
+    检查容量之后到入队之前调度器仍可能被占满，此时把这些任务标记为失败并返回 503，
+    避免留下永远 pending 的记录
+    """
+    if get_dispatch_mode() == "workers":
+        return
+    progress = get_task_progress()
+    progress.publish(task_ids, "queued")
+    try:
+        await get_job_scheduler().submit(kind, payload)
+    except SchedulerSaturated as e:
+        supabase = get_supabase_service()
+        for task_id in task_ids:
+            await supabase.update_task_status(task_id, TaskStatus.FAILED, error_message=str(e))
+        progress.publish(task_ids, "failed", error_message=str(e))
+        raise service_busy(e)
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def progress_from_task(task: Dict) -> Dict:
+    """由任务记录构造进度事件（本进程没有该任务的进度时使用，只有阶段没有帧进度）"""
+    stage = {
+        TaskStatus.PENDING.value: "queued",
+        TaskStatus.PROCESSING.value: "extracting",
+        TaskStatus.COMPLETED.value: "completed",
+        TaskStatus.FAILED.value: "failed"
+    }[task["status"]]
+    message, percent = STAGES[stage]
+    event = {"task_id": task["id"], "stage": stage, "message": message, "progress": percent}
+    if task.get("error_message"):
+        event["error_message"] = task["error_message"]
+    return event
+
+
+async def task_event_stream(task: Dict) -> AsyncIterator[str]:
+    """
+    任务进度的 SSE 事件流
+    
+    本进程处理的任务由 TaskProgress 实时推送；没有新事件时每
+    ANALYSIS_PROGRESS_POLL_SECONDS 秒发送一次保活消息，
+    若本进程没有该任务的进度（由独立 Worker 或其他 API 实例处理），
+    此时读取一次任务记录，只推送状态变化
+    
+    结束时推送 result（完整结果）或 failed 事件后关闭
+    """
+    supabase = get_supabase_service()
+    progress = get_task_progress()
+    task_id = task["id"]
+    poll_seconds = float(os.getenv("ANALYSIS_PROGRESS_POLL_SECONDS", 15))
+    
+    # 先订阅再读取最新进度，两者之间发布的事件不会丢失
+    queue = progress.subscribe(task_id)
+    try:
+        sent = None
+        event = progress.latest(task_id) or progress_from_task(task)
+        while event["stage"] not in TERMINAL_STAGES:
+            if event != sent:
+                yield format_sse("progress", event)
+                sent = event
+            else:
+                yield ": keepalive\n\n"
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=poll_seconds)
+            except asyncio.TimeoutError:
+                event = progress.latest(task_id)
+                if event is None:
+                    task = await supabase.get_analysis_task(task_id)
+                    if not task:
+                        yield format_sse("failed", {"task_id": task_id, "error_message": "任务不存在"})
+                        return
+                    event = progress_from_task(task)
         
-    except Exception as e:
-        logger.error(f"任务 {task_id} 处理失败: {e}")
-        await supabase.update_task_status(
-            task_id,
-            TaskStatus.FAILED,
-            error_message=str(e)
-        )
+        if event["stage"] == "completed":
+            result = await supabase.get_analysis_result(task_id)
+            if result:
+                yield format_sse("progress", event)
+                yield format_sse(
+                    "result", AnalysisResultResponse(**result).model_dump(mode="json")
+                )
+                return
+            event = {**event, "error_message": "结果不存在"}
+        yield format_sse("failed", {
+            "task_id": task_id,
+            "error_message": event.get("error_message") or STAGES["failed"][0]
+        })
+    finally:
+        progress.unsubscribe(task_id, queue)
+
+
+def get_batch_max_size() -> int:
+    """单次批量分析允许的最大提交数（环境变量 ANALYSIS_BATCH_MAX_SIZE）"""
+    return int(os.getenv("ANALYSIS_BATCH_MAX_SIZE", 50))
 
 
 # ================================
@@ -161,21 +630,42 @@ async def process_analysis_task(task_id: str):
 # ================================
 
 @router.post("/analyze", response_model=AnalysisTaskResponse)
-async def create_analysis_task(
-    request: AnalysisRequest,
-    background_tasks: BackgroundTasks
-):
+async def create_analysis_task(request: AnalysisRequest):
     """
     提交分析任务
     
+    重复提交不会重新计算: 相同的幂等键返回已创建的任务；
+    相同 (参考视频, 用户视频, 动作类型) 的任务正在处理时返回该任务，已完成时复用其结果
+    
+    新任务交给调度器按并发上限执行；调度器已满时返回 503，
+    响应头 Retry-After 给出建议的重试等待秒数
+    
     Args:
         request: 分析请求
-        background_tasks: FastAPI 后台任务
     
     Returns:
         任务 ID 和状态
     """
     supabase = get_supabase_service()
+    dedup = get_task_deduplicator()
+    validate_exercise_type(request.exercise_type_id)
+    
+    # 幂等提交 / 相同任务复用（不占用队列容量）
+    reused = await dedup.resolve(
+        supabase,
+        request.user_id,
+        request.reference_video_id,
+        request.user_video_id,
+        request.exercise_type_id,
+        request.idempotency_key
+    )
+    if reused:
+        return AnalysisTaskResponse(
+            task_id=reused.task_id,
+            status=reused.status,
+            message=dedup.message(reused)
+        )
+    await check_capacity()
     
     try:
         # 创建任务
@@ -183,14 +673,27 @@ async def create_analysis_task(
             user_id=request.user_id,
             reference_video_id=request.reference_video_id,
             user_video_id=request.user_video_id,
-            exercise_type_id=request.exercise_type_id
+            exercise_type_id=request.exercise_type_id,
+            idempotency_key=request.idempotency_key
         )
         
+        if not task_id and request.idempotency_key:
+            # 同一幂等键的并发提交已抢先创建任务（唯一约束冲突）
+            task = await supabase.find_task_by_idempotency_key(
+                request.user_id, request.idempotency_key
+            )
+            if task:
+                return AnalysisTaskResponse(
+                    task_id=task["id"],
+                    status=TaskStatus(task["status"]),
+                    message=TaskDeduplicator.MESSAGES["replayed"]
+                )
+        
         if not task_id:
             raise HTTPException(status_code=500, detail="创建任务失败")
         
-        # 添加到后台任务队列
-        background_tasks.add_task(process_analysis_task, task_id)
+        # 添加到调度队列
+        await schedule_tasks([task_id], "analysis", {"task_id": task_id})
         
         return AnalysisTaskResponse(
             task_id=task_id,
@@ -198,11 +701,152 @@ async def create_analysis_task(
             message="任务已创建，正在处理中"
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"创建任务失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def create_batch_analysis(request: BatchAnalysisRequest):
+    """
+    批量提交分析任务（如教练用一个参考视频给整个班级评分）
+    
+    每个用户视频创建一个独立的分析任务，可分别用 /api/tasks/{task_id} 和
+    /api/results/{task_id} 查询进度和结果；参考视频在后台只处理一次
+    
+    与单个提交相同，已在处理或已完成的相同任务直接复用；
+    其余的新任务在调度器中占一个并发槽位，调度器已满时返回 503
+    
+    Args:
+        request: 批量分析请求
+    
+    Returns:
+        每个提交对应的任务 ID
+    """
+    supabase = get_supabase_service()
+    dedup = get_task_deduplicator()
+    validate_exercise_type(request.exercise_type_id)
+    
+    # 重复提交的同一视频只分析一次
+    user_video_ids = list(dict.fromkeys(request.user_video_ids))
+    max_size = get_batch_max_size()
+    if len(user_video_ids) > max_size:
+        raise HTTPException(status_code=400, detail=f"单次最多提交 {max_size} 个视频")
+    
+    # 相同任务复用（不占用队列容量）
+    reused = {}
+    for user_video_id in user_video_ids:
+        hit = await dedup.resolve(
+            supabase,
+            request.user_id,
+            request.reference_video_id,
+            user_video_id,
+            request.exercise_type_id
+        )
+        if hit:
+            reused[user_video_id] = hit
+    new_video_ids = [v for v in user_video_ids if v not in reused]
+    if new_video_ids:
+        await check_capacity()
+    
+    try:
+        submissions = []
+        for user_video_id in new_video_ids:
+            task_id = await supabase.create_analysis_task(
+                user_id=request.user_id,
+                reference_video_id=request.reference_video_id,
+                user_video_id=user_video_id,
+                exercise_type_id=request.exercise_type_id
+            )
+            if not task_id:
+                raise HTTPException(status_code=500, detail="创建任务失败")
+            submissions.append((task_id, user_video_id))
+        
+        # 添加到调度队列
+        if submissions:
+            await schedule_tasks(
+                [task_id for task_id, _ in submissions],
+                "batch",
+                {
+                    "reference_video_id": request.reference_video_id,
+                    "submissions": submissions,
+                    "exercise_type_id": request.exercise_type_id
+                }
+            )
+        
+        created = {user_video_id: task_id for task_id, user_video_id in submissions}
+        return BatchAnalysisResponse(
+            reference_video_id=request.reference_video_id,
+            submissions=[
+                BatchSubmission(
+                    user_video_id=user_video_id,
+                    task_id=reused[user_video_id].task_id,
+                    status=reused[user_video_id].status
+                )
+                if user_video_id in reused else
+                BatchSubmission(
+                    user_video_id=user_video_id,
+                    task_id=created[user_video_id],
+                    status=TaskStatus.PENDING
+                )
+                for user_video_id in user_video_ids
+            ],
+            message=f"已创建 {len(submissions)} 个分析任务，复用 {len(reused)} 个已有任务"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"创建批量任务失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/references/{video_id}/prepare", response_model=ReferencePreparationResponse)
+async def prepare_reference(video_id: str):
+    """
+    预处理参考视频
+    
+    参考视频上传后调用一次，之后的分析任务直接使用预处理产物，
+    只需处理用户视频
+    
+    Args:
+        video_id: 参考视频 ID
+    
+    Returns:
+        预处理状态
+    """
+    supabase = get_supabase_service()
+    
+    try:
+        video = await supabase.get_video_metadata(video_id)
+        
+        if not video:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        if video["video_type"] != VideoType.REFERENCE.value:
+            raise HTTPException(status_code=400, detail="只能预处理参考视频")
+        
+        try:
+            await get_job_scheduler().submit("prepare_reference", {"video_id": video_id})
+        except SchedulerSaturated as e:
+            raise service_busy(e)
+        
+        return ReferencePreparationResponse(
+            video_id=video_id,
+            status=TaskStatus.PENDING,
+            features_path=reference_features_path(video["file_path"]),
+            message="参考视频预处理已开始"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"参考视频预处理失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/tasks/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str):
     """
@@ -234,6 +878,42 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    订阅任务进度 (Server-Sent Events)，替代轮询 /api/tasks/{task_id}
+    
+    建立连接时读取一次任务记录，之后由处理过程主动推送，不再访问数据库；
+    已结束的任务直接推送结果后关闭
+    
+    事件:
+    - progress: {"task_id", "stage", "message", "progress" (0-100),
+                 "frames_done", "frames_total" (仅 extracting 阶段)}
+    - result: 完整的分析结果（同 /api/results/{task_id}），之后关闭连接
+    - failed: {"task_id", "error_message"}，之后关闭连接
+    
+    Args:
+        task_id: 任务 ID
+    """
+    supabase = get_supabase_service()
+    
+    try:
+        task = await supabase.get_analysis_task(task_id)
+    except Exception as e:
+        logger.error(f"查询任务失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    return StreamingResponse(
+        task_event_stream(task),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，事件立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/results/{task_id}", response_model=AnalysisResultResponse)
 async def get_analysis_result(task_id: str):
     """
@@ -0,0 +1,466 @@
+"""
+分析流水线（CPU 密集部分）
+
+功能:
+- 姿态提取（每个视频独立执行，凑够所需周期后可提前停止） → 周期切分 → 对比分析 → 总体评分
+- 切分信号、特征和对比维度按 exercise_type_id 从动作注册表读取
+- 用户视频的所有深蹲周期一次批量分析，第一个周期另做全程轨迹对比
+- 一个参考视频对多个用户视频的批量评分（参考视频只处理一次）
+- 参考视频预处理（周期切分 + 逐帧特征）
+- 视频边下载边解码（内存缓冲区，不写临时文件）
+- 长视频可按时间分段，由多个工作进程各自 seek 并行提取后拼接
+- 提取过程中按时间间隔上报解码进度（经执行引擎的进度通道发回 API 进程）
+- 纯同步函数，在进程池工作进程中执行，不访问数据库
+- 工作进程内复用各服务单例（含 Pose 实例池）
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+import cv2
+import hashlib
+import logging
+import numpy as np
+import os
+import threading
+import time
+
+from models.pose_sequence import PoseSequence
+from models.reference_artifact import ReferenceArtifact
+from services.pose_features import compute_frame_features
+from services.mediapipe_service import get_mediapipe_service
+from services.squat_segmentation import CycleStopCondition, get_segmentation_service
+from services.exercise_analyzer import STATUS_SCORES, get_exercise_analyzer
+from services.exercise_registry import SQUAT, get_exercise
+from services.process_executor import report_progress
+from services.video_stream import (
+    StreamingBuffer,
+    VideoSource,
+    download_to_buffer,
+    open_capture,
+    release_capture
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FrameProgress:
+    """
+    解码进度上报（作为 extract_pose_landmarks 的 on_frame）
+
+    每 ANALYSIS_PROGRESS_INTERVAL 秒（默认 0.5）最多上报一次
+    report_progress(key, 已解码帧数, 总帧数)，帧数按原始帧号计算（含跳过的帧）
+    """
+
+    def __init__(self, key, start_frame: int = 0, end_frame: Optional[int] = None):
+        """
+        Args:
+            key: 进度来源标识，原样传给 API 进程
+            start_frame: 起始原始帧号（分段提取时为 warmup 帧）
+            end_frame: 结束原始帧号（None 表示视频结尾）
+        """
+        self.key = key
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.interval = float(os.getenv("ANALYSIS_PROGRESS_INTERVAL", 0.5))
+        self.frames_done = 0
+        self.frames_total = 0
+        self._reported_at = 0.0
+
+    def __call__(self, frame_index: int, info: Dict[str, Any]):
+        end_frame = self.end_frame or info.get("total_frames") or 0
+        self.frames_total = max(0, end_frame - self.start_frame)
+        self.frames_done = frame_index + 1 - self.start_frame
+        now = time.monotonic()
+        if now - self._reported_at >= self.interval:
+            self._reported_at = now
+            report_progress(self.key, self.frames_done, self.frames_total)
+
+    def finish(self):
+        """提取结束: 上报最终进度（提前停止时以实际解码到的帧为总数）"""
+        report_progress(self.key, self.frames_done, self.frames_done)
+
+
+def compute_overall_score(comparison_result: Dict[str, Any]) -> Tuple[int, str]:
+    """
+    根据 4 个维度的状态计算总体评分和等级
+
+    Returns:
+        (overall_score, overall_grade)
+    """
+    scores = [
+        STATUS_SCORES[comparison_result["depth"]["status"]],
+        STATUS_SCORES[comparison_result["knee_tracking"]["status"]],
+        STATUS_SCORES[comparison_result["torso_lean"]["status"]],
+        STATUS_SCORES[comparison_result["balance"]["status"]]
+    ]
+    overall_score = int(sum(scores) / len(scores))
+
+    if overall_score >= 85:
+        overall_grade = "excellent"
+    elif overall_score >= 70:
+        overall_grade = "good"
+    elif overall_score >= 50:
+        overall_grade = "needs_improvement"
+    else:
+        overall_grade = "poor"
+
+    return overall_score, overall_grade
+
+
+def get_max_cycles() -> Optional[int]:
+    """
+    分析所需的周期数（环境变量 ANALYSIS_MAX_CYCLES，0 或未设置表示提取整段视频）
+
+    提取到该数量的完整周期后即停止解码，长视频不必全部推理
+    """
+    max_cycles = int(os.getenv("ANALYSIS_MAX_CYCLES", 0))
+    return max_cycles if max_cycles > 0 else None
+
+
+def extract_video(
+    video_path: VideoSource,
+    max_cycles: Optional[int] = None,
+    progress_key=None,
+    exercise_type_id: int = SQUAT.exercise_type_id
+) -> PoseSequence:
+    """
+    提取单个视频的姿态关键点序列
+
+    参考视频与用户视频互相独立，可分别提交到不同工作进程并行执行
+
+    Args:
+        video_path: 视频文件路径或 StreamingBuffer
+        max_cycles: 检测到该数量的完整周期后停止提取（None 表示提取整段视频）
+        progress_key: 解码进度的来源标识（None 表示不上报进度）
+        exercise_type_id: 动作类型，提前停止时按其切分信号计数周期
+
+    Raises:
+        Exception: 视频无法打开或未检测到人体姿态
+    """
+    stop_condition = (
+        CycleStopCondition(max_cycles, exercise=get_exercise(exercise_type_id))
+        if max_cycles else None
+    )
+    progress = FrameProgress(progress_key) if progress_key is not None else None
+    result = get_mediapipe_service().extract_pose_landmarks(
+        video_path, stop_condition=stop_condition, on_frame=progress
+    )
+    if progress is not None:
+        progress.finish()
+    if not result["success"]:
+        raise Exception(f"姿态识别失败: {result.get('error')}")
+    return result["sequence"]
+
+
+def extract_video_stream(
+    url: str,
+    max_cycles: Optional[int] = None,
+    progress_key=None,
+    exercise_type_id: int = SQUAT.exercise_type_id
+) -> Tuple[PoseSequence, str]:
+    """
+    边下载边提取姿态关键点
+
+    下载线程把数据分块写入内存缓冲区并同步计算内容哈希，
+    解码器直接读取缓冲区，第一个分块到达后即可开始推理
+
+    Args:
+        url: 视频的签名下载地址
+        max_cycles: 同 extract_video
+        progress_key: 同 extract_video
+        exercise_type_id: 同 extract_video
+
+    Returns:
+        (关键点序列, 视频内容 SHA-256)
+    """
+    buffer = StreamingBuffer()
+    digest = hashlib.sha256()
+    downloader = threading.Thread(
+        target=download_to_buffer,
+        args=(url, buffer, digest),
+        name="video-download",
+        daemon=True
+    )
+    downloader.start()
+    try:
+        sequence = extract_video(buffer, max_cycles, progress_key, exercise_type_id)
+    except Exception:
+        downloader.join()
+        # 下载失败导致的解码错误，报告下载失败
+        if buffer.error is not None:
+            raise Exception(f"视频下载失败: {buffer.error}")
+        raise
+
+    # 提前停止提取时仍等待下载完成，内容哈希需要覆盖整个文件
+    downloader.join()
+    if buffer.error is not None:
+        raise Exception(f"视频下载失败: {buffer.error}")
+    return sequence, digest.hexdigest()
+
+
+def probe_video(video_path: VideoSource) -> Dict[str, Any]:
+    """
+    读取视频元数据（只读容器头，不解码）
+
+    Returns:
+        {"fps": float, "total_frames": int, "width": int, "height": int}
+    """
+    cap = open_capture(video_path)
+    try:
+        if not cap.isOpened():
+            raise Exception(f"无法打开视频文件: {video_path}")
+        return {
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "total_frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        }
+    finally:
+        release_capture(cap, video_path)
+
+
+def split_chunks(
+    total_frames: int,
+    stride: int,
+    parts: int,
+    warmup_frames: int
+) -> List[Tuple[int, Optional[int], int]]:
+    """
+    将视频按帧号均分为 parts 段
+
+    分段边界对齐到采样步长，各段的采样帧与整段提取时一致；
+    每段从 warmup 帧开始推理，[warmup, start) 之间的重叠帧只用于让跟踪状态稳定，
+    拼接时丢弃
+
+    Returns:
+        [(start_frame, end_frame, warmup_frame), ...]，最后一段 end_frame 为 None（读到结尾）
+    """
+    stride = max(1, stride)
+    samples = -(-total_frames // stride)
+    parts = max(1, min(parts, samples))
+    bounds = [(samples * i // parts) * stride for i in range(parts)]
+
+    chunks = []
+    for i, start in enumerate(bounds):
+        end = bounds[i + 1] if i + 1 < parts else None
+        warmup = max(0, start - (-(-warmup_frames // stride)) * stride)
+        chunks.append((start, end, warmup))
+    return chunks
+
+
+def plan_chunks(video_info: Dict[str, Any], workers: int) -> Optional[List[Tuple]]:
+    """
+    决定是否分段并行提取
+
+    环境变量:
+        ANALYSIS_CHUNK_SECONDS: 每段的最短时长（0 或未设置表示不分段）
+        ANALYSIS_CHUNK_OVERLAP_SECONDS: 每段开头的重叠时长（默认 1 秒）
+
+    Returns:
+        split_chunks 的输出；视频过短或工作进程不足时返回 None
+    """
+    chunk_seconds = float(os.getenv("ANALYSIS_CHUNK_SECONDS", 0))
+    fps = video_info["fps"]
+    if chunk_seconds <= 0 or workers < 2 or fps <= 0:
+        return None
+
+    duration = video_info["total_frames"] / fps
+    parts = min(workers, int(duration // chunk_seconds))
+    if parts < 2:
+        return None
+
+    overlap_seconds = float(os.getenv("ANALYSIS_CHUNK_OVERLAP_SECONDS", 1.0))
+    stride = get_mediapipe_service().resolve_stride(fps)
+    return split_chunks(
+        video_info["total_frames"], stride, parts, int(round(overlap_seconds * fps))
+    )
+
+
+def extract_chunk(
+    video_path: VideoSource,
+    start_frame: int,
+    end_frame: Optional[int],
+    warmup_frame: int,
+    progress_key=None
+) -> PoseSequence:
+    """
+    提取视频的一段（分段并行提取时每段在各自的工作进程中执行）
+
+    从 warmup_frame seek 并开始推理，只返回 [start_frame, end_frame) 内的帧；
+    分段内未检测到人体不视为错误，由拼接后的整段序列统一判断；
+    progress_key 不为 None 时上报本段的解码进度
+    """
+    progress = (
+        FrameProgress(progress_key, warmup_frame, end_frame)
+        if progress_key is not None else None
+    )
+    result = get_mediapipe_service().extract_pose_landmarks(
+        video_path, start_frame=warmup_frame, end_frame=end_frame, on_frame=progress
+    )
+    if progress is not None:
+        progress.finish()
+    if result["sequence"] is None:
+        raise Exception(f"姿态识别失败: {result.get('error')}")
+
+    sequence = result["sequence"]
+    if len(sequence) > 0:
+        sequence = sequence.slice_frames(start_frame, int(sequence.frame_indices[-1]))
+    logger.info(
+        f"分段提取完成: [{start_frame}, {end_frame}), {len(sequence)} 帧 "
+        f"(丢弃重叠 {len(result['sequence']) - len(sequence)} 帧)"
+    )
+    return sequence
+
+
+def stitch_chunks(parts: List[PoseSequence]) -> PoseSequence:
+    """
+    按顺序拼接分段提取的结果
+
+    Raises:
+        Exception: 整段视频未检测到人体姿态
+    """
+    sequence = PoseSequence.concatenate(parts)
+    if sequence.valid_count == 0:
+        raise Exception("姿态识别失败: 视频中未检测到任何人体姿态")
+    return sequence
+
+
+def prepare_reference_artifact(
+    sequence: PoseSequence,
+    params: Dict[str, Any],
+    exercise_type_id: int = SQUAT.exercise_type_id
+) -> bytes:
+    """
+    参考视频预处理: 周期切分 + 逐帧特征，序列化为 ReferenceArtifact
+
+    Args:
+        sequence: 参考视频关键点序列
+        params: 提取参数（写入产物，用于校验是否过期；应包含 exercise_type_id）
+        exercise_type_id: 动作类型（决定切分信号和特征）
+
+    Returns:
+        ReferenceArtifact.to_bytes() 的输出
+    """
+    exercise = get_exercise(exercise_type_id)
+    cycles = get_segmentation_service().segment_exercise_cycles(sequence, exercise)
+    if not cycles:
+        raise Exception("动作切分失败")
+
+    artifact = ReferenceArtifact(
+        sequence=sequence,
+        cycles=cycles,
+        features=compute_frame_features(sequence, exercise.features),
+        params=params
+    )
+    return artifact.to_bytes()
+
+
+def analyze_sequences(
+    ref_sequence: PoseSequence,
+    user_sequence: PoseSequence,
+    ref_cycles: Optional[List[Dict[str, int]]] = None,
+    exercise_type_id: int = SQUAT.exercise_type_id,
+    ref_features: Optional[Dict[str, np.ndarray]] = None
+) -> Dict[str, Any]:
+    """
+    对两段关键点序列执行 周期切分 → 对比分析 → 总体评分
+
+    Args:
+        ref_sequence: 参考视频关键点序列
+        user_sequence: 用户视频关键点序列
+        ref_cycles: 参考视频预处理产物中的周期（None 时现场切分）
+        exercise_type_id: 动作类型（按注册表中的定义切分和分析）
+        ref_features: 参考视频预处理产物中的逐帧特征（与 ref_sequence 逐帧对齐，
+            None 时现场计算；仅与 ref_cycles 一起使用）
+
+    Returns:
+        {
+            "comparison_result": {...},  # 含逐次结果 reps、汇总 summary 和轨迹对比 trajectory
+            "skeleton_data": {"reference": [...], "user": [...]},
+            "overall_score": int,
+            "overall_grade": str
+        }
+    """
+    result = analyze_batch(
+        ref_sequence, [user_sequence], ref_cycles, exercise_type_id, ref_features
+    )[0]
+    if "error" in result:
+        raise Exception(result["error"])
+    return result
+
+
+def analyze_batch(
+    ref_sequence: PoseSequence,
+    user_sequences: List[PoseSequence],
+    ref_cycles: Optional[List[Dict[str, int]]] = None,
+    exercise_type_id: int = SQUAT.exercise_type_id,
+    ref_features: Optional[Dict[str, np.ndarray]] = None
+) -> List[Dict[str, Any]]:
+    """
+    一个参考视频对多个用户视频的批量分析
+
+    参考视频只切分一次、最低点特征只算一次，所有用户视频的所有周期一次批量评分；
+    参考视频已预处理时（ref_cycles + ref_features）直接使用产物中的周期和逐帧特征；
+    单个用户视频失败不影响其他提交
+
+    Returns:
+        与 user_sequences 一一对应: analyze_sequences 格式的结果，或 {"error": str}
+    """
+    exercise = get_exercise(exercise_type_id)
+    segmentation = get_segmentation_service()
+    analyzer = get_exercise_analyzer(exercise_type_id)
+
+    # 1. 切分动作周期 (参考视频取第一个周期，用户视频全部周期)
+    if ref_cycles is None:
+        ref_cycles = segmentation.segment_exercise_cycles(ref_sequence, exercise)
+        ref_features = None
+    if not ref_cycles:
+        raise Exception("动作切分失败")
+
+    ref_bounds = (ref_cycles[0]["start_frame"], ref_cycles[0]["end_frame"])
+    ref_cycle = ref_sequence.slice_frames(*ref_bounds)
+    ref_table = None
+    if ref_features is not None:
+        ref_range = ref_sequence.frame_range(*ref_bounds)
+        ref_table = {name: values[ref_range] for name, values in ref_features.items()}
+    user_cycles = [
+        segmentation.segment_exercise_cycles(user, exercise) for user in user_sequences
+    ]
+
+    logger.info(f"动作切分完成: {len(user_sequences)} 个用户视频")
+
+    # 2. 对比分析 (所有提交的所有周期一次批量计算，顶层维度为第一次深蹲的结果)
+    comparisons = analyzer.analyze_batch(
+        ref_cycle,
+        [(user, cycles) for user, cycles in zip(user_sequences, user_cycles)],
+        ref_table
+    )
+
+    reference_frames = ref_cycle.to_frames()
+    results = []
+    for user_sequence, cycles, comparison_result in zip(user_sequences, user_cycles, comparisons):
+        if not cycles or comparison_result is None:
+            results.append({"error": "动作切分失败"})
+            continue
+
+        user_cycle = user_sequence.slice_frames(
+            cycles[0]["start_frame"], cycles[0]["end_frame"]
+        )
+        # 第一次深蹲的全程轨迹对比（时间对齐后按阶段汇总）
+        comparison_result["trajectory"] = analyzer.analyze_trajectory(ref_cycle, user_cycle, ref_table)
+
+        # 3. 计算总体评分
+        overall_score, overall_grade = compute_overall_score(comparison_result)
+
+        # 4. 结果 (仅在持久化边界转换为逐帧字典)
+        results.append({
+            "comparison_result": comparison_result,
+            "skeleton_data": {
+                "reference": reference_frames,
+                "user": user_cycle.to_frames()
+            },
+            "overall_score": overall_score,
+            "overall_grade": overall_grade
+        })
+
+    logger.info("对比分析完成")
+    return results
@@ -0,0 +1,487 @@
+"""
+通用动作对比分析
+
+功能:
+- 按动作定义 (ExerciseSpec) 执行对比分析，新增动作只需在注册表中登记定义
+- 逐帧特征表由通用特征引擎一次算出，每段序列只做一次最低点扫描，各维度共用
+- 多次动作批量分析: 所有周期补齐为 (reps, T, 33, 4) 数组一次计算，
+  输出逐次结果、最好 / 最差一次和疲劳趋势
+- 一个参考动作对多份用户提交: 所有提交的周期合并为一个数组一次评分
+- 全程轨迹对比: 带约束 DTW 对齐双方的关节角度序列，按下降 / 最低点 / 回升阶段
+  汇报各维度偏差和节奏
+"""
+
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+import logging
+
+from models.pose_sequence import PoseSequence
+from services.exercise_registry import ExerciseSpec, get_exercise
+from services.pose_features import compute_frame_features, evaluate_features
+from services.trajectory_alignment import banded_dtw
+
+logger = logging.getLogger(__name__)
+
+# 各维度状态对应的分数
+STATUS_SCORES = {"pass": 100, "warn": 60, "fail": 30}
+
+# 轨迹对比的动作阶段
+PHASES = ("descent", "bottom", "ascent")
+
+class ExerciseAnalyzer:
+    """通用动作对比分析器"""
+    
+    # 疲劳判定: 每次得分下降超过该值，或 depth 维度角度每次变大（变浅）超过该值 (度)
+    FATIGUE_SCORE_SLOPE = 5.0
+    FATIGUE_DEPTH_SLOPE = 3.0
+    
+    # 轨迹对齐的带宽占较长一段的比例，以及带宽上限（采样帧）
+    DTW_BAND_RATIO = 0.1
+    DTW_MAX_BAND = 30
+    # 参考动作切分信号变化幅度超过该比例的帧视为最低点阶段
+    BOTTOM_PHASE_RATIO = 0.9
+    
+    def __init__(self, exercise: ExerciseSpec):
+        """
+        Args:
+            exercise: 动作定义
+        """
+        self.exercise = exercise
+        self.dimensions = tuple(exercise.dimensions)
+        logger.info(f"动作分析器初始化: {exercise.name}")
+    
+    def grade(self, dimension: str, diff):
+        """
+        按阈值判定状态（支持标量或数组，数组时逐元素判定）
+        
+        Returns:
+            "pass" | "warn" | "fail"（数组输入时为同形状的字符串数组）
+        """
+        pass_limit, warn_limit = self.exercise.dimensions[dimension].thresholds
+        status = np.where(diff < pass_limit, "pass", np.where(diff < warn_limit, "warn", "fail"))
+        return str(status) if status.ndim == 0 else status
+    
+    def _dimension_result(
+        self,
+        dimension: str,
+        reference_value: float,
+        user_value: float,
+        diff: float,
+        status: Optional[str] = None
+    ) -> Dict:
+        """组装单个维度的对比结果"""
+        if status is None:
+            status = self.grade(dimension, diff)
+        spec = self.exercise.dimensions[dimension]
+        message, suggestion = spec.messages[status]
+        return {
+            "status": status,
+            "reference_value": round(float(reference_value), spec.precision),
+            "user_value": round(float(user_value), spec.precision),
+            "message": message.format(diff=diff),
+            "suggestion": suggestion
+        }
+    
+    def signal(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """切分信号（已按方向调整，极大值为动作最低点）"""
+        return self.exercise.signal_direction * features[self.exercise.signal]
+    
+    def bottom_features(
+        self,
+        sequence: PoseSequence,
+        table: Optional[Dict[str, np.ndarray]] = None
+    ) -> Dict[str, float]:
+        """
+        最低点帧的特征
+        
+        整段序列的逐帧特征表一次数组运算算出，再按切分信号做一次扫描取最低点所在行
+        
+        Args:
+            sequence: 关键点序列
+            table: 与 sequence 逐帧对齐的特征表（如参考视频预处理产物，None 时现场计算）
+        
+        Returns:
+            {特征名: 最低点帧的值}（特征名见动作定义的 features）
+        """
+        if table is None:
+            table = compute_frame_features(sequence, self.exercise.features)
+        bottom = int(np.argmax(np.where(sequence.valid, self.signal(table), -np.inf)))
+        return {name: values[bottom] for name, values in table.items()}
+    
+    def dimension_values(self, features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """由特征计算各维度取值（维度定义中各特征的平均，支持标量或任意形状的数组）"""
+        return {
+            dimension: sum(features[name] for name in spec.features) / len(spec.features)
+            for dimension, spec in self.exercise.dimensions.items()
+        }
+    
+    def compare_values(
+        self,
+        ref_values: Dict[str, np.ndarray],
+        user_values: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        各维度的差异（判定依据）
+        
+        user_only 维度（如左右平衡）只看用户自身，差异即用户取值（参考值视为 0）
+        """
+        return {
+            dimension: (
+                user_values[dimension] if spec.user_only
+                else np.abs(ref_values[dimension] - user_values[dimension])
+            )
+            for dimension, spec in self.exercise.dimensions.items()
+        }
+    
+    def reference_values(self, ref_values: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """结果中展示的参考值（user_only 维度为 0）"""
+        return {
+            dimension: 0.0 if spec.user_only else ref_values[dimension]
+            for dimension, spec in self.exercise.dimensions.items()
+        }
+    
+    def compare_dimension(
+        self,
+        dimension: str,
+        ref_features: Dict[str, float],
+        user_features: Dict[str, float]
+    ) -> Dict:
+        """由双方最低点特征得出单个维度的对比结果"""
+        ref_values = self.dimension_values(ref_features)
+        user_values = self.dimension_values(user_features)
+        diff = float(self.compare_values(ref_values, user_values)[dimension])
+        reference_value = self.reference_values(ref_values)[dimension]
+        return self._dimension_result(dimension, reference_value, user_values[dimension], diff)
+    
+    def analyze_comparison(
+        self,
+        reference: PoseSequence,
+        user: PoseSequence
+    ) -> Dict:
+        """
+        单个周期的对比分析
+        
+        双方各计算一次逐帧特征表、各做一次最低点扫描，所有维度都读取同一组特征
+        
+        Returns:
+            {维度名: 对比结果字典, ...}
+        """
+        ref_features = self.bottom_features(reference)
+        user_features = self.bottom_features(user)
+        return {
+            dimension: self.compare_dimension(dimension, ref_features, user_features)
+            for dimension in self.dimensions
+        }
+    
+    def analyze_reps(
+        self,
+        reference: PoseSequence,
+        user: PoseSequence,
+        cycles: List[Dict[str, int]]
+    ) -> Dict:
+        """
+        批量分析用户视频的所有动作周期
+        
+        所有周期补齐为 (reps, T, 33, 4) 数组，最低点查找、维度取值和状态判定
+        都是整批数组运算，不按周期逐个循环计算（即单份提交的 analyze_batch）
+        
+        Args:
+            reference: 参考动作关键点序列（单个周期）
+            user: 用户视频完整关键点序列
+            cycles: 用户视频的周期切分结果
+        
+        Returns:
+            {
+                "depth": {...}, "knee_tracking": {...}, "torso_lean": {...}, "balance": {...},
+                    # 第一次动作的结果（与 analyze_comparison 的输出兼容）
+                "reps": [
+                    {"rep": 1, "start_frame", "bottom_frame", "end_frame",
+                     "depth": {...}, ..., "score": int},
+                    ...
+                ],
+                "summary": {
+                    "rep_count": int,
+                    "best_rep": int, "worst_rep": int,  # 次序号（从 1 开始，同分时最好取最早、最差取最晚）
+                    "fatigue_trend": {"score_slope": float, "depth_slope": float, "status": str}
+                }
+            }
+        """
+        result = self.analyze_batch(reference, [(user, cycles)])[0]
+        if result is None:
+            raise ValueError("没有可分析的动作周期")
+        return result
+    
+    def analyze_batch(
+        self,
+        reference: PoseSequence,
+        submissions: List[Tuple[PoseSequence, List[Dict[str, int]]]],
+        ref_table: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Optional[Dict]]:
+        """
+        一个参考动作对多份用户提交的批量分析
+        
+        参考动作的最低点特征只算一次；所有提交的所有周期补齐后拼成一个
+        (总周期数, T, 33, 4) 数组，最低点查找、维度取值、判定和评分都是一次整批运算
+        
+        Args:
+            reference: 参考动作关键点序列（单个周期）
+            submissions: [(用户完整关键点序列, 周期切分结果), ...]
+            ref_table: 参考动作的逐帧特征表（预处理产物，None 时现场计算）
+        
+        Returns:
+            与 submissions 一一对应的 analyze_reps 格式结果；没有可分析周期的提交为 None
+        """
+        blocks = [user.pad_slices([(c["start_frame"], c["end_frame"]) for c in cycles])
+                  for user, cycles in submissions]
+        length = max(landmarks.shape[1] for landmarks, _ in blocks)
+        landmarks = np.concatenate([
+            np.pad(block, ((0, 0), (0, length - block.shape[1]), (0, 0), (0, 0)))
+            for block, _ in blocks
+        ])
+        valid = np.concatenate([
+            np.pad(block, ((0, 0), (0, length - block.shape[1])))
+            for _, block in blocks
+        ])
+        owner = np.repeat(np.arange(len(blocks)), [len(block) for block, _ in blocks])
+        
+        # 每个周期的最低点（切分信号最大的有效帧），一次 argmax
+        signal_spec = {self.exercise.signal: self.exercise.features[self.exercise.signal]}
+        signal = self.signal(evaluate_features(landmarks, signal_spec))
+        bottom = np.argmax(np.where(valid, signal, -np.inf), axis=1)
+        user_bottoms = landmarks[np.arange(len(bottom)), bottom]
+        
+        ref_values = self.dimension_values(self.bottom_features(reference, ref_table))
+        user_values = self.dimension_values(
+            evaluate_features(user_bottoms, self.exercise.features)
+        )
+        
+        diffs = self.compare_values(ref_values, user_values)
+        ref_values = self.reference_values(ref_values)
+        statuses = {
+            dimension: self.grade(dimension, diffs[dimension]) for dimension in self.dimensions
+        }
+        
+        scores = np.mean([
+            np.select(
+                [statuses[dimension] == status for status in STATUS_SCORES],
+                list(STATUS_SCORES.values())
+            )
+            for dimension in self.dimensions
+        ], axis=0).astype(int)
+        
+        # 按提交拆分并组装逐次结果（仅格式化，计算已在上面整批完成）
+        # 没有有效帧的周期无法分析，跳过
+        analyzable = valid.any(axis=1)
+        results = []
+        for index, (_, cycles) in enumerate(submissions):
+            rows = np.flatnonzero((owner == index) & analyzable)
+            if len(rows) == 0:
+                results.append(None)
+                continue
+            
+            offset = int(np.flatnonzero(owner == index)[0])
+            reps = []
+            for number, row in enumerate(rows.tolist(), start=1):
+                cycle = cycles[row - offset]
+                rep = {
+                    "rep": number,
+                    "start_frame": int(cycle["start_frame"]),
+                    "bottom_frame": int(cycle["bottom_frame"]),
+                    "end_frame": int(cycle["end_frame"])
+                }
+                for dimension in self.dimensions:
+                    rep[dimension] = self._dimension_result(
+                        dimension,
+                        ref_values[dimension],
+                        user_values[dimension][row],
+                        float(diffs[dimension][row]),
+                        status=str(statuses[dimension][row])
+                    )
+                rep["score"] = int(scores[row])
+                reps.append(rep)
+            
+            rep_scores = scores[rows]
+            result = {dimension: reps[0][dimension] for dimension in self.dimensions}
+            result["reps"] = reps
+            result["summary"] = {
+                "rep_count": len(reps),
+                "best_rep": int(np.argmax(rep_scores)) + 1,
+                "worst_rep": len(rep_scores) - int(np.argmin(rep_scores[::-1])),
+                "fatigue_trend": self.fatigue_trend(rep_scores, user_values["depth"][rows])
+            }
+            results.append(result)
+        
+        logger.info(f"批量分析完成: {len(submissions)} 份提交, 共 {len(scores)} 次动作")
+        return results
+    
+    def analyze_trajectory(
+        self,
+        reference: PoseSequence,
+        user: PoseSequence,
+        ref_table: Optional[Dict[str, np.ndarray]] = None
+    ) -> Dict:
+        """
+        全程轨迹对比（时间对齐后逐帧比较，不只比较最低点）
+        
+        双方的膝角 / 髋角序列用带约束 DTW 对齐，沿对齐路径逐帧计算各维度差异并套用
+        单帧判定阈值，再按参考动作的阶段（下蹲 / 最低点 / 起身）汇总
+        
+        Args:
+            reference: 参考动作关键点序列（单个周期）
+            user: 用户动作关键点序列（单个周期）
+            ref_table: 参考动作的逐帧特征表（预处理产物，None 时现场计算）
+        
+        Returns:
+            {
+                "alignment_cost": float,  # 对齐路径上的平均角度距离 (度)
+                "tempo_ratio": float,     # 用户时长 / 参考时长
+                "phases": [
+                    {
+                        "phase": "descent" | "bottom" | "ascent",
+                        "reference_frames": int,
+                        "user_frames": int,
+                        "tempo_ratio": float,
+                        "deviations": {维度: 平均差异},
+                        "statuses": {维度: "pass" | "warn" | "fail"},
+                        "pass_rate": {维度: 逐帧判定为 pass 的比例}
+                    },
+                    ...
+                ]
+            }
+        """
+        if ref_table is not None:
+            ref_table = {name: values[reference.valid] for name, values in ref_table.items()}
+        reference = reference.only_valid()
+        user = user.only_valid()
+        if len(reference) == 0 or len(user) == 0:
+            raise ValueError("没有可对齐的有效帧")
+        
+        if ref_table is None:
+            ref_table = compute_frame_features(reference, self.exercise.features)
+        user_table = compute_frame_features(user, self.exercise.features)
+        
+        path_ref, path_user, alignment_cost = banded_dtw(
+            np.stack([ref_table[name] for name in self.exercise.trajectory_features], axis=1),
+            np.stack([user_table[name] for name in self.exercise.trajectory_features], axis=1),
+            band=self.dtw_band(len(reference), len(user))
+        )
+        
+        # 沿对齐路径逐帧计算各维度差异和判定
+        diffs = self.compare_values(
+            self.dimension_values({name: values[path_ref] for name, values in ref_table.items()}),
+            self.dimension_values({name: values[path_user] for name, values in user_table.items()})
+        )
+        statuses = {
+            dimension: self.grade(dimension, diffs[dimension]) for dimension in self.dimensions
+        }
+        
+        # 按参考动作切分信号的变化幅度划分阶段
+        signal = self.signal(ref_table)
+        signal_range = max(float(signal.max() - signal.min()), 1e-6)
+        progress = (signal - signal.min()) / signal_range
+        labels = np.where(
+            progress >= self.BOTTOM_PHASE_RATIO, "bottom",
+            np.where(np.arange(len(signal)) < int(np.argmax(signal)), "descent", "ascent")
+        )[path_ref]
+        
+        phases = []
+        for phase in PHASES:
+            mask = labels == phase
+            if not mask.any():
+                continue
+            ref_frames = len(np.unique(path_ref[mask]))
+            user_frames = len(np.unique(path_user[mask]))
+            deviations = {
+                dimension: float(diffs[dimension][mask].mean()) for dimension in self.dimensions
+            }
+            phases.append({
+                "phase": phase,
+                "reference_frames": ref_frames,
+                "user_frames": user_frames,
+                "tempo_ratio": round(self._tempo_ratio(reference, ref_frames, user, user_frames), 2),
+                "deviations": {
+                    dimension: round(value, self.exercise.dimensions[dimension].precision)
+                    for dimension, value in deviations.items()
+                },
+                "statuses": {
+                    dimension: self.grade(dimension, value)
+                    for dimension, value in deviations.items()
+                },
+                "pass_rate": {
+                    dimension: round(float(np.mean(statuses[dimension][mask] == "pass")), 2)
+                    for dimension in self.dimensions
+                }
+            })
+        
+        return {
+            "alignment_cost": round(alignment_cost, 2),
+            "tempo_ratio": round(self._tempo_ratio(reference, len(reference), user, len(user)), 2),
+            "phases": phases
+        }
+    
+    def dtw_band(self, ref_frames: int, user_frames: int) -> int:
+        """
+        轨迹对齐的带宽: 较长一段的 DTW_BAND_RATIO，不超过 DTW_MAX_BAND
+        
+        带中心沿两段的对角线倾斜（见 band_limits），两段长度不同时路径仍然可达，
+        带宽不需要再加上长度差；有上限时长视频的对齐开销随长度线性增长
+        """
+        band = int(round(self.DTW_BAND_RATIO * max(ref_frames, user_frames)))
+        return min(band, self.DTW_MAX_BAND)
+    
+    def _tempo_ratio(
+        self,
+        reference: PoseSequence,
+        ref_frames: int,
+        user: PoseSequence,
+        user_frames: int
+    ) -> float:
+        """用户时长 / 参考时长（采样帧率未知时按帧数计）"""
+        ref_fps = reference.sample_fps or 1.0
+        user_fps = user.sample_fps or 1.0
+        return (user_frames / user_fps) / (ref_frames / ref_fps)
+    
+    def fatigue_trend(self, scores: np.ndarray, depth_angles: np.ndarray) -> Dict:
+        """
+        疲劳趋势: 逐次得分与 depth 维度取值的线性斜率
+        
+        Returns:
+            {
+                "score_slope": float,  # 每次得分变化
+                "depth_slope": float,  # 每次 depth 维度角度变化 (度，正值表示幅度变小)
+                "status": "stable" | "declining"
+            }
+        """
+        if len(scores) < 2:
+            return {"score_slope": 0.0, "depth_slope": 0.0, "status": "stable"}
+        
+        reps = np.arange(len(scores), dtype=np.float64)
+        score_slope, depth_slope = np.polyfit(
+            reps, np.stack([scores, depth_angles], axis=1).astype(np.float64), 1
+        )[0]
+        declining = (
+            score_slope < -self.FATIGUE_SCORE_SLOPE
+            or depth_slope > self.FATIGUE_DEPTH_SLOPE
+        )
+        return {
+            "score_slope": round(float(score_slope), 2),
+            "depth_slope": round(float(depth_slope), 2),
+            "status": "declining" if declining else "stable"
+        }
+
+
+# 单例模式（每种动作一个分析器）
+_exercise_analyzers: Dict[int, ExerciseAnalyzer] = {}
+
+def get_exercise_analyzer(exercise_type_id: int) -> ExerciseAnalyzer:
+    """
+    获取动作分析器单例
+
+    Raises:
+        ValueError: 不支持的动作类型
+    """
+    analyzer = _exercise_analyzers.get(exercise_type_id)
+    if analyzer is None:
+        analyzer = ExerciseAnalyzer(get_exercise(exercise_type_id))
+        _exercise_analyzers[exercise_type_id] = analyzer
+    return analyzer
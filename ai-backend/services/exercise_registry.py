@@ -0,0 +1,272 @@
+"""
+动作类型注册表
+
+功能:
+- 按 exercise_type_id（对应 exercise_types 表）登记支持的动作
+- 每个动作以声明式定义描述: 所需特征 (FeatureSpec)、切分信号、对比维度及其阈值和提示
+- 分析和切分都由通用引擎按定义执行，新增动作只需登记一份定义
+- 各动作统一使用 4 个对比维度名 (depth / knee_tracking / torso_lean / balance)，
+  与 API 的 AnalysisResult 结构保持一致
+"""
+
+from typing import Dict, NamedTuple, Tuple
+
+from services.pose_features import (
+    FEATURE_SPECS,
+    FeatureSpec,
+    LEFT_ANKLE,
+    LEFT_HIP,
+    LEFT_KNEE,
+    LEFT_SHOULDER,
+    RIGHT_ANKLE,
+    RIGHT_HIP,
+    RIGHT_KNEE,
+    RIGHT_SHOULDER
+)
+
+
+class DimensionSpec(NamedTuple):
+    """对比维度定义"""
+    features: Tuple[str, ...]           # 取值为这些特征的平均
+    thresholds: Tuple[float, float]     # (pass 上限, warn 上限)，按差异判定
+    precision: int                      # 结果取值的小数位数
+    messages: Dict[str, Tuple[str, str]]  # 各状态的 (message, suggestion)，message 中 {diff} 为差异值
+    user_only: bool = False             # 只看用户自身: 参考值视为 0，差异即用户取值
+
+
+class ExerciseSpec(NamedTuple):
+    """动作定义"""
+    exercise_type_id: int
+    name: str                             # 对应 exercise_types.name
+    features: Dict[str, FeatureSpec]      # 该动作用到的全部特征
+    signal: str                           # 周期切分信号（features 中的特征名）
+    signal_direction: int                 # 1: 信号极大值为动作最低点；-1: 极小值为最低点
+    signal_prominence: float              # 最低点的最小突出度（信号单位）
+    dimensions: Dict[str, DimensionSpec]  # {维度名: 定义}
+    trajectory_features: Tuple[str, ...]  # 轨迹对齐使用的特征
+
+
+SQUAT = ExerciseSpec(
+    exercise_type_id=1,
+    name="squat",
+    features=FEATURE_SPECS,
+    signal="hip_y",
+    signal_direction=1,
+    signal_prominence=0.05,
+    dimensions={
+        # 髋-膝-踝角度差 (度)，角度越小 = 蹲得越深
+        "depth": DimensionSpec(
+            features=("knee_angle",),
+            thresholds=(10, 20),
+            precision=1,
+            messages={
+                "pass": ("下蹲深度良好", "保持当前深度"),
+                "warn": ("下蹲深度略浅（差异 {diff:.1f}°）", "尝试增加下蹲深度，想象坐在椅子上"),
+                "fail": ("下蹲深度不足（差异 {diff:.1f}°）", "需要明显增加下蹲深度，髋部应低于膝盖")
+            }
+        ),
+        # 膝踝横向偏移差
+        "knee_tracking": DimensionSpec(
+            features=("knee_offset",),
+            thresholds=(0.03, 0.06),
+            precision=3,
+            messages={
+                "pass": ("膝盖轨迹良好", "保持当前轨迹"),
+                "warn": ("膝盖轨迹略有偏移", "注意膝盖与脚尖方向一致"),
+                "fail": ("膝盖轨迹偏移明显", "膝盖运动方向应与脚尖一致，避免内扣")
+            }
+        ),
+        # 肩-髋-膝角度差 (度)
+        "torso_lean": DimensionSpec(
+            features=("hip_angle",),
+            thresholds=(10, 20),
+            precision=1,
+            messages={
+                "pass": ("上身姿态良好", "保持挺胸姿态"),
+                "warn": ("上身略有前倾（差异 {diff:.1f}°）", "保持核心稳定，避免过度前倾"),
+                "fail": ("上身前倾过大（差异 {diff:.1f}°）", "加强核心力量，保持上身直立")
+            }
+        ),
+        # 用户左右髋 / 膝平均高度差
+        "balance": DimensionSpec(
+            features=("hip_asymmetry", "knee_asymmetry"),
+            thresholds=(0.02, 0.05),
+            precision=3,
+            messages={
+                "pass": ("左右平衡良好", "保持对称性"),
+                "warn": ("左右略有不平衡", "注意重心均匀分配"),
+                "fail": ("左右明显不平衡", "检查双脚是否均匀受力")
+            },
+            user_only=True
+        )
+    },
+    trajectory_features=("knee_angle", "hip_angle")
+)
+
+LUNGE = ExerciseSpec(
+    exercise_type_id=2,
+    name="lunge",
+    features={
+        "hip_y": FeatureSpec("height", (LEFT_HIP, RIGHT_HIP)),
+        "left_knee_angle": FeatureSpec("angle", (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+        "right_knee_angle": FeatureSpec("angle", (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)),
+        "left_knee_offset": FeatureSpec("horizontal_offset", (LEFT_KNEE, LEFT_ANKLE)),
+        "right_knee_offset": FeatureSpec("horizontal_offset", (RIGHT_KNEE, RIGHT_ANKLE)),
+        "torso_angle": FeatureSpec("incline", (LEFT_SHOULDER, LEFT_HIP)),
+        "hip_asymmetry": FeatureSpec("vertical_offset", (LEFT_HIP, RIGHT_HIP)),
+        "shoulder_asymmetry": FeatureSpec("vertical_offset", (LEFT_SHOULDER, RIGHT_SHOULDER))
+    },
+    signal="hip_y",
+    signal_direction=1,
+    signal_prominence=0.04,
+    dimensions={
+        # 前后腿膝角平均差 (度)
+        "depth": DimensionSpec(
+            features=("left_knee_angle", "right_knee_angle"),
+            thresholds=(10, 20),
+            precision=1,
+            messages={
+                "pass": ("弓步深度良好", "保持当前深度"),
+                "warn": ("弓步深度略浅（差异 {diff:.1f}°）", "后膝再向地面靠近一些"),
+                "fail": ("弓步深度不足（差异 {diff:.1f}°）", "下沉至前后膝都接近 90°")
+            }
+        ),
+        # 双膝与脚踝横向偏移差
+        "knee_tracking": DimensionSpec(
+            features=("left_knee_offset", "right_knee_offset"),
+            thresholds=(0.03, 0.06),
+            precision=3,
+            messages={
+                "pass": ("膝盖轨迹良好", "保持当前轨迹"),
+                "warn": ("膝盖轨迹略有偏移", "前膝对准第二脚趾方向"),
+                "fail": ("膝盖轨迹偏移明显", "避免前膝内扣或外翻")
+            }
+        ),
+        # 躯干倾角差 (度)
+        "torso_lean": DimensionSpec(
+            features=("torso_angle",),
+            thresholds=(8, 15),
+            precision=1,
+            messages={
+                "pass": ("上身姿态良好", "保持上身直立"),
+                "warn": ("上身略有前倾（差异 {diff:.1f}°）", "收紧核心，上身保持竖直"),
+                "fail": ("上身前倾过大（差异 {diff:.1f}°）", "减小步幅或下沉深度，保持上身直立")
+            }
+        ),
+        # 用户左右髋 / 肩高度差
+        "balance": DimensionSpec(
+            features=("hip_asymmetry", "shoulder_asymmetry"),
+            thresholds=(0.03, 0.06),
+            precision=3,
+            messages={
+                "pass": ("骨盆与肩部水平", "保持稳定"),
+                "warn": ("骨盆或肩部略有倾斜", "注意保持髋部水平"),
+                "fail": ("骨盆或肩部倾斜明显", "降低深度，先保证身体稳定")
+            },
+            user_only=True
+        )
+    },
+    trajectory_features=("left_knee_angle", "right_knee_angle")
+)
+
+DEADLIFT = ExerciseSpec(
+    exercise_type_id=3,
+    name="deadlift",
+    features={
+        "hip_angle": FeatureSpec("angle", (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE)),
+        "knee_angle": FeatureSpec("angle", (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+        "knee_offset": FeatureSpec("horizontal_offset", (LEFT_KNEE, LEFT_ANKLE)),
+        "torso_angle": FeatureSpec("incline", (LEFT_SHOULDER, LEFT_HIP)),
+        "hip_asymmetry": FeatureSpec("vertical_offset", (LEFT_HIP, RIGHT_HIP)),
+        "shoulder_asymmetry": FeatureSpec("vertical_offset", (LEFT_SHOULDER, RIGHT_SHOULDER))
+    },
+    # 髋角最小时为最低点（屈髋最充分）
+    signal="hip_angle",
+    signal_direction=-1,
+    signal_prominence=20.0,
+    dimensions={
+        # 屈髋角度差 (度)
+        "depth": DimensionSpec(
+            features=("hip_angle",),
+            thresholds=(10, 20),
+            precision=1,
+            messages={
+                "pass": ("屈髋幅度良好", "保持当前幅度"),
+                "warn": ("屈髋幅度略有差异（差异 {diff:.1f}°）", "以髋为轴，臀部向后推"),
+                "fail": ("屈髋幅度差异明显（差异 {diff:.1f}°）", "动作由屈髋主导，而不是弯腰或下蹲")
+            }
+        ),
+        # 膝踝横向偏移差
+        "knee_tracking": DimensionSpec(
+            features=("knee_offset",),
+            thresholds=(0.03, 0.06),
+            precision=3,
+            messages={
+                "pass": ("膝盖位置良好", "保持当前位置"),
+                "warn": ("膝盖略有偏移", "膝盖微屈并保持在脚踝上方"),
+                "fail": ("膝盖偏移明显", "避免膝盖过度前移或内扣")
+            }
+        ),
+        # 背部倾角差 (度)
+        "torso_lean": DimensionSpec(
+            features=("torso_angle",),
+            thresholds=(10, 20),
+            precision=1,
+            messages={
+                "pass": ("背部角度良好", "保持背部平直"),
+                "warn": ("背部角度略有差异（差异 {diff:.1f}°）", "注意躯干与参考动作的角度一致"),
+                "fail": ("背部角度差异明显（差异 {diff:.1f}°）", "放慢速度，保持脊柱中立")
+            }
+        ),
+        # 用户左右髋 / 肩高度差
+        "balance": DimensionSpec(
+            features=("hip_asymmetry", "shoulder_asymmetry"),
+            thresholds=(0.02, 0.05),
+            precision=3,
+            messages={
+                "pass": ("左右平衡良好", "保持对称性"),
+                "warn": ("左右略有不平衡", "注意双脚均匀发力"),
+                "fail": ("左右明显不平衡", "检查站距和握距是否对称")
+            },
+            user_only=True
+        )
+    },
+    trajectory_features=("hip_angle", "knee_angle")
+)
+
+_EXERCISES: Dict[int, ExerciseSpec] = {}
+
+
+def register_exercise(exercise: ExerciseSpec):
+    """登记动作定义（同一 ID 重复登记时覆盖）"""
+    unknown = {
+        name
+        for dimension in exercise.dimensions.values()
+        for name in dimension.features
+    } | {exercise.signal, *exercise.trajectory_features}
+    unknown -= set(exercise.features)
+    if unknown:
+        raise ValueError(f"动作 {exercise.name} 引用了未定义的特征: {sorted(unknown)}")
+    _EXERCISES[exercise.exercise_type_id] = exercise
+
+
+def get_exercise(exercise_type_id: int) -> ExerciseSpec:
+    """
+    按 exercise_type_id 获取动作定义
+
+    Raises:
+        ValueError: 不支持的动作类型
+    """
+    exercise = _EXERCISES.get(exercise_type_id)
+    if exercise is None:
+        raise ValueError(f"不支持的动作类型: {exercise_type_id}")
+    return exercise
+
+
+def supported_exercises() -> Dict[int, str]:
+    """已登记的动作 {exercise_type_id: name}"""
+    return {exercise_type_id: e.name for exercise_type_id, e in _EXERCISES.items()}
+
+
+for _exercise in (SQUAT, LUNGE, DEADLIFT):
+    register_exercise(_exercise)
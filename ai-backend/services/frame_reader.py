@@ -0,0 +1,223 @@
+"""
+视频帧读取服务
+
+功能:
+- 按采样步长读取视频帧并转换为 RGB（非采样帧仅 grab，不解码到数组）
+- 可选后台解码线程 + 有界预取队列，使解码与推理重叠执行
+- 可选推理分辨率上限: 先缩小再做颜色转换，一次 resize 写入复用的缓冲区
+- RGB 帧缓冲区预分配并循环复用，避免逐帧分配内存
+- 统计各阶段耗时（解码 / 缩放 / 颜色转换 / 等待）
+"""
+
+import cv2
+import numpy as np
+import queue
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_END = object()
+
+
+class FrameReader:
+    """视频帧读取器"""
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        stride: int = 1,
+        max_frames: Optional[int] = None,
+        queue_depth: int = 0,
+        max_size: Optional[int] = None
+    ):
+        """
+        Args:
+            cap: 已打开的 cv2.VideoCapture（启用预取后仅由解码线程访问）
+            stride: 采样步长，每 stride 帧输出 1 帧
+            max_frames: 最多输出的帧数（None 表示读到视频结尾）
+            queue_depth: 预取队列深度，0 表示在调用线程中同步解码
+            max_size: 输出帧长边的像素上限（None 表示保持原分辨率），等比缩放，
+                归一化坐标不受影响
+        """
+        self.cap = cap
+        self.stride = max(1, int(stride))
+        self.max_frames = max_frames
+        self.queue_depth = max(0, int(queue_depth))
+        self.max_size = max_size
+
+        # 各阶段耗时（秒）
+        self.decode_seconds = 0.0
+        self.resize_seconds = 0.0
+        self.convert_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.frames_read = 0
+
+        # 下一个待读取帧的原始帧号（自行计数，不依赖 CAP_PROP_POS_FRAMES 的精度）
+        self._position = max(0, int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        self._bgr: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+        self._target_size: Optional[Tuple[int, int]] = None  # (宽, 高)
+        self._free: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()
+        self._ready: "queue.Queue" = queue.Queue(maxsize=max(self.queue_depth, 1))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+        # 缓冲区数量 = 队列深度 + 消费者正在使用的 1 个 + 解码线程正在填充的 1 个
+        for _ in range(self.queue_depth + 2):
+            self._free.put(None)
+
+    # ================================
+    # 解码
+    # ================================
+
+    def _read_next(self, rgb: Optional[np.ndarray]) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        读取下一个采样帧到 rgb 缓冲区
+
+        Returns:
+            (frame_index, rgb) 或 None（视频结束 / 达到帧数上限）
+        """
+        if self.max_frames and self.frames_read >= self.max_frames:
+            return None
+
+        start = time.perf_counter()
+        # 非采样帧: 仅推进解码器
+        while self._position % self.stride != 0:
+            if not self.cap.grab():
+                self.decode_seconds += time.perf_counter() - start
+                return None
+            self._position += 1
+
+        ret, self._bgr = self.cap.read(self._bgr)
+        self.decode_seconds += time.perf_counter() - start
+        if not ret:
+            return None
+        frame_index = self._position
+        self._position += 1
+
+        bgr = self._resize(self._bgr)
+
+        start = time.perf_counter()
+        if rgb is None or rgb.shape != bgr.shape:
+            rgb = np.empty_like(bgr)
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        self.convert_seconds += time.perf_counter() - start
+
+        self.frames_read += 1
+        return frame_index, rgb
+
+    def _resize(self, bgr: np.ndarray) -> np.ndarray:
+        """按 max_size 等比缩小到复用的缓冲区（无需缩小时原样返回）"""
+        if not self.max_size:
+            return bgr
+
+        height, width = bgr.shape[:2]
+        if self._target_size is None:
+            scale = self.max_size / max(height, width)
+            if scale >= 1:
+                self._target_size = (width, height)
+            else:
+                self._target_size = (
+                    max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+                )
+        if self._target_size == (width, height):
+            return bgr
+
+        start = time.perf_counter()
+        shape = (self._target_size[1], self._target_size[0], bgr.shape[2])
+        if self._small is None or self._small.shape != shape:
+            self._small = np.empty(shape, dtype=bgr.dtype)
+        cv2.resize(bgr, self._target_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self.resize_seconds += time.perf_counter() - start
+        return self._small
+
+    def _decode_loop(self):
+        """后台解码线程: 取空闲缓冲区 → 解码 → 放入就绪队列"""
+        try:
+            while not self._stop.is_set():
+                rgb = self._free.get()
+                if self._stop.is_set():
+                    break
+                item = self._read_next(rgb)
+                if item is None:
+                    break
+                self._put(item)
+        except BaseException as e:  # 异常转交给消费者线程抛出
+            self._error = e
+        finally:
+            self._put(_END)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._ready.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # ================================
+    # 消费
+    # ================================
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        逐帧产出 (frame_index, frame_rgb)
+
+        frame_rgb 缓冲区会被复用，使用完毕后应调用 recycle() 归还
+        """
+        if self.queue_depth == 0:
+            rgb = None
+            while True:
+                item = self._read_next(rgb)
+                if item is None:
+                    return
+                rgb = item[1]
+                yield item
+            return
+
+        self._thread = threading.Thread(
+            target=self._decode_loop, name="frame-decoder", daemon=True
+        )
+        self._thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._ready.get()
+                self.wait_seconds += time.perf_counter() - start
+                if item is _END:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def recycle(self, frame_rgb: np.ndarray):
+        """归还帧缓冲区，供解码线程复用（同步模式下无需调用）"""
+        if self.queue_depth > 0:
+            self._free.put(frame_rgb)
+
+    def close(self):
+        """停止解码线程（提前结束迭代时调用）"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._free.put(None)  # 唤醒等待空闲缓冲区的解码线程
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """各阶段耗时统计（秒）"""
+        return {
+            "decode_seconds": round(self.decode_seconds, 3),
+            "resize_seconds": round(self.resize_seconds, 3),
+            "convert_seconds": round(self.convert_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "frames_read": self.frames_read
+        }
@@ -0,0 +1,299 @@
+"""
+分析任务调度器
+
+功能:
+- 任务先写入持久化队列 (TaskQueue) 再执行，进程崩溃或机器停止后重启仍会继续处理
+- 按任务类型注册处理函数，工作协程从队列领取任务并在运行中定期续约
+- 限制同时运行的分析任务数（每个任务都会在 API 进程中持有视频和关键点序列）
+- 有界等待队列: 队列满时拒绝提交，由 API 返回 503 + Retry-After
+- 失败按退避重试；租约超时的任务由回收协程重新排队，次数用完后通知失败回调
+- 输出队列深度、运行数、重试数、拒绝数等指标
+"""
+
+import asyncio
+import math
+import os
+import socket
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import logging
+
+from services.task_queue import PENDING, QueuedJob, TaskQueue, get_task_queue
+
+logger = logging.getLogger(__name__)
+
+# 处理函数: handler(**payload)
+JobHandler = Callable[..., Awaitable[None]]
+# 失败回调: on_failure(payload, error, final)，final 表示不再重试
+FailureHandler = Callable[[Dict[str, Any], str, bool], Awaitable[None]]
+
+
+class SchedulerSaturated(Exception):
+    """调度器已满，暂时不能接收新任务"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"分析队列已满，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobScheduler:
+    """持久化、有界并发的异步任务调度器"""
+
+    # 尚无耗时样本时假设的单个任务耗时 (秒)
+    DEFAULT_JOB_SECONDS = 30.0
+    # 参与估算的最近任务数
+    DURATION_WINDOW = 20
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        max_concurrency: int = 1,
+        max_queue: int = 10,
+        poll_interval: float = 2.0,
+        reap_interval: float = 30.0
+    ):
+        """
+        Args:
+            queue: 持久化任务队列
+            max_concurrency: 同时运行的任务数上限
+            max_queue: 等待中的任务数上限（不含运行中的任务）
+            poll_interval: 队列为空时的轮询间隔 (秒)（提交新任务会立即唤醒）
+            reap_interval: 回收超时租约的间隔 (秒)
+        """
+        self.queue = queue
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.poll_interval = poll_interval
+        self.reap_interval = reap_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, Tuple[JobHandler, Optional[FailureHandler]]] = {}
+        self._reapers: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._durations: Deque[float] = deque(maxlen=self.DURATION_WINDOW)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        on_failure: Optional[FailureHandler] = None
+    ):
+        """
+        注册任务类型
+
+        Args:
+            kind: 任务类型
+            handler: 处理函数，以 payload 为关键字参数调用，抛出异常表示失败
+            on_failure: 每次失败后调用（含是否为最终失败），用于更新业务状态
+        """
+        self._handlers[kind] = (handler, on_failure)
+
+    def register_reaper(self, reaper: Callable[[], Awaitable[None]]):
+        """注册随回收协程周期执行的清理函数（如回收业务表中的僵尸记录）"""
+        self._reapers.append(reaper)
+
+    async def start(self):
+        """恢复上次遗留的任务并启动工作协程和回收协程（应用启动时调用）"""
+        if self._tasks:
+            return
+        await self._recover()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"analysis-worker-{i}")
+            for i in range(self.max_concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._reaper(), name="analysis-reaper"))
+        logger.info(
+            f"分析调度器已启动: {self.owner}, 并发 {self.max_concurrency}, 队列上限 {self.max_queue}"
+        )
+
+    async def shutdown(self):
+        """停止工作协程（应用关闭时调用），被中断的任务释放租约，重启后继续"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(self.queue.release, [self.owner])
+        if released:
+            logger.warning(f"调度器关闭，{released} 个运行中的任务将在重启后重新执行")
+
+    async def _recover(self):
+        """释放本机已退出进程持有的租约，并回收超时任务"""
+        host = self.owner.rsplit(":", 1)[0]
+        stale = []
+        for owner in await asyncio.to_thread(self.queue.lease_owners):
+            owner_host, _, pid = owner.rpartition(":")
+            if owner_host == host and owner != self.owner and not _process_alive(int(pid)):
+                stale.append(owner)
+        if stale:
+            released = await asyncio.to_thread(self.queue.release, stale)
+            logger.warning(f"恢复已退出进程遗留的任务 {released} 个: {stale}")
+        await self._reap_once()
+
+    async def queued(self) -> int:
+        """等待中的任务数（含退避等待重试的任务）"""
+        counts = await asyncio.to_thread(self.queue.counts)
+        return counts[PENDING]
+
+    async def check_capacity(self):
+        """
+        提交前检查容量（用于在创建数据库记录之前快速拒绝）
+
+        Raises:
+            SchedulerSaturated: 调度器已满
+        """
+        queued = await self.queued()
+        if queued + self.running >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise SchedulerSaturated(self.retry_after(queued))
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> int:
+        """
+        提交任务（写入持久化队列后立即返回）
+
+        Returns:
+            队列中的任务 ID
+
+        Raises:
+            SchedulerSaturated: 调度器已满
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未注册的任务类型: {kind}")
+        await self.check_capacity()
+        job_id = await asyncio.to_thread(self.queue.enqueue, kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info(f"任务已入队: {kind}#{job_id} (运行 {self.running})")
+        return job_id
+
+    def retry_after(self, queued: int) -> int:
+        """建议的重试等待时间 (秒): 排在前面的任务按最近平均耗时、按并发数分批完成"""
+        average = (
+            sum(self._durations) / len(self._durations)
+            if self._durations else self.DEFAULT_JOB_SECONDS
+        )
+        rounds = (queued + self.running) / self.max_concurrency
+        return max(1, math.ceil(average * max(rounds, 1)))
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.queue.claim, self.owner)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: QueuedJob):
+        handler, _ = self._handlers.get(job.kind, (None, None))
+        name = f"{job.kind}#{job.id}"
+        self.running += 1
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            if handler is None:
+                raise Exception(f"未注册的任务类型: {job.kind}")
+            logger.info(f"开始执行任务 {name} (第 {job.attempts}/{job.max_attempts} 次)")
+            await handler(**job.payload)
+            await asyncio.to_thread(self.queue.complete, job.id, self.owner)
+            self.completed += 1
+        except asyncio.CancelledError:
+            # 调度器关闭: 保留租约，由 shutdown 统一释放
+            raise
+        except Exception as e:
+            retry = await asyncio.to_thread(self.queue.fail, job.id, self.owner, str(e))
+            if retry:
+                self.retried += 1
+                logger.warning(f"任务 {name} 失败，将重试: {e}")
+            else:
+                self.failed += 1
+                logger.error(f"任务 {name} 失败，不再重试: {e}")
+            await self._notify_failure(job, str(e), final=not retry)
+        finally:
+            heartbeat.cancel()
+            self._durations.append(time.monotonic() - started)
+            self.running -= 1
+
+    async def _heartbeat(self, job: QueuedJob):
+        """运行期间按可见性超时的 1/3 续约"""
+        interval = max(self.queue.visibility_timeout / 3, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            if not await asyncio.to_thread(self.queue.heartbeat, job.id, self.owner):
+                logger.warning(f"任务 {job.kind}#{job.id} 的租约已失效")
+                return
+
+    async def _notify_failure(self, job: QueuedJob, error: str, final: bool):
+        _, on_failure = self._handlers.get(job.kind, (None, None))
+        if on_failure is None:
+            return
+        try:
+            await on_failure(job.payload, error, final)
+        except Exception as e:
+            logger.error(f"任务 {job.kind}#{job.id} 的失败回调出错: {e}")
+
+    async def _reap_once(self):
+        for job in await asyncio.to_thread(self.queue.reap):
+            self.failed += 1
+            await self._notify_failure(job, "处理超时", final=True)
+        for reaper in self._reapers:
+            try:
+                await reaper()
+            except Exception as e:
+                logger.error(f"清理函数执行失败: {e}")
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            await self._reap_once()
+            # 重新排队的任务可能已到可执行时间
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.queue.counts()
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": counts[PENDING],
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "queue": counts,
+            "started": bool(self._tasks)
+        }
+
+
+# 单例模式
+_job_scheduler_instance: Optional[JobScheduler] = None
+
+def get_job_scheduler() -> JobScheduler:
+    """获取分析任务调度器单例"""
+    global _job_scheduler_instance
+    if _job_scheduler_instance is None:
+        _job_scheduler_instance = JobScheduler(
+            queue=get_task_queue(),
+            max_concurrency=int(os.getenv("ANALYSIS_MAX_CONCURRENCY", 1)),
+            max_queue=int(os.getenv("ANALYSIS_QUEUE_SIZE", 10))
+        )
+    return _job_scheduler_instance
@@ -0,0 +1,228 @@
+"""
+关键点缓存服务
+
+功能:
+- 按 视频内容哈希 + 提取参数 缓存 PoseSequence，命中时跳过推理
+- 记录 Storage 路径 → 内容哈希 的映射，命中时连下载也一并跳过
+- Storage 对象有强 ETag 时以 ETag 作为内容标识（不下载即可查询缓存，分段并行提取不必整段哈希）
+- 本地磁盘 .npz 二进制存储，按字节预算做 LRU 淘汰
+- 统计命中 / 未命中 / 淘汰次数
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+from models.pose_sequence import PoseSequence
+
+logger = logging.getLogger(__name__)
+
+_ENTRY_SUFFIX = ".npz"
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def storage_content_id(url: str, timeout: float = 10.0) -> Optional[str]:
+    """
+    由 Storage 对象的 ETag 得到内容标识（HEAD 请求，不下载内容）
+
+    对象存储的强 ETag 由内容计算，同一路径被覆盖时随之变化，相同内容在不同路径下相同；
+    没有强 ETag（未返回或为弱 ETag）或请求失败时返回 None
+
+    Returns:
+        "etag:<ETag>:<字节数>" 或 None
+    """
+    import httpx
+
+    try:
+        response = httpx.head(url, timeout=timeout, follow_redirects=True)
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"读取视频 ETag 失败: {e}")
+        return None
+    etag = response.headers.get("etag", "").strip().strip('"')
+    if not etag or etag.startswith("W/"):
+        return None
+    size = response.headers.get("content-length", "")
+    return f"etag:{etag}:{size}"
+
+
+class LandmarkCache:
+    """关键点磁盘缓存（线程安全，LRU）"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存条目总字节数上限
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries_dir = os.path.join(cache_dir, "entries")
+        self._aliases_dir = os.path.join(cache_dir, "aliases")
+        os.makedirs(self._entries_dir, exist_ok=True)
+        os.makedirs(self._aliases_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key → 字节数，按最近使用排序
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+        logger.info(
+            f"关键点缓存初始化: {cache_dir}, {len(self._entries)} 条, "
+            f"{self._bytes}/{max_bytes} 字节"
+        )
+
+    def _load_index(self):
+        """从磁盘重建 LRU 索引（按修改时间排序，最近使用的在后）"""
+        files = []
+        for name in os.listdir(self._entries_dir):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(self._entries_dir, name))
+            files.append((stat.st_mtime, name[:-len(_ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._bytes += size
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._entries_dir, key + _ENTRY_SUFFIX)
+
+    @staticmethod
+    def make_key(content_hash: str, params: Dict[str, Any]) -> str:
+        """缓存键 = sha256(内容哈希 + 排序后的提取参数)"""
+        payload = json.dumps(
+            {"content": content_hash, "params": params}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ================================
+    # Storage 路径 → 内容哈希
+    # ================================
+
+    def _alias_path(self, source: str) -> str:
+        name = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        return os.path.join(self._aliases_dir, name)
+
+    def resolve_alias(self, source: str) -> Optional[str]:
+        """查询 Storage 路径对应的内容哈希（未记录时返回 None）"""
+        try:
+            with open(self._alias_path(source), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def record_alias(self, source: str, content_hash: str):
+        """记录 Storage 路径对应的内容哈希（Storage 中的对象上传后不再修改）"""
+        path = self._alias_path(source)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content_hash)
+        os.replace(tmp_path, path)
+
+    # ================================
+    # 缓存条目
+    # ================================
+
+    def get(self, key: str) -> Optional[PoseSequence]:
+        """读取缓存条目，命中时刷新 LRU 顺序"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        path = self._entry_path(key)
+        try:
+            sequence = PoseSequence.load(path)
+            os.utime(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"缓存条目损坏，已丢弃: {key}: {e}")
+            self._discard(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return sequence
+
+    def put(self, key: str, sequence: PoseSequence):
+        """写入缓存条目，超出字节预算时淘汰最久未使用的条目"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            sequence.save(f)
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._entry_path(old_key))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.info(f"关键点缓存淘汰 {len(evicted)} 条")
+
+    def _discard(self, key: str):
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率与容量统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# 单例模式
+_landmark_cache_instance: Optional[LandmarkCache] = None
+
+def get_landmark_cache() -> LandmarkCache:
+    """获取关键点缓存单例"""
+    global _landmark_cache_instance
+    if _landmark_cache_instance is None:
+        _landmark_cache_instance = LandmarkCache(
+            cache_dir=os.getenv("LANDMARK_CACHE_DIR", "/tmp/movechecker/landmarks"),
+            max_bytes=int(os.getenv("LANDMARK_CACHE_MAX_MB", 256)) * 1024 * 1024
+        )
+    return _landmark_cache_instance
@@ -3,16 +3,28 @@ MediaPipe 姿态识别服务
 对应任务: T2.3 - 实现 MediaPipe 姿态识别服务
 
 功能:
-- 从视频文件中提取人体姿态关键点
-- 返回每一帧的 33 个关键点坐标 (x, y, z, visibility)
+- 从视频文件中提取人体姿态关键点（支持逐帧产出的生成器接口）
+- 返回每一帧的 33 个关键点坐标 (x, y, z, visibility)，以 PoseSequence 列式存储
 - 支持配置置信度阈值
+- 级联模式: 先用轻量模型处理全片，仅对低置信度片段用更重的模型重新推理
+- 推理分辨率上限 + 可选的人体区域 (ROI) 裁剪，降低逐帧转换与推理的数据量
 """
 
 import cv2
 import mediapipe as mp
 import numpy as np
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import logging
+import os
+import time
+
+from models.pose_sequence import PoseSequence, PoseSequenceBuilder, X, Y, Z, VISIBILITY
+from services.pose_features import (
+    LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE
+)
+from services.frame_reader import FrameReader
+from services.pose_pool import PosePool
+from services.video_stream import VideoSource, open_capture, release_capture
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +34,9 @@ logger = logging.getLogger(__name__)
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 
+# 级联模式下参与置信度判断的关键关节（髋、膝、踝）
+KEY_JOINTS = [LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE]
+
 class MediaPipeService:
     """MediaPipe 姿态识别服务类"""
     
@@ -29,7 +44,15 @@ class MediaPipeService:
         self,
         model_complexity: int = 1,
         min_detection_confidence: float = 0.5,
-        min_tracking_confidence: float = 0.5
+        min_tracking_confidence: float = 0.5,
+        target_fps: Optional[float] = None,
+        prefetch_depth: int = 4,
+        pose_pool: Optional[PosePool] = None,
+        escalation_complexity: Optional[int] = None,
+        escalation_threshold: float = 0.6,
+        escalation_padding: int = 2,
+        max_inference_size: Optional[int] = None,
+        roi_padding: Optional[float] = None
     ):
         """
         初始化 MediaPipe 姿态识别模型
@@ -38,155 +61,417 @@ class MediaPipeService:
             model_complexity: 模型复杂度 (0=Lite, 1=Full, 2=Heavy)
             min_detection_confidence: 最小检测置信度
             min_tracking_confidence: 最小跟踪置信度
+            target_fps: 默认目标采样帧率（None 表示逐帧推理）
+            prefetch_depth: 解码预取队列深度（0 表示解码与推理串行执行）
+            pose_pool: Pose 实例池（None 时创建独立的池）
+            escalation_complexity: 级联模式下重新推理使用的模型复杂度
+                （None 表示不启用级联；需大于 model_complexity）
+            escalation_threshold: 检测置信度或关键关节可见度低于该值的帧需要重新推理
+            escalation_padding: 重新推理片段向两侧扩展的采样帧数（让跟踪状态先稳定）
+            max_inference_size: 推理帧长边的像素上限（None 表示使用原分辨率）
+            roi_padding: ROI 模式下人体框向外扩展的比例（None 表示不裁剪，整帧推理）
         """
         self.model_complexity = model_complexity
         self.min_detection_confidence = min_detection_confidence
         self.min_tracking_confidence = min_tracking_confidence
+        self.target_fps = target_fps
+        self.prefetch_depth = prefetch_depth
+        self.pose_pool = pose_pool or PosePool()
+        if escalation_complexity is not None and escalation_complexity <= model_complexity:
+            escalation_complexity = None
+        self.escalation_complexity = escalation_complexity
+        self.escalation_threshold = escalation_threshold
+        self.escalation_padding = max(0, int(escalation_padding))
+        self.max_inference_size = max_inference_size
+        self.roi_padding = roi_padding
         
         logger.info(
             f"初始化 MediaPipe Pose 模型: "
             f"complexity={model_complexity}, "
             f"detection_conf={min_detection_confidence}, "
-            f"tracking_conf={min_tracking_confidence}"
+            f"tracking_conf={min_tracking_confidence}, "
+            f"target_fps={target_fps}, "
+            f"prefetch_depth={prefetch_depth}, "
+            f"escalation_complexity={self.escalation_complexity}, "
+            f"max_inference_size={max_inference_size}, "
+            f"roi_padding={roi_padding}"
+        )
+    
+    def extraction_params(self) -> Dict[str, any]:
+        """影响提取结果的参数（用作关键点缓存键的一部分）"""
+        return {
+            "model_complexity": self.model_complexity,
+            "min_detection_confidence": self.min_detection_confidence,
+            "min_tracking_confidence": self.min_tracking_confidence,
+            "target_fps": self.target_fps,
+            "escalation_complexity": self.escalation_complexity,
+            "escalation_threshold": (
+                self.escalation_threshold if self.escalation_complexity is not None else None
+            ),
+            "escalation_padding": (
+                self.escalation_padding if self.escalation_complexity is not None else None
+            ),
+            "max_inference_size": self.max_inference_size,
+            "roi_padding": self.roi_padding
+        }
+    
+    def warm_up(self, count: int = 1):
+        """预热 Pose 实例池，避免首个视频承担模型加载与图初始化开销"""
+        self.pose_pool.warm(
+            self.model_complexity,
+            self.min_detection_confidence,
+            self.min_tracking_confidence,
+            count=count
         )
+        if self.escalation_complexity is not None:
+            # 级联模型只处理少量片段，每个进程预热 1 个实例即可
+            self.pose_pool.warm(
+                self.escalation_complexity,
+                self.min_detection_confidence,
+                self.min_tracking_confidence,
+                count=1
+            )
+    
+    def resolve_stride(
+        self,
+        video_fps: float,
+        stride: Optional[int] = None,
+        target_fps: Optional[float] = None
+    ) -> int:
+        """
+        计算帧采样步长
+        
+        显式 stride 优先；否则按 target_fps 从视频帧率换算
+        （例如 60fps 视频 + target_fps=15 → 每 4 帧推理 1 帧）
+        """
+        if stride:
+            return max(1, int(stride))
+        
+        target_fps = target_fps or self.target_fps
+        if not target_fps or video_fps <= 0 or target_fps >= video_fps:
+            return 1
+        return max(1, int(round(video_fps / target_fps)))
+    
+    def iter_pose_landmarks(
+        self,
+        video_path: VideoSource,
+        max_frames: Optional[int] = None,
+        stride: Optional[int] = None,
+        target_fps: Optional[float] = None,
+        queue_depth: Optional[int] = None,
+        info: Optional[Dict[str, any]] = None,
+        start_frame: int = 0
+    ) -> Iterator[Tuple[int, float, Optional[np.ndarray]]]:
+        """
+        逐帧产出姿态关键点（推理完成一帧即产出一帧，不在内部累积）
+        
+        跳过的帧只调用 cap.grab() 推进解码器，不做 retrieve / 颜色转换 / 推理；
+        启用预取时由后台线程解码，推理循环只消费就绪的 RGB 帧。
+        消费方提前结束迭代（close）时，解码线程和视频句柄被释放，Pose 实例重置后归还实例池
+        
+        Args:
+            video_path: 视频文件路径，或边下载边解码的 StreamingBuffer
+            max_frames: 最大推理帧数（None 表示处理全部）
+            stride: 采样步长，每 stride 帧推理 1 帧（优先于 target_fps）
+            target_fps: 目标采样帧率（None 时使用服务默认值）
+            queue_depth: 预取队列深度（None 时使用服务默认值，0 表示串行）
+            info: 可选字典，产出第一帧前写入视频元数据
+                (video_fps, video_width, video_height, total_frames, stride)，
+                迭代结束后写入 timings；视频无法打开时写入 error
+            start_frame: 从该原始帧号开始读取（seek；分段并行提取时使用）
+        
+        Yields:
+            (frame_index, timestamp, landmarks)，未检测到人体时 landmarks 为 None
+        """
+        if info is None:
+            info = {}
+        
+        # 打开视频文件
+        cap = open_capture(video_path)
+        if not cap.isOpened():
+            info["error"] = f"无法打开视频文件: {video_path}"
+            logger.error(info["error"])
+            return
+        
+        # 获取视频元数据
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        stride = self.resolve_stride(video_fps, stride, target_fps)
+        info["video_fps"] = video_fps
+        info["video_width"] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        info["video_height"] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        info["total_frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        info["stride"] = stride
+        
+        logger.info(
+            f"视频信息: {info['video_width']}x{info['video_height']}, "
+            f"{video_fps}fps, {info['total_frames']} 帧, 采样步长 {stride}"
+        )
+        
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        
+        if queue_depth is None:
+            queue_depth = self.prefetch_depth
+        reader = FrameReader(
+            cap,
+            stride=stride,
+            max_frames=max_frames,
+            queue_depth=queue_depth,
+            max_size=self.max_inference_size
+        )
+        inference_seconds = 0.0
+        started_at = time.perf_counter()
+        
+        try:
+            # 从实例池签出 MediaPipe Pose（视频模式，归还时重置跟踪状态）
+            with self.pose_pool.acquire(
+                self.model_complexity,
+                self.min_detection_confidence,
+                self.min_tracking_confidence
+            ) as pose:
+                roi = None
+                for frame_index, frame_rgb in reader:
+                    # 计算时间戳
+                    timestamp = frame_index / video_fps if video_fps > 0 else 0
+                    
+                    # 执行姿态检测（ROI 模式下在上一帧的人体区域内检测）
+                    inference_start = time.perf_counter()
+                    landmarks, roi = self._process_frame(pose, frame_rgb, roi)
+                    inference_seconds += time.perf_counter() - inference_start
+                    reader.recycle(frame_rgb)
+                    
+                    # 提取关键点
+                    if landmarks is not None:
+                        yield frame_index, timestamp, landmarks
+                    else:
+                        # 未检测到姿态
+                        logger.warning(f"帧 {frame_index}: 未检测到人体姿态")
+                        yield frame_index, timestamp, None
+            
+            if max_frames and reader.frames_read >= max_frames:
+                logger.info(f"达到最大帧数限制: {max_frames}")
+        finally:
+            reader.close()
+            release_capture(cap, video_path)
+            info["timings"] = {
+                **reader.timings,
+                "inference_seconds": round(inference_seconds, 3),
+                "total_seconds": round(time.perf_counter() - started_at, 3),
+                "queue_depth": queue_depth
+            }
     
     def extract_pose_landmarks(
         self,
-        video_path: str,
-        max_frames: Optional[int] = None
+        video_path: VideoSource,
+        max_frames: Optional[int] = None,
+        stride: Optional[int] = None,
+        target_fps: Optional[float] = None,
+        queue_depth: Optional[int] = None,
+        stop_condition: Optional[Callable[[int, Optional[np.ndarray], Dict], bool]] = None,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None,
+        on_frame: Optional[Callable[[int, Dict], None]] = None
     ) -> Dict[str, any]:
         """
-        从视频中提取姿态关键点
+        从视频中提取姿态关键点（收集 iter_pose_landmarks 的输出）
         
         Args:
-            video_path: 视频文件路径
-            max_frames: 最大处理帧数（None 表示处理全部）
+            video_path: 视频文件路径，或边下载边解码的 StreamingBuffer
+            max_frames: 最大推理帧数（None 表示处理全部）
+            stride: 采样步长，每 stride 帧推理 1 帧（优先于 target_fps）
+            target_fps: 目标采样帧率（None 时使用服务默认值）
+            queue_depth: 预取队列深度（None 时使用服务默认值，0 表示串行）
+            stop_condition: 每帧推理后调用 stop_condition(frame_index, landmarks, result)，
+                返回 True 时停止解码和推理（如 CycleStopCondition: 凑够 N 个周期即停止）
+            start_frame: 起始原始帧号（含）
+            end_frame: 结束原始帧号（不含，None 表示读到视频结尾）
+            on_frame: 每帧推理后调用 on_frame(frame_index, result)，用于上报进度
         
         Returns:
             {
                 "success": bool,
-                "frames": [
-                    {
-                        "frame_index": int,
-                        "timestamp": float,
-                        "landmarks": [
-                            {"x": float, "y": float, "z": float, "visibility": float},
-                            ...  # 33 个关键点
-                        ],
-                        "detection_confidence": float
-                    },
-                    ...
-                ],
+                "sequence": PoseSequence,  # (T, 33, 4) 关键点 + 有效帧掩码 + 时间戳
                 "total_frames": int,
                 "video_fps": float,
                 "video_width": int,
                 "video_height": int,
+                "stride": int,  # 实际采样步长
+                "stopped_early": bool,  # 是否因 stop_condition 提前停止
+                "timings": {  # 各阶段耗时（秒）
+                    "decode_seconds", "convert_seconds", "wait_seconds",
+                    "inference_seconds", "total_seconds", "frames_read",
+                    "escalation_seconds"
+                },
+                "cascade": {  # 仅级联模式
+                    "windows", "frames_rerun", "frames_replaced"
+                },
                 "error": str (if failed)
             }
         """
         result = {
             "success": False,
-            "frames": [],
+            "sequence": None,
             "total_frames": 0,
             "video_fps": 0.0,
             "video_width": 0,
-            "video_height": 0
+            "video_height": 0,
+            "stride": 1,
+            "stopped_early": False,
+            "timings": {}
         }
+        started_at = time.perf_counter()
         
-        # 打开视频文件
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            result["error"] = f"无法打开视频文件: {video_path}"
-            logger.error(result["error"])
-            return result
+        builder = None
+        frames = self.iter_pose_landmarks(
+            video_path, max_frames, stride, target_fps, queue_depth,
+            info=result, start_frame=start_frame
+        )
+        for frame_index, timestamp, landmarks in frames:
+            if end_frame is not None and frame_index >= end_frame:
+                frames.close()
+                break
+            if builder is None:
+                # 预分配关键点缓冲区（帧数元数据可能不准确，缓冲区会按需增长）
+                span = (end_frame or result["total_frames"]) - start_frame
+                capacity = -(-span // result["stride"])
+                if max_frames:
+                    capacity = min(capacity, max_frames) if capacity > 0 else max_frames
+                builder = PoseSequenceBuilder(capacity=capacity or 256)
+            builder.append(frame_index, timestamp, landmarks)
+            if on_frame is not None:
+                on_frame(frame_index, result)
+            
+            if stop_condition is not None and stop_condition(frame_index, landmarks, result):
+                # 关闭生成器: 停止解码线程并归还 Pose 实例
+                frames.close()
+                result["stopped_early"] = True
+                logger.info(f"满足停止条件，在帧 {frame_index} 提前结束提取")
+                break
         
-        # 获取视频元数据
-        result["video_fps"] = cap.get(cv2.CAP_PROP_FPS)
-        result["video_width"] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        result["video_height"] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        result["total_frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if "error" in result:
+            return result
         
-        logger.info(
-            f"视频信息: {result['video_width']}x{result['video_height']}, "
-            f"{result['video_fps']}fps, {result['total_frames']} 帧"
+        sequence = (builder or PoseSequenceBuilder()).build(
+            fps=result["video_fps"],
+            width=result["video_width"],
+            height=result["video_height"],
+            total_frames=result["total_frames"],
+            stride=result["stride"],
+            model_complexity=self.model_complexity
         )
+        result["sequence"] = sequence
         
-        # 初始化 MediaPipe Pose
-        with mp_pose.Pose(
-            model_complexity=self.model_complexity,
-            min_detection_confidence=self.min_detection_confidence,
-            min_tracking_confidence=self.min_tracking_confidence,
-            static_image_mode=False  # 视频模式
-        ) as pose:
-            frame_index = 0
-            
-            while cap.isOpened():
-                # 检查是否达到最大帧数
-                if max_frames and frame_index >= max_frames:
-                    logger.info(f"达到最大帧数限制: {max_frames}")
-                    break
-                
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # 计算时间戳
-                timestamp = frame_index / result["video_fps"] if result["video_fps"] > 0 else 0
-                
-                # 转换颜色空间 (BGR to RGB)
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # 执行姿态检测
-                pose_results = pose.process(frame_rgb)
-                
-                # 提取关键点
-                if pose_results.pose_landmarks:
-                    landmarks_data = []
-                    for landmark in pose_results.pose_landmarks.landmark:
-                        landmarks_data.append({
-                            "x": landmark.x,
-                            "y": landmark.y,
-                            "z": landmark.z,
-                            "visibility": landmark.visibility
-                        })
-                    
-                    # 计算平均置信度
-                    avg_visibility = np.mean([lm["visibility"] for lm in landmarks_data])
-                    
-                    result["frames"].append({
-                        "frame_index": frame_index,
-                        "timestamp": round(timestamp, 3),
-                        "landmarks": landmarks_data,
-                        "detection_confidence": round(avg_visibility, 3)
-                    })
-                else:
-                    # 未检测到姿态
-                    logger.warning(f"帧 {frame_index}: 未检测到人体姿态")
-                    result["frames"].append({
-                        "frame_index": frame_index,
-                        "timestamp": round(timestamp, 3),
-                        "landmarks": None,
-                        "detection_confidence": 0.0
-                    })
-                
-                frame_index += 1
-        
-        cap.release()
+        # 级联: 低置信度片段用更重的模型重新推理
+        escalation_seconds = 0.0
+        if self.escalation_complexity is not None:
+            escalation_start = time.perf_counter()
+            cap = open_capture(video_path)
+            try:
+                result["cascade"] = self._escalate(cap, sequence)
+            finally:
+                release_capture(cap, video_path)
+            escalation_seconds = time.perf_counter() - escalation_start
+        
+        result["timings"]["escalation_seconds"] = round(escalation_seconds, 3)
+        result["timings"]["total_seconds"] = round(time.perf_counter() - started_at, 3)
+        logger.info(f"姿态提取耗时: {result['timings']}")
         
         # 检查是否成功提取到关键点
-        valid_frames = [f for f in result["frames"] if f["landmarks"] is not None]
-        if len(valid_frames) == 0:
+        if sequence.valid_count == 0:
             result["error"] = "视频中未检测到任何人体姿态"
             logger.error(result["error"])
             return result
         
         result["success"] = True
         logger.info(
-            f"成功提取 {len(valid_frames)}/{len(result['frames'])} 帧的姿态数据"
+            f"成功提取 {sequence.valid_count}/{len(sequence)} 帧的姿态数据"
         )
         
         return result
     
+    def _process_frame(
+        self,
+        pose,
+        frame_rgb: np.ndarray,
+        roi: Optional[Tuple[int, int, int, int]] = None
+    ) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, int, int, int]]]:
+        """
+        对一帧执行姿态检测
+        
+        roi 不为 None 时先在裁剪区域内检测，关键点映射回整帧归一化坐标；
+        区域内未检测到人体时退回整帧检测
+        
+        Returns:
+            ((33, 4) 关键点数组或 None, 下一帧使用的 ROI)
+        """
+        height, width = frame_rgb.shape[:2]
+        landmarks = None
+        
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            pose_results = pose.process(np.ascontiguousarray(frame_rgb[y0:y1, x0:x1]))
+            if pose_results.pose_landmarks:
+                landmarks = roi_to_frame(
+                    landmarks_to_array(pose_results.pose_landmarks), roi, width, height
+                )
+        
+        if landmarks is None:
+            pose_results = pose.process(frame_rgb)
+            if pose_results.pose_landmarks:
+                landmarks = landmarks_to_array(pose_results.pose_landmarks)
+        
+        if landmarks is None or self.roi_padding is None:
+            return landmarks, None
+        return landmarks, person_roi(landmarks, width, height, self.roi_padding)
+    
+    def _escalate(self, cap: cv2.VideoCapture, sequence: PoseSequence) -> Dict[str, int]:
+        """
+        对低置信度片段用 escalation_complexity 模型重新推理，原地合并到 sequence
+        
+        每个片段先 seek 到起始帧再按原采样步长读取；重新推理检测到人体的帧
+        覆盖轻量模型的结果，并在 sequence.model_complexity 中记录产出模型
+        
+        Returns:
+            {"windows": 片段数, "frames_rerun": 重新推理帧数, "frames_replaced": 被覆盖帧数}
+        """
+        windows = low_confidence_windows(
+            sequence, self.escalation_threshold, self.escalation_padding
+        )
+        stats = {"windows": len(windows), "frames_rerun": 0, "frames_replaced": 0}
+        if not windows:
+            return stats
+        
+        with self.pose_pool.acquire(
+            self.escalation_complexity,
+            self.min_detection_confidence,
+            self.min_tracking_confidence
+        ) as pose:
+            for start, end in windows:
+                # 片段之间不连续，清空跟踪状态
+                pose.reset()
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(sequence.frame_indices[start]))
+                reader = FrameReader(
+                    cap,
+                    stride=sequence.stride,
+                    max_frames=end - start + 1,
+                    max_size=self.max_inference_size
+                )
+                for frame_index, frame_rgb in reader:
+                    stats["frames_rerun"] += 1
+                    pos = sequence.position_of_frame(frame_index)
+                    pose_results = pose.process(frame_rgb)
+                    if pos < 0 or not pose_results.pose_landmarks:
+                        continue
+                    landmarks = landmarks_to_array(pose_results.pose_landmarks)
+                    sequence.landmarks[pos] = landmarks
+                    sequence.valid[pos] = True
+                    sequence.detection_confidence[pos] = landmarks[:, VISIBILITY].mean()
+                    sequence.model_complexity[pos] = self.escalation_complexity
+                    stats["frames_replaced"] += 1
+        
+        logger.info(f"级联重新推理: {stats}")
+        return stats
+    
     def visualize_landmarks(
         self,
         frame: np.ndarray,
@@ -220,12 +505,130 @@ class MediaPipeService:
         return annotated_frame
 
 
+def landmarks_to_array(pose_landmarks) -> np.ndarray:
+    """将 MediaPipe pose_landmarks 转换为 (33, 4) float32 数组"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def person_roi(
+    landmarks: np.ndarray,
+    width: int,
+    height: int,
+    padding: float = 0.25,
+    min_size: int = 64
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    由关键点计算人体区域（像素坐标）
+    
+    取可见度 >= 0.5 的关键点的外接框，四边各向外扩展框尺寸的 padding 倍并裁剪到画面内
+    
+    Returns:
+        (x0, y0, x1, y1)，可见关键点过少或区域过小时返回 None
+    """
+    visible = landmarks[landmarks[:, VISIBILITY] >= 0.5]
+    if len(visible) < 4:
+        return None
+    
+    x_min, x_max = visible[:, X].min(), visible[:, X].max()
+    y_min, y_max = visible[:, Y].min(), visible[:, Y].max()
+    pad_x = (x_max - x_min) * padding
+    pad_y = (y_max - y_min) * padding
+    x0 = int(np.clip(x_min - pad_x, 0, 1) * width)
+    x1 = int(np.ceil(np.clip(x_max + pad_x, 0, 1) * width))
+    y0 = int(np.clip(y_min - pad_y, 0, 1) * height)
+    y1 = int(np.ceil(np.clip(y_max + pad_y, 0, 1) * height))
+    if x1 - x0 < min_size or y1 - y0 < min_size:
+        return None
+    return x0, y0, x1, y1
+
+
+def roi_to_frame(
+    landmarks: np.ndarray,
+    roi: Tuple[int, int, int, int],
+    width: int,
+    height: int
+) -> np.ndarray:
+    """将 ROI 内的归一化关键点映射回整帧归一化坐标（z 与 x 同尺度）"""
+    x0, y0, x1, y1 = roi
+    mapped = landmarks.copy()
+    mapped[:, X] = (landmarks[:, X] * (x1 - x0) + x0) / width
+    mapped[:, Y] = (landmarks[:, Y] * (y1 - y0) + y0) / height
+    mapped[:, Z] = landmarks[:, Z] * (x1 - x0) / width
+    return mapped
+
+
+def low_confidence_windows(
+    sequence: PoseSequence,
+    threshold: float,
+    padding: int = 0
+) -> List[Tuple[int, int]]:
+    """
+    找出需要重新推理的片段
+    
+    低置信度帧: 未检测到人体，或检测置信度 / 任一关键关节可见度低于 threshold；
+    每段向两侧扩展 padding 个采样帧，重叠或相邻的片段合并
+    
+    Returns:
+        [(start, end), ...] 数组下标区间（两端均包含）
+    """
+    n = len(sequence)
+    if n == 0:
+        return []
+    
+    key_visibility = np.nan_to_num(
+        sequence.landmarks[:, KEY_JOINTS, VISIBILITY], nan=0.0
+    ).min(axis=1)
+    low = (
+        ~sequence.valid
+        | (sequence.detection_confidence < threshold)
+        | (key_visibility < threshold)
+    )
+    positions = np.flatnonzero(low)
+    if len(positions) == 0:
+        return []
+    
+    # 按间隔切分连续段（间隔不超过 2*padding+1 的段扩展后会重叠，直接合并）
+    breaks = np.flatnonzero(np.diff(positions) > 2 * padding + 1)
+    starts = positions[np.concatenate(([0], breaks + 1))]
+    ends = positions[np.concatenate((breaks, [len(positions) - 1]))]
+    return [
+        (max(0, int(s) - padding), min(n - 1, int(e) + padding))
+        for s, e in zip(starts, ends)
+    ]
+
+
 # 单例模式
 _mediapipe_service_instance = None
 
 def get_mediapipe_service() -> MediaPipeService:
-    """获取 MediaPipe 服务单例"""
+    """
+    获取 MediaPipe 服务单例
+    
+    默认使用 Lite 模型 (complexity=0)，低置信度片段用 Full 模型 (1) 重新推理；
+    MEDIAPIPE_ESCALATION_COMPLEXITY 设为空值时不启用级联
+    """
     global _mediapipe_service_instance
     if _mediapipe_service_instance is None:
-        _mediapipe_service_instance = MediaPipeService()
+        target_fps = os.getenv("MEDIAPIPE_TARGET_FPS")
+        escalation_complexity = os.getenv("MEDIAPIPE_ESCALATION_COMPLEXITY", "1")
+        max_inference_size = os.getenv("MEDIAPIPE_MAX_INFERENCE_SIZE")
+        roi_padding = os.getenv("MEDIAPIPE_ROI_PADDING")
+        _mediapipe_service_instance = MediaPipeService(
+            model_complexity=int(os.getenv("MEDIAPIPE_MODEL_COMPLEXITY", 0)),
+            min_detection_confidence=float(os.getenv("MEDIAPIPE_MIN_DETECTION_CONFIDENCE", 0.5)),
+            min_tracking_confidence=float(os.getenv("MEDIAPIPE_MIN_TRACKING_CONFIDENCE", 0.5)),
+            target_fps=float(target_fps) if target_fps else None,
+            prefetch_depth=int(os.getenv("MEDIAPIPE_PREFETCH_DEPTH", 4)),
+            pose_pool=PosePool(
+                max_idle_per_key=int(os.getenv("MEDIAPIPE_POSE_POOL_SIZE", 2))
+            ),
+            escalation_complexity=int(escalation_complexity) if escalation_complexity else None,
+            escalation_threshold=float(os.getenv("MEDIAPIPE_ESCALATION_THRESHOLD", 0.6)),
+            escalation_padding=int(os.getenv("MEDIAPIPE_ESCALATION_PADDING", 2)),
+            max_inference_size=int(max_inference_size) if max_inference_size else None,
+            roi_padding=float(roi_padding) if roi_padding else None
+        )
     return _mediapipe_service_instance
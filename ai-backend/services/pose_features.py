@@ -0,0 +1,166 @@
+"""
+逐帧动作特征计算
+
+功能:
+- 对整段 PoseSequence 一次性计算逐帧特征（数组运算，无逐帧 Python 循环）
+- 特征以声明式的 FeatureSpec（计算方式 + 关键点）定义，由通用特征引擎求值，
+  同一批求值中相同定义的特征只计算一次
+- 默认特征（深蹲）: 髋部高度、膝角、髋角、躯干倾角、膝踝横向偏移、左右髋 / 膝高度差
+- 无效帧的特征为 NaN
+"""
+
+import numpy as np
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from models.pose_sequence import PoseSequence, X, Y
+
+# MediaPipe 关键点索引
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+
+
+class FeatureSpec(NamedTuple):
+    """声明式特征定义"""
+    kind: str                # 计算方式，见 FEATURE_KERNELS
+    points: Tuple[int, ...]  # 参与计算的关键点索引
+
+
+def joint_angles(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    批量计算三点夹角（b 为顶点）
+
+    Args:
+        a, b, c: (..., 2) 或 (..., >=2) 坐标数组，仅使用前两维
+
+    Returns:
+        (...) 角度数组 (度)
+    """
+    v1 = (a[..., :2] - b[..., :2]).astype(np.float64)
+    v2 = (c[..., :2] - b[..., :2]).astype(np.float64)
+    dot = np.einsum("...i,...i->...", v1, v2)
+    norms = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+    cos_angle = dot / (norms + 1e-6)
+    return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+
+def _angle(lm: np.ndarray, a: int, b: int, c: int) -> np.ndarray:
+    """三点夹角 (度)，b 为顶点"""
+    return joint_angles(lm[..., a, :], lm[..., b, :], lm[..., c, :])
+
+
+def _height(lm: np.ndarray, *points: int) -> np.ndarray:
+    """若干关键点的平均纵坐标（越大越低）"""
+    return lm[..., list(points), Y].astype(np.float64).mean(axis=-1)
+
+
+def _horizontal_offset(lm: np.ndarray, a: int, b: int) -> np.ndarray:
+    """两点横向距离"""
+    return np.abs(lm[..., a, X].astype(np.float64) - lm[..., b, X])
+
+
+def _vertical_offset(lm: np.ndarray, a: int, b: int) -> np.ndarray:
+    """两点纵向距离"""
+    return np.abs(lm[..., a, Y].astype(np.float64) - lm[..., b, Y])
+
+
+def _incline(lm: np.ndarray, top: int, bottom: int) -> np.ndarray:
+    """bottom → top 连线与竖直方向的夹角 (度)"""
+    dx = (lm[..., top, X] - lm[..., bottom, X]).astype(np.float64)
+    dy = (lm[..., bottom, Y] - lm[..., top, Y]).astype(np.float64)
+    return np.degrees(np.arctan2(np.abs(dx), dy))
+
+
+# 特征计算方式: kind → 函数 (landmarks, *points) → (...) float64 数组
+FEATURE_KERNELS: Dict[str, Callable[..., np.ndarray]] = {
+    "angle": _angle,
+    "height": _height,
+    "horizontal_offset": _horizontal_offset,
+    "vertical_offset": _vertical_offset,
+    "incline": _incline
+}
+
+# 默认特征（深蹲）
+FEATURE_SPECS: Dict[str, FeatureSpec] = {
+    # 左右髋平均纵坐标（越大越低）
+    "hip_y": FeatureSpec("height", (LEFT_HIP, RIGHT_HIP)),
+    # 髋-膝-踝角度 (度)
+    "knee_angle": FeatureSpec("angle", (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+    # 肩-髋-膝角度 (度)
+    "hip_angle": FeatureSpec("angle", (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE)),
+    # 肩-髋连线与竖直方向夹角 (度)
+    "torso_angle": FeatureSpec("incline", (LEFT_SHOULDER, LEFT_HIP)),
+    # 膝盖与脚踝横向偏移
+    "knee_offset": FeatureSpec("horizontal_offset", (LEFT_KNEE, LEFT_ANKLE)),
+    # 左右髋纵坐标差
+    "hip_asymmetry": FeatureSpec("vertical_offset", (LEFT_HIP, RIGHT_HIP)),
+    # 左右膝纵坐标差
+    "knee_asymmetry": FeatureSpec("vertical_offset", (LEFT_KNEE, RIGHT_KNEE))
+}
+
+FEATURE_NAMES = tuple(FEATURE_SPECS)
+
+
+def evaluate_features(
+    landmarks: np.ndarray,
+    specs: Dict[str, FeatureSpec]
+) -> Dict[str, np.ndarray]:
+    """
+    通用特征引擎: 按声明式定义批量计算特征
+
+    定义相同的特征（即使名称不同）只计算一次
+
+    Args:
+        landmarks: (..., 33, 4) 关键点数组（支持任意前导维度，如 (T,) 或 (reps, T)）
+        specs: {特征名: FeatureSpec}
+
+    Returns:
+        {特征名: (...) float64 数组}
+    """
+    computed: Dict[FeatureSpec, np.ndarray] = {}
+    features = {}
+    for name, spec in specs.items():
+        if spec not in computed:
+            computed[spec] = FEATURE_KERNELS[spec.kind](landmarks, *spec.points)
+        features[name] = computed[spec]
+    return features
+
+
+def landmark_features(
+    landmarks: np.ndarray,
+    specs: Optional[Dict[str, FeatureSpec]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    由关键点数组计算逐帧特征
+
+    Args:
+        landmarks: (..., 33, 4) 关键点数组（支持任意前导维度，如 (T,) 或 (reps, T)）
+        specs: 特征定义（默认 FEATURE_SPECS）
+
+    Returns:
+        {特征名: (...) float64 数组}
+    """
+    return evaluate_features(landmarks, FEATURE_SPECS if specs is None else specs)
+
+
+def compute_frame_features(
+    sequence: PoseSequence,
+    specs: Optional[Dict[str, FeatureSpec]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    计算整段序列的逐帧特征（无效帧为 NaN）
+
+    Returns:
+        {特征名: (T,) float64 数组}
+    """
+    features = landmark_features(sequence.landmarks, specs)
+    invalid = ~sequence.valid
+    # 定义相同的特征共享同一数组，每个数组只处理一次
+    for values in {id(v): v for v in features.values()}.values():
+        values[invalid] = np.nan
+    return features
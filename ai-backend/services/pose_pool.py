@@ -0,0 +1,140 @@
+"""
+MediaPipe Pose 实例池
+
+功能:
+- 按 (model_complexity, 检测置信度, 跟踪置信度) 缓存预初始化的 Pose 图
+- 每个视频签出一个实例，归还时 reset()，跟踪状态不会泄漏到下一个视频
+- 支持在应用启动时预热
+"""
+
+import mediapipe as mp
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+PoseKey = Tuple[int, float, float]
+
+
+class PosePool:
+    """Pose 实例池（线程安全）"""
+
+    def __init__(self, max_idle_per_key: int = 2):
+        """
+        Args:
+            max_idle_per_key: 每种配置最多保留的空闲实例数，超出的实例归还时直接关闭
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: Dict[PoseKey, List[mp_pose.Pose]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def make_key(
+        model_complexity: int,
+        min_detection_confidence: float,
+        min_tracking_confidence: float
+    ) -> PoseKey:
+        return (
+            int(model_complexity),
+            round(float(min_detection_confidence), 3),
+            round(float(min_tracking_confidence), 3)
+        )
+
+    def _create(self, key: PoseKey) -> mp_pose.Pose:
+        model_complexity, detection_conf, tracking_conf = key
+        logger.info(f"创建 Pose 实例: {key}")
+        with self._lock:
+            self.created += 1
+        return mp_pose.Pose(
+            model_complexity=model_complexity,
+            min_detection_confidence=detection_conf,
+            min_tracking_confidence=tracking_conf,
+            static_image_mode=False  # 视频模式
+        )
+
+    def _checkout(self, key: PoseKey) -> mp_pose.Pose:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+        return self._create(key)
+
+    def _checkin(self, key: PoseKey, pose: mp_pose.Pose):
+        # 重置图的运行状态（跟踪 ROI、平滑滤波器、时间戳）
+        pose.reset()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(pose)
+                return
+        pose.close()
+
+    @contextmanager
+    def acquire(
+        self,
+        model_complexity: int,
+        min_detection_confidence: float,
+        min_tracking_confidence: float
+    ) -> Iterator[mp_pose.Pose]:
+        """
+        签出一个 Pose 实例，处理完一个视频后自动归还
+
+        在生成器中使用时，消费方提前关闭生成器 (GeneratorExit) 同样重置后归还；
+        处理过程中出错的实例不再放回池中
+        """
+        key = self.make_key(
+            model_complexity, min_detection_confidence, min_tracking_confidence
+        )
+        pose = self._checkout(key)
+        try:
+            yield pose
+        except GeneratorExit:
+            self._checkin(key, pose)
+            raise
+        except BaseException:
+            pose.close()
+            raise
+        self._checkin(key, pose)
+
+    def warm(
+        self,
+        model_complexity: int,
+        min_detection_confidence: float,
+        min_tracking_confidence: float,
+        count: int = 1
+    ):
+        """预先创建 count 个空闲实例"""
+        key = self.make_key(
+            model_complexity, min_detection_confidence, min_tracking_confidence
+        )
+        with self._lock:
+            missing = min(count, self.max_idle_per_key) - len(self._idle.get(key, []))
+        for _ in range(max(missing, 0)):
+            pose = self._create(key)
+            with self._lock:
+                self._idle.setdefault(key, []).append(pose)
+        logger.info(f"Pose 实例池预热完成: {key} x {count}")
+
+    def close(self):
+        """关闭所有空闲实例"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for poses in idle.values():
+            for pose in poses:
+                pose.close()
+
+    def stats(self) -> Dict[str, int]:
+        """实例池统计"""
+        with self._lock:
+            return {
+                "idle": sum(len(poses) for poses in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused
+            }
@@ -0,0 +1,173 @@
+"""
+分析任务执行引擎
+
+功能:
+- 在独立进程池中执行 CPU 密集的分析流水线，API 进程的事件循环不被阻塞
+- 工作进程启动时预热 Pose 实例池，之后在同一进程内的任务间复用模型
+- workers=0 时退化为 API 进程内的线程执行（本地开发 / 单核环境）
+- 进度通道: 工作进程通过 report_progress 把解码进度发回 API 进程，
+  由 progress_handler 处理（未设置时 report_progress 不做任何事）
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 当前进程的进度出口: 工作进程中为进度队列的 put，线程模式下为 progress_handler
+_progress_sink: Optional[Callable[..., None]] = None
+
+
+def _init_worker(pose_pool_size: int, progress_queue=None):
+    """工作进程初始化: 加载环境变量、连接进度通道并预热本进程的 Pose 实例池"""
+    global _progress_sink
+    from dotenv import load_dotenv
+    from services.mediapipe_service import get_mediapipe_service
+
+    load_dotenv()
+    if progress_queue is not None:
+        _progress_sink = lambda *args: progress_queue.put_nowait(args)
+    get_mediapipe_service().warm_up(pose_pool_size)
+    logger.info(f"分析工作进程已就绪: pid={os.getpid()}")
+
+
+def report_progress(*args):
+    """
+    从流水线中上报进度，API 进程以 progress_handler(*args) 接收
+
+    参数必须可 pickle；进度只用于展示，发送失败直接忽略
+    """
+    if _progress_sink is None:
+        return
+    try:
+        _progress_sink(*args)
+    except Exception as e:
+        logger.debug(f"进度上报失败: {e}")
+
+
+def _ping() -> int:
+    """空任务，用于启动时拉起全部工作进程"""
+    return os.getpid()
+
+
+class AnalysisExecutor:
+    """分析任务执行引擎"""
+
+    def __init__(self, workers: int = 1, pose_pool_size: int = 1):
+        """
+        Args:
+            workers: 工作进程数（0 表示在 API 进程内用线程执行）
+            pose_pool_size: 每个工作进程预热的 Pose 实例数
+        """
+        self.workers = max(0, int(workers))
+        self.pose_pool_size = pose_pool_size
+        # 进度处理函数，需在 start 之前设置；在非事件循环线程中调用
+        self.progress_handler: Optional[Callable[..., None]] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._progress_thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """创建进程池并拉起全部工作进程（应用启动时调用）"""
+        global _progress_sink
+        if self.workers == 0:
+            from services.mediapipe_service import get_mediapipe_service
+            _progress_sink = self.progress_handler
+            get_mediapipe_service().warm_up(self.pose_pool_size)
+            logger.info("分析任务在 API 进程内执行 (workers=0)")
+            return
+
+        if self._executor is not None:
+            return
+
+        # spawn: 避免 fork 继承父进程的线程和 MediaPipe 图状态
+        context = multiprocessing.get_context("spawn")
+        if self.progress_handler is not None:
+            # 进度队列在创建工作进程时传入（multiprocessing 队列只能随进程创建继承）
+            self._progress_queue = context.Queue()
+            self._progress_thread = threading.Thread(
+                target=self._drain_progress,
+                name="analysis-progress",
+                daemon=True
+            )
+            self._progress_thread.start()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.pose_pool_size, self._progress_queue)
+        )
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+        logger.info(f"分析进程池已启动: workers={self.workers}")
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在工作进程中执行 fn(*args, **kwargs) 并等待结果
+
+        fn 必须是模块级函数，参数和返回值必须可 pickle
+        """
+        call = partial(fn, *args, **kwargs)
+        if self.workers == 0:
+            return await asyncio.to_thread(call)
+
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    def _drain_progress(self):
+        """进度通道的接收线程: 把工作进程的进度交给 progress_handler"""
+        while True:
+            args = self._progress_queue.get()
+            if args is None:
+                return
+            try:
+                self.progress_handler(*args)
+            except Exception as e:
+                logger.warning(f"进度处理失败: {e}")
+
+    def shutdown(self):
+        """关闭进程池（应用关闭时调用）"""
+        if self.workers == 0:
+            from services.mediapipe_service import get_mediapipe_service
+            get_mediapipe_service().pose_pool.close()
+            return
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join()
+            self._progress_queue.close()
+            self._progress_thread = None
+            self._progress_queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "mode": "process" if self.workers > 0 else "thread",
+            "started": self.workers == 0 or self._executor is not None
+        }
+
+
+# 单例模式
+_analysis_executor_instance: Optional[AnalysisExecutor] = None
+
+def get_analysis_executor() -> AnalysisExecutor:
+    """获取分析任务执行引擎单例"""
+    global _analysis_executor_instance
+    if _analysis_executor_instance is None:
+        _analysis_executor_instance = AnalysisExecutor(
+            workers=int(os.getenv("ANALYSIS_WORKERS", min(2, os.cpu_count() or 1))),
+            pose_pool_size=int(os.getenv("MEDIAPIPE_POSE_POOL_SIZE", 2))
+        )
+    return _analysis_executor_instance
@@ -5,52 +5,214 @@
 功能:
 - 识别深蹲动作的「站立 → 下蹲 → 站立」循环
 - 切分出每个完整动作的起止帧
-- 基于髋部纵坐标变化检测动作阶段
+- 基于髋部纵坐标变化检测动作阶段（向量化极值检测: 突出度 / 间隔 / 宽度筛选）
+- 其他动作按注册表定义的切分信号（如硬拉的髋角）使用同一套极值检测
+- 平滑窗口由采样帧率换算，不同帧率的视频行为一致
+- 增量切分: 逐帧消费关键点流，对从最后一个已确定周期开始的尾部窗口复用批量切分的
+  平滑和极值检测，周期不会再被后续帧改变时即产出，结果与批量切分一致
+- 提前终止条件: 按动作定义的切分信号，凑够所需周期数后停止姿态提取
+  （停止位置的前缀切分结果即截断序列的切分结果）
 
 注意: 这是 MVP 简化版实现
 """
 
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
 
+from models.pose_sequence import PoseSequence, Y
+from services.exercise_registry import ExerciseSpec
+from services.pose_features import evaluate_features
+
 logger = logging.getLogger(__name__)
 
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """居中移动平均（两端按边缘值填充，输出与输入等长、不产生索引偏移）"""
+    if window <= 1 or len(values) == 0:
+        return values
+    half = window // 2
+    padded = np.pad(values, (half, window - 1 - half), mode="edge")
+    cumsum = np.concatenate(([0.0], np.cumsum(padded)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def find_peaks(
+    values: np.ndarray,
+    min_prominence: float = 0.0,
+    min_distance: int = 1,
+    min_width: int = 1
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化极大值检测
+    
+    - 候选峰: 先升后降的点（平台取中点）
+    - 突出度: 峰值减去两侧基点中较高者；基点为峰值到两侧最近的更高峰之间的最小值点
+    - 宽度: 左右基点之间的帧数
+    - 间隔: 按峰值从高到低保留，与已保留峰距离小于 min_distance 的峰被丢弃
+    
+    候选峰之间各段的最小值由 reduceat 一次求出，基点用稀疏表做区间最小值查询；
+    只有最近更高峰的单调栈在候选峰（平滑后远少于帧数）上逐个执行
+    
+    Args:
+        values: (n,) 已平滑的曲线
+        min_prominence: 最小突出度
+        min_distance: 相邻峰的最小间隔（帧）
+        min_width: 最小宽度（帧）
+    
+    Returns:
+        (峰值下标, 左基点下标, 右基点下标)，均为按时间排序的 int 数组
+    """
+    empty = np.array([], dtype=np.int64)
+    n = len(values)
+    if n < 3:
+        return empty, empty, empty
+    
+    # 候选峰: 去掉平台后符号由正变负的位置，平台取中点
+    diff = np.diff(values)
+    changes = np.flatnonzero(diff)
+    rising = diff[changes] > 0
+    turns = np.flatnonzero(rising[:-1] & ~rising[1:])
+    candidates = (changes[turns] + 1 + changes[turns + 1]) // 2
+    k = len(candidates)
+    if k == 0:
+        return empty, empty, empty
+    
+    # 段 j 为 [bounds[j], bounds[j+1])，位于候选峰 j-1 与 j 之间
+    # （段 0 在首个候选峰之前，段 k 在末个之后）；求各段最小值及其首个位置
+    bounds = np.concatenate(([0], candidates, [n]))
+    segment_min = np.minimum.reduceat(values, bounds[:-1])
+    is_segment_min = values == np.repeat(segment_min, np.diff(bounds))
+    segment_argmin = np.minimum.reduceat(
+        np.where(is_segment_min, np.arange(n), n), bounds[:-1]
+    )
+    
+    # 最近的更高峰（单调栈）；不存在时延伸到序列端点
+    heights = values[candidates]
+    h = heights.tolist()  # 栈循环中用 Python float 比较，避免逐个取 numpy 标量
+    left_higher = [-1] * k
+    right_higher = [k] * k
+    stack: List[int] = []
+    for i in range(k):
+        while stack and h[stack[-1]] <= h[i]:
+            stack.pop()
+        if stack:
+            left_higher[i] = stack[-1]
+        stack.append(i)
+    stack = []
+    for i in range(k - 1, -1, -1):
+        while stack and h[stack[-1]] <= h[i]:
+            stack.pop()
+        if stack:
+            right_higher[i] = stack[-1]
+        stack.append(i)
+    left_higher = np.array(left_higher)
+    right_higher = np.array(right_higher)
+    
+    # 基点 = 峰 i 到最近更高峰之间各段最小值中的最小者
+    # 左侧: 段 left_higher+1 .. i；右侧: 段 i+1 .. right_higher
+    order = np.arange(k)
+    left_segment = _range_argmin(segment_min, left_higher + 1, order)
+    right_segment = _range_argmin(segment_min, order + 1, right_higher)
+    
+    prominence = heights - np.maximum(segment_min[left_segment], segment_min[right_segment])
+    left_bases = segment_argmin[left_segment]
+    right_bases = segment_argmin[right_segment]
+    width = right_bases - left_bases
+    
+    keep = (prominence >= min_prominence) & (width >= min_width)
+    peaks, left_bases, right_bases = candidates[keep], left_bases[keep], right_bases[keep]
+    
+    # 间隔筛选: 从高到低保留（此时只剩通过突出度筛选的少数峰）
+    if min_distance > 1 and len(peaks) > 1:
+        selected = np.ones(len(peaks), dtype=bool)
+        for i in np.argsort(-values[peaks], kind="stable"):
+            if not selected[i]:
+                continue
+            close = np.abs(peaks - peaks[i]) < min_distance
+            close[i] = False
+            selected &= ~close
+        peaks, left_bases, right_bases = peaks[selected], left_bases[selected], right_bases[selected]
+    
+    return peaks, left_bases, right_bases
+
+
+def _range_argmin(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    批量区间最小值位置查询（稀疏表，区间 [starts, ends] 两端均包含）
+    
+    相等时取靠前的位置
+    """
+    n = len(values)
+    tables = [np.arange(n)]
+    span = 1
+    while span * 2 <= n:
+        prev = tables[-1]
+        a, b = prev[:n - span * 2 + 1], prev[span:n - span + 1]
+        tables.append(np.where(values[b] < values[a], b, a))
+        span *= 2
+    
+    lengths = ends - starts + 1
+    levels = np.floor(np.log2(lengths)).astype(np.int64)
+    result = np.empty(len(starts), dtype=np.int64)
+    for level in np.unique(levels):
+        mask = levels == level
+        table = tables[level]
+        a = table[starts[mask]]
+        b = table[ends[mask] - (1 << level) + 1]
+        result[mask] = np.where(values[b] < values[a], b, a)
+    return result
+
+
 class SquatSegmentationService:
     """深蹲动作切分服务"""
     
     def __init__(
         self,
         hip_threshold: float = 0.05,  # 髋部移动阈值
-        min_squat_duration: int = 15   # 最小深蹲帧数
+        min_squat_duration: int = 15,   # 最小深蹲帧数
+        smoothing_seconds: float = 0.2,  # 平滑窗口时长
+        min_peak_distance: Optional[int] = None  # 相邻最低点最小间隔帧数
     ):
         """
         初始化深蹲切分服务
         
         Args:
-            hip_threshold: 髋部纵坐标变化阈值
-            min_squat_duration: 最小深蹲持续帧数
+            hip_threshold: 髋部纵坐标变化阈值（最低点的最小突出度）
+            min_squat_duration: 最小深蹲持续帧数（按原始帧率，最低点两侧站立点之间的最小宽度）
+            smoothing_seconds: 移动平均窗口时长（秒），按采样帧率换算为帧数
+            min_peak_distance: 相邻最低点的最小间隔帧数（按原始帧率，None 时同 min_squat_duration）
         """
         self.hip_threshold = hip_threshold
         self.min_squat_duration = min_squat_duration
+        self.smoothing_seconds = smoothing_seconds
+        self.min_peak_distance = min_peak_distance or min_squat_duration
         logger.info(f"深蹲切分服务初始化: threshold={hip_threshold}")
     
+    @staticmethod
+    def _frames_at_stride(frames: int, stride: int, minimum: int = 1) -> int:
+        """将按原始帧率定义的帧数换算为采样后序列中的帧数"""
+        return max(minimum, int(round(frames / max(stride, 1))))
+    
+    def _smoothing_window(self, sample_fps: float, stride: int) -> int:
+        """平滑窗口（采样帧数，奇数）: 由采样帧率换算，帧率未知时按 5 个原始帧"""
+        if sample_fps > 0:
+            window = int(round(self.smoothing_seconds * sample_fps))
+        else:
+            window = self._frames_at_stride(5, stride)
+        return max(1, window) | 1
+    
     def segment_squat_cycles(
         self,
-        landmarks_sequence: List[Dict]
+        sequence: PoseSequence
     ) -> List[Dict[str, int]]:
         """
         切分深蹲周期
         
+        髋部纵坐标（图像坐标系，越大越低）平滑后做极值检测:
+        极大值 = 下蹲最低点，两侧的极小值 = 周期起止的站立点
+        
         Args:
-            landmarks_sequence: 关键点序列，格式:
-                [
-                    {
-                        "frame_index": 0,
-                        "landmarks": [{"x": ..., "y": ..., ...}, ...]
-                    },
-                    ...
-                ]
+            sequence: 姿态关键点序列 (PoseSequence)
         
         Returns:
             [
@@ -62,83 +224,370 @@ class SquatSegmentationService:
                 ...
             ]
         """
-        if not landmarks_sequence:
+        if sequence is None or len(sequence) == 0:
             logger.warning("输入的关键点序列为空")
             return []
         
-        # 提取髋部纵坐标序列
         # MediaPipe 关键点索引: 23=左髋, 24=右髋
-        hip_y_positions = []
-        valid_frames = []
+        hip_y = sequence.landmarks[:, 23:25, Y].mean(axis=1)
+        return self.segment_signal(sequence, hip_y, self.hip_threshold)
+    
+    def segment_exercise_cycles(
+        self,
+        sequence: PoseSequence,
+        exercise: ExerciseSpec
+    ) -> List[Dict[str, int]]:
+        """
+        按动作定义的切分信号切分周期（输出格式同 segment_squat_cycles）
         
-        for frame_data in landmarks_sequence:
-            if frame_data.get("landmarks") is None:
-                continue
-            
-            landmarks = frame_data["landmarks"]
-            if len(landmarks) < 25:  # 确保有足够的关键点
-                continue
-            
-            # 计算左右髋部的平均纵坐标
-            left_hip_y = landmarks[23]["y"]
-            right_hip_y = landmarks[24]["y"]
-            avg_hip_y = (left_hip_y + right_hip_y) / 2
-            
-            hip_y_positions.append(avg_hip_y)
-            valid_frames.append(frame_data["frame_index"])
-        
-        if len(hip_y_positions) < self.min_squat_duration:
-            logger.warning(f"有效帧数不足: {len(hip_y_positions)} < {self.min_squat_duration}")
+        Args:
+            sequence: 姿态关键点序列
+            exercise: 动作定义（信号特征、方向和最小突出度）
+        """
+        if sequence is None or len(sequence) == 0:
+            logger.warning("输入的关键点序列为空")
             return []
         
-        # 简化算法: 检测局部极值点
-        # 极小值 = 下蹲最低点
-        # 两个极小值之间 = 一个完整周期
+        spec = {exercise.signal: exercise.features[exercise.signal]}
+        signal = evaluate_features(sequence.landmarks, spec)[exercise.signal]
+        return self.segment_signal(
+            sequence, exercise.signal_direction * signal, exercise.signal_prominence
+        )
+    
+    def segment_signal(
+        self,
+        sequence: PoseSequence,
+        signal: np.ndarray,
+        min_prominence: float
+    ) -> List[Dict[str, int]]:
+        """
+        按逐帧信号切分周期: 信号平滑后的极大值为动作最低点，两侧基点为周期起止
         
-        cycles = []
-        hip_y_array = np.array(hip_y_positions)
+        Args:
+            sequence: 姿态关键点序列
+            signal: (T,) 与序列逐帧对齐的信号（无效帧的值被忽略）
+            min_prominence: 最低点的最小突出度（信号单位）
+        """
+        if len(sequence) == 0:
+            return []
         
-        # 平滑曲线 (移动平均)
-        window_size = 5
-        smoothed = np.convolve(
-            hip_y_array,
-            np.ones(window_size) / window_size,
-            mode='valid'
-        )
+        # 仅使用有效帧
+        values = signal[sequence.valid]
+        valid_frames = sequence.frame_indices[sequence.valid]
         
-        # 检测局部极小值 (下蹲最低点)
-        local_minima = []
-        for i in range(1, len(smoothed) - 1):
-            if smoothed[i] < smoothed[i-1] and smoothed[i] < smoothed[i+1]:
-                # 纵坐标越大 = 越低 (图像坐标系)
-                if smoothed[i] > np.mean(smoothed):  # 只保留明显下蹲的点
-                    local_minima.append(i + window_size // 2)  # 调整索引偏移
-        
-        logger.info(f"检测到 {len(local_minima)} 个下蹲最低点")
-        
-        # MVP 简化: 如果检测到多个最低点，每两个最低点之间为一个周期
-        if len(local_minima) >= 2:
-            for i in range(len(local_minima) - 1):
-                start_idx = max(0, local_minima[i] - self.min_squat_duration // 2)
-                end_idx = min(len(valid_frames) - 1, local_minima[i+1] + self.min_squat_duration // 2)
-                
-                cycles.append({
-                    "start_frame": valid_frames[start_idx],
-                    "bottom_frame": valid_frames[local_minima[i]],
-                    "end_frame": valid_frames[end_idx]
-                })
+        min_duration = self._frames_at_stride(self.min_squat_duration, sequence.stride, 3)
+        if len(values) < min_duration:
+            logger.warning(f"有效帧数不足: {len(values)} < {min_duration}")
+            return []
+        
+        peaks, left_bases, right_bases = self.detect_cycles(
+            values, sequence.stride, sequence.sample_fps, min_prominence
+        )
+        logger.info(f"检测到 {len(peaks)} 个动作最低点")
+        cycles = cycles_from_bases(valid_frames, peaks, left_bases, right_bases)
         
         # MVP 降级方案: 如果检测失败，返回整个视频作为一个周期
         if len(cycles) == 0:
             logger.warning("未检测到明确周期，使用整个视频作为单个周期")
             cycles.append({
-                "start_frame": valid_frames[0],
-                "bottom_frame": valid_frames[len(valid_frames) // 2],  # 中间帧作为最低点
-                "end_frame": valid_frames[-1]
+                "start_frame": int(valid_frames[0]),
+                "bottom_frame": int(valid_frames[len(valid_frames) // 2]),  # 中间帧作为最低点
+                "end_frame": int(valid_frames[-1])
             })
         
-        logger.info(f"切分完成: 检测到 {len(cycles)} 个深蹲周期")
+        logger.info(f"切分完成: 检测到 {len(cycles)} 个动作周期")
         return cycles
+    
+    def detect_cycles(
+        self,
+        values: np.ndarray,
+        stride: int,
+        sample_fps: float,
+        min_prominence: float,
+        anchor: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        周期检测核心（批量切分与增量切分共用，两者结果一致）
+        
+        Args:
+            values: (n,) 有效帧的信号
+            stride: 采样步长（帧数参数按原始帧率定义，需按步长换算）
+            sample_fps: 采样帧率（决定平滑窗口）
+            min_prominence: 最低点的最小突出度
+            anchor: 已确定的最低点在 values 中的下标（增量切分的尾部窗口）。
+                与它距离小于最小间隔的峰被丢弃，其后第一个周期的起点不早于两者之间的站立点，
+                与整段检测时该最低点对后续周期的约束相同；只返回它之后的周期
+        
+        Returns:
+            (最低点, 周期起点, 周期终点)，均为 values 中的下标；有效帧不足时为空
+        """
+        min_duration = self._frames_at_stride(self.min_squat_duration, stride, 3)
+        if len(values) < min_duration:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        
+        # 平滑曲线 (移动平均，窗口由帧率决定)
+        window_size = self._smoothing_window(sample_fps, stride)
+        smoothed = moving_average(np.asarray(values, dtype=np.float64), window_size)
+        
+        # 检测动作最低点 (信号极大值)
+        min_distance = self._frames_at_stride(self.min_peak_distance, stride)
+        peaks, left_bases, right_bases = find_peaks(
+            smoothed,
+            min_prominence=min_prominence,
+            min_distance=min_distance,
+            min_width=min_duration
+        )
+        
+        # 已确定的最低点: 保留下来的峰两两间隔不小于 min_distance，离它过近的峰不会被保留
+        if anchor is not None:
+            after = peaks - anchor >= min_distance
+            peaks = np.concatenate(([anchor], peaks[after]))
+            left_bases = np.concatenate(([anchor], left_bases[after]))
+            right_bases = np.concatenate(([anchor], right_bases[after]))
+        
+        # 基点可能越过相邻的较低峰，周期边界不超过相邻两个最低点之间的站立点
+        if len(peaks) > 1:
+            between = _range_argmin(smoothed, peaks[:-1], peaks[1:])
+            left_bases = left_bases.copy()
+            right_bases = right_bases.copy()
+            left_bases[1:] = np.maximum(left_bases[1:], between)
+            right_bases[:-1] = np.minimum(right_bases[:-1], between)
+        
+        if anchor is not None:
+            return peaks[1:], left_bases[1:], right_bases[1:]
+        return peaks, left_bases, right_bases
+    
+    def incremental(
+        self,
+        stride: int = 1,
+        sample_fps: float = 0.0,
+        exercise: Optional[ExerciseSpec] = None
+    ) -> "IncrementalSegmenter":
+        """
+        创建使用本服务参数的增量切分器
+        
+        exercise 为 None 时同 segment_squat_cycles，否则同 segment_exercise_cycles
+        """
+        return IncrementalSegmenter(self, stride, sample_fps, exercise)
+
+
+def cycles_from_bases(
+    frames: np.ndarray,
+    peaks: np.ndarray,
+    left_bases: np.ndarray,
+    right_bases: np.ndarray
+) -> List[Dict[str, int]]:
+    """把 detect_cycles 的下标换算为周期的原始帧号"""
+    return [
+        {
+            "start_frame": int(frames[left]),
+            "bottom_frame": int(frames[peak]),
+            "end_frame": int(frames[right])
+        }
+        for peak, left, right in zip(peaks, left_bases, right_bases)
+    ]
+
+
+class IncrementalSegmenter:
+    """
+    增量切分器（逐帧消费）
+    
+    每累积 check_interval 个有效帧，对尾部窗口执行一次 detect_cycles
+    （与批量切分相同的平滑窗口、突出度、宽度和间隔参数）:
+    - 尾部窗口从最后一个已确定周期的起点（向前留出半个平滑窗口）开始，
+      包含该周期的最低点和站立点，已确定的部分被丢弃，每次检测的开销与视频长度无关
+    - prefix_cycles: 已确定的周期 + 窗口内之后的周期，即在该帧截断序列后批量切分的结果
+    - cycles: 已确定的周期。周期终点是到下一个最低点之间的站立点，
+      因此下一个最低点出现、且之后又读到 min_peak_distance 个样本
+      （后续帧不能再改变这两个最低点）时才产出，与整段序列批量切分的对应周期相同；
+      最后一个周期由 finish 产出
+    
+    突出度的回看范围限于窗口: 窗口前的站立点比窗口内更低时，
+    新最低点的突出度可能略小于批量切分（站立高度稳定的正常动作不受影响）
+    """
+    
+    def __init__(
+        self,
+        service: "SquatSegmentationService",
+        stride: int = 1,
+        sample_fps: float = 0.0,
+        exercise: Optional[ExerciseSpec] = None,
+        check_interval: Optional[int] = None
+    ):
+        """
+        Args:
+            service: 提供切分参数的批量切分服务
+            stride: 采样步长
+            sample_fps: 采样帧率（0 表示未知，平滑窗口按原始帧数换算）
+            exercise: 动作定义（切分信号、方向和突出度），None 时按深蹲髋部纵坐标
+            check_interval: 每多少个有效帧检测一次（默认半个平滑窗口）
+        """
+        self.service = service
+        self.exercise = exercise
+        self.stride = max(1, stride)
+        self.sample_fps = sample_fps
+        window = service._smoothing_window(sample_fps, self.stride)
+        self.check_interval = check_interval or max(1, window // 2)
+        # 窗口起点之后这么多个样本的平滑值才与整段平滑一致
+        self._margin = window // 2
+        # 前缀末尾受边缘填充影响、平滑值还会变化的样本数 + 后续最低点的最小间隔
+        self._settle = (window - 1 - window // 2) + service._frames_at_stride(
+            service.min_peak_distance, self.stride
+        )
+        self.cycles: List[Dict[str, int]] = []
+        self.prefix_cycles: List[Dict[str, int]] = []
+        self.checked_frame: Optional[int] = None  # 最近一次检测时的帧号
+        
+        # 尾部窗口: _values[0] 是第 _offset 个有效样本
+        self._values: List[float] = []
+        self._frames: List[int] = []
+        self._offset = 0
+        self._count = 0  # 已消费的有效样本数
+        self._anchor: Optional[int] = None  # 最后一个已确定周期的最低点（样本序号）
+        self._pending: Tuple[np.ndarray, np.ndarray] = (np.array([], dtype=np.int64),) * 2
+    
+    def signal(self, landmarks: np.ndarray) -> float:
+        """单帧的切分信号（与批量切分的逐帧信号相同）"""
+        if self.exercise is None:
+            # MediaPipe 关键点索引: 23=左髋, 24=右髋
+            return float(landmarks[23:25, Y].mean())
+        spec = {self.exercise.signal: self.exercise.features[self.exercise.signal]}
+        value = evaluate_features(landmarks[None], spec)[self.exercise.signal][0]
+        return float(self.exercise.signal_direction * value)
+    
+    @property
+    def min_prominence(self) -> float:
+        if self.exercise is None:
+            return self.service.hip_threshold
+        return self.exercise.signal_prominence
+    
+    def push(
+        self,
+        frame_index: int,
+        landmarks: Optional[np.ndarray]
+    ) -> List[Dict[str, int]]:
+        """
+        消费一帧
+        
+        Args:
+            frame_index: 原始视频帧号
+            landmarks: (33, 4) 关键点数组，None 表示未检测到人体（忽略）
+        
+        Returns:
+            本帧新确定的周期（通常为空）
+        """
+        if landmarks is None:
+            return []
+        self._values.append(self.signal(landmarks))
+        self._frames.append(frame_index)
+        self._count += 1
+        if self._count % self.check_interval:
+            return []
+        
+        peaks = self._detect()
+        # 窗口内第 i 个周期在第 i+1 个最低点不会再变化时确定
+        settled = int(np.searchsorted(peaks, self._count - self._settle)) - 1
+        return self._emit(max(settled, 0))
+    
+    def finish(self) -> List[Dict[str, int]]:
+        """输入结束: 对全部帧检测，产出剩余的周期"""
+        if not self._values:
+            return []
+        self._detect()
+        return self._emit(len(self._pending[0]))
+    
+    def _detect(self) -> np.ndarray:
+        """检测尾部窗口，返回已确定周期之后的最低点（样本序号）"""
+        anchor = None if self._anchor is None else self._anchor - self._offset
+        peaks, left_bases, right_bases = self.service.detect_cycles(
+            np.array(self._values), self.stride, self.sample_fps, self.min_prominence,
+            anchor=anchor
+        )
+        self.prefix_cycles = self.cycles + cycles_from_bases(
+            np.array(self._frames), peaks, left_bases, right_bases
+        )
+        self.checked_frame = self._frames[-1]
+        self._pending = (peaks + self._offset, left_bases + self._offset)
+        return self._pending[0]
+    
+    def _emit(self, settled: int) -> List[Dict[str, int]]:
+        """确定窗口内前 settled 个周期，并把窗口起点移到最后一个已确定周期"""
+        new = self.prefix_cycles[len(self.cycles):len(self.cycles) + settled]
+        for cycle in new:
+            self.cycles.append(cycle)
+            logger.info(f"增量切分: 第 {len(self.cycles)} 个周期 {cycle}")
+        if new:
+            peaks, left_bases = self._pending
+            self._anchor = int(peaks[settled - 1])
+            self._pending = (peaks[settled:], left_bases[settled:])
+            drop = int(left_bases[settled - 1]) - self._margin - self._offset
+            if drop > 0:
+                del self._values[:drop]
+                del self._frames[:drop]
+                self._offset += drop
+        return new
+
+
+class CycleStopCondition:
+    """
+    姿态提取的停止条件: 前缀中已有 cycles 个完整周期、且最后一个周期之后
+    又读了 margin_seconds 时停止
+    
+    作为 MediaPipeService.extract_pose_landmarks 的 stop_condition 使用；
+    只在增量切分器刚检测过的帧停止，停止时的 cycles 就是对截断后的序列批量切分的结果
+    """
+    
+    def __init__(
+        self,
+        cycles: int = 1,
+        margin_seconds: float = 1.0,
+        service: Optional[SquatSegmentationService] = None,
+        exercise: Optional[ExerciseSpec] = None
+    ):
+        """
+        Args:
+            cycles: 需要的完整周期数
+            margin_seconds: 最后一个周期结束后继续提取的时长（秒）
+            service: 提供切分参数的服务（None 时使用单例）
+            exercise: 动作定义，按其切分信号计数周期（None 时按深蹲髋部纵坐标）
+        """
+        self.cycles = max(1, int(cycles))
+        self.margin_seconds = margin_seconds
+        self.service = service
+        self.exercise = exercise
+        self.segmenter: Optional[IncrementalSegmenter] = None
+        self.stopped = False
+    
+    def __call__(
+        self,
+        frame_index: int,
+        landmarks: Optional[np.ndarray],
+        info: Dict
+    ) -> bool:
+        """
+        Args:
+            frame_index: 原始视频帧号
+            landmarks: (33, 4) 关键点数组或 None
+            info: 提取结果字典（读取 stride / video_fps）
+        """
+        if self.segmenter is None:
+            service = self.service or get_segmentation_service()
+            stride = info.get("stride", 1)
+            self.segmenter = service.incremental(
+                stride=stride,
+                sample_fps=(info.get("video_fps") or 0) / max(stride, 1),
+                exercise=self.exercise
+            )
+        
+        self.segmenter.push(frame_index, landmarks)
+        cycles = self.segmenter.prefix_cycles
+        if self.segmenter.checked_frame != frame_index or len(cycles) < self.cycles:
+            return False
+        
+        margin = int(round(self.margin_seconds * (info.get("video_fps") or 0)))
+        self.stopped = cycles[self.cycles - 1]["end_frame"] + margin <= frame_index
+        return self.stopped
 
 
 # 单例模式
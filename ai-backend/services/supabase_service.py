@@ -10,9 +10,10 @@ Supabase 数据库服务
 
 from supabase import create_client, Client
 from typing import Optional, Dict, List, Any
+import asyncio
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from models.schemas import (
     TaskStatus,
@@ -46,11 +47,17 @@ class SupabaseService:
         user_id: str,
         reference_video_id: str,
         user_video_id: str,
-        exercise_type_id: int
+        exercise_type_id: int,
+        idempotency_key: Optional[str] = None,
+        status: TaskStatus = TaskStatus.PENDING
     ) -> Optional[str]:
         """
         创建分析任务
         
+        Args:
+            idempotency_key: 幂等键（同一用户内唯一，重复时插入失败返回 None）
+            status: 初始状态
+        
         Returns:
             任务 ID (UUID) 或 None
         """
@@ -60,8 +67,10 @@ class SupabaseService:
                 "reference_video_id": reference_video_id,
                 "user_video_id": user_video_id,
                 "exercise_type_id": exercise_type_id,
-                "status": TaskStatus.PENDING.value
+                "status": status.value
             }
+            if idempotency_key:
+                data["idempotency_key"] = idempotency_key
             
             result = self.client.table("analysis_tasks").insert(data).execute()
             
@@ -88,6 +97,114 @@ class SupabaseService:
             logger.error(f"查询分析任务失败: {e}")
             return None
     
+    async def find_task_by_idempotency_key(
+        self,
+        user_id: str,
+        idempotency_key: str
+    ) -> Optional[Dict]:
+        """按幂等键查询用户的任务"""
+        try:
+            result = (
+                self.client.table("analysis_tasks")
+                .select("*")
+                .eq("user_id", user_id)
+                .eq("idempotency_key", idempotency_key)
+                .limit(1)
+                .execute()
+            )
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"按幂等键查询任务失败: {e}")
+            return None
+    
+    async def find_latest_task(
+        self,
+        user_id: str,
+        reference_video_id: str,
+        user_video_id: str,
+        exercise_type_id: int,
+        statuses: List[TaskStatus],
+        completed_within: Optional[float] = None
+    ) -> Optional[Dict]:
+        """
+        查询用户对相同 (参考视频, 用户视频, 动作类型) 的最近一个任务
+        
+        Args:
+            statuses: 只考虑这些状态的任务
+            completed_within: 已完成的任务只考虑该秒数内完成的（None 表示不限，0 表示不考虑）
+        
+        Returns:
+            任务记录或 None
+        """
+        try:
+            result = (
+                self.client.table("analysis_tasks")
+                .select("*")
+                .eq("user_id", user_id)
+                .eq("reference_video_id", reference_video_id)
+                .eq("user_video_id", user_video_id)
+                .eq("exercise_type_id", exercise_type_id)
+                .in_("status", [status.value for status in statuses])
+                .order("created_at", desc=True)
+                .limit(5)
+                .execute()
+            )
+            cutoff = None
+            if completed_within is not None:
+                cutoff = (datetime.utcnow() - timedelta(seconds=completed_within)).isoformat()
+            for task in result.data or []:
+                if task["status"] != TaskStatus.COMPLETED.value or cutoff is None:
+                    return task
+                if completed_within > 0 and (task.get("processing_completed_at") or "") >= cutoff:
+                    return task
+            return None
+        except Exception as e:
+            logger.error(f"查询相同任务失败: {e}")
+            return None
+    
+    async def clone_completed_task(
+        self,
+        task: Dict,
+        idempotency_key: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        复制已完成任务的结果到一个新任务（不重新计算）
+        
+        新任务以 processing 状态创建（不会被 Worker 领取），结果写入后标记为 completed
+        
+        Returns:
+            新任务 ID；源结果不存在或复制失败时返回 None
+        """
+        source = await self.get_analysis_result(task["id"])
+        if not source:
+            return None
+        
+        task_id = await self.create_analysis_task(
+            user_id=task["user_id"],
+            reference_video_id=task["reference_video_id"],
+            user_video_id=task["user_video_id"],
+            exercise_type_id=task["exercise_type_id"],
+            idempotency_key=idempotency_key,
+            status=TaskStatus.PROCESSING
+        )
+        if not task_id:
+            return None
+        
+        saved = await self.save_analysis_result(
+            task_id=task_id,
+            comparison_result=source["comparison_result"],
+            skeleton_data=source.get("skeleton_data"),
+            overall_score=source.get("overall_score"),
+            overall_grade=source.get("overall_grade")
+        )
+        if not saved:
+            await self.update_task_status(task_id, TaskStatus.FAILED, error_message="结果复制失败")
+            return None
+        
+        await self.update_task_status(task_id, TaskStatus.COMPLETED)
+        logger.info(f"复用任务 {task['id']} 的结果: {task_id}")
+        return task_id
+    
     async def update_task_status(
         self,
         task_id: str,
@@ -124,6 +241,204 @@ class SupabaseService:
             logger.error(f"更新任务状态失败: {e}")
             return False
     
+    async def list_stale_tasks(self, stale_seconds: float) -> List[str]:
+        """
+        查询僵尸任务: 处于 processing 且开始处理时间早于 stale_seconds 秒之前
+        
+        Returns:
+            任务 ID 列表
+        """
+        try:
+            cutoff = (datetime.utcnow() - timedelta(seconds=stale_seconds)).isoformat()
+            result = (
+                self.client.table("analysis_tasks")
+                .select("id")
+                .eq("status", TaskStatus.PROCESSING.value)
+                .lt("processing_started_at", cutoff)
+                .execute()
+            )
+            return [row["id"] for row in result.data or []]
+        except Exception as e:
+            logger.error(f"查询僵尸任务失败: {e}")
+            return []
+    
+    # ================================
+    # 任务租约（独立 Worker 领取任务）
+    # ================================
+    
+    async def claim_analysis_tasks(
+        self,
+        owner: str,
+        lease_seconds: float,
+        limit: int = 1,
+        max_attempts: int = 3,
+        reference_video_id: Optional[str] = None,
+        exercise_type_id: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        领取待处理的分析任务并加租约
+        
+        候选: pending 且已到 available_at 的任务，以及租约已过期（Worker 失联）的 processing 任务
+        每个候选用条件更新领取（status 和 attempts 与读取时一致才生效），
+        多个 Worker 同时领取同一任务时只有一个成功；
+        租约过期且次数已用完的任务直接标记为失败
+        
+        Args:
+            owner: Worker 标识
+            lease_seconds: 租约时长（秒）
+            limit: 最多领取的任务数
+            max_attempts: 每个任务最多领取次数
+            reference_video_id: 只领取该参考视频的任务（用于凑批）
+            exercise_type_id: 只领取该动作类型的任务（用于凑批）
+        
+        Returns:
+            已领取的任务记录
+        """
+        try:
+            now = datetime.utcnow()
+            
+            def candidates(status: str, time_column: str):
+                query = (
+                    self.client.table("analysis_tasks")
+                    .select("*")
+                    .eq("status", status)
+                    .lt(time_column, now.isoformat())
+                )
+                if reference_video_id is not None:
+                    query = query.eq("reference_video_id", reference_video_id)
+                if exercise_type_id is not None:
+                    query = query.eq("exercise_type_id", exercise_type_id)
+                # 多取一些候选，被其他 Worker 抢先时仍能领满
+                return query.order("created_at").limit(limit * 2).execute().data or []
+            
+            expired = candidates(TaskStatus.PROCESSING.value, "lease_expires_at")
+            pending = candidates(TaskStatus.PENDING.value, "available_at")
+            
+            claimed = []
+            for task in expired + pending:
+                if len(claimed) >= limit:
+                    break
+                attempts = task.get("attempts") or 0
+                if task["status"] == TaskStatus.PROCESSING.value and attempts >= max_attempts:
+                    data = {
+                        "status": TaskStatus.FAILED.value,
+                        "error_message": "处理超时",
+                        "processing_completed_at": now.isoformat(),
+                        "lease_owner": None,
+                        "lease_expires_at": None
+                    }
+                else:
+                    data = {
+                        "status": TaskStatus.PROCESSING.value,
+                        "lease_owner": owner,
+                        "lease_expires_at": (now + timedelta(seconds=lease_seconds)).isoformat(),
+                        "attempts": attempts + 1,
+                        "processing_started_at": now.isoformat()
+                    }
+                
+                result = (
+                    self.client.table("analysis_tasks")
+                    .update(data)
+                    .eq("id", task["id"])
+                    .eq("status", task["status"])
+                    .eq("attempts", attempts)
+                    .execute()
+                )
+                if result.data and data["status"] == TaskStatus.PROCESSING.value:
+                    claimed.append(result.data[0])
+                elif result.data:
+                    logger.warning(f"任务 {task['id']} 租约过期且次数已用完，标记为失败")
+            
+            if claimed:
+                logger.info(f"{owner} 领取任务: {[task['id'] for task in claimed]}")
+            return claimed
+        except Exception as e:
+            logger.error(f"领取任务失败: {e}")
+            return []
+    
+    async def extend_task_leases(
+        self,
+        task_ids: List[str],
+        owner: str,
+        lease_seconds: float
+    ) -> int:
+        """
+        延长仍由 owner 持有的任务租约
+        
+        Returns:
+            成功延长的任务数（少于 task_ids 说明部分租约已被回收）
+        """
+        try:
+            expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+            result = (
+                self.client.table("analysis_tasks")
+                .update({"lease_expires_at": expires_at.isoformat()})
+                .in_("id", task_ids)
+                .eq("status", TaskStatus.PROCESSING.value)
+                .eq("lease_owner", owner)
+                .execute()
+            )
+            return len(result.data or [])
+        except Exception as e:
+            logger.error(f"延长任务租约失败: {e}")
+            return 0
+    
+    async def release_task_lease(
+        self,
+        task_id: str,
+        owner: str,
+        error_message: str,
+        retry_delay: Optional[float] = None
+    ) -> bool:
+        """
+        释放处理失败的任务（仍由 owner 持有且处于 processing 时才生效）
+        
+        Args:
+            task_id: 任务 ID
+            owner: Worker 标识
+            error_message: 错误信息
+            retry_delay: 重新排队前的等待秒数；None 表示不再重试，标记为失败
+        
+        Returns:
+            是否释放成功
+        """
+        try:
+            now = datetime.utcnow()
+            data = {"lease_owner": None, "lease_expires_at": None, "error_message": error_message}
+            if retry_delay is None:
+                data["status"] = TaskStatus.FAILED.value
+                data["processing_completed_at"] = now.isoformat()
+            else:
+                data["status"] = TaskStatus.PENDING.value
+                data["available_at"] = (now + timedelta(seconds=retry_delay)).isoformat()
+            
+            result = (
+                self.client.table("analysis_tasks")
+                .update(data)
+                .eq("id", task_id)
+                .eq("status", TaskStatus.PROCESSING.value)
+                .eq("lease_owner", owner)
+                .execute()
+            )
+            return bool(result.data)
+        except Exception as e:
+            logger.error(f"释放任务租约失败: {e}")
+            return False
+    
+    async def count_pending_tasks(self) -> int:
+        """等待领取的任务数"""
+        try:
+            result = (
+                self.client.table("analysis_tasks")
+                .select("id", count="exact")
+                .eq("status", TaskStatus.PENDING.value)
+                .execute()
+            )
+            return result.count or 0
+        except Exception as e:
+            logger.error(f"查询待处理任务数失败: {e}")
+            return 0
+    
     # ================================
     # 分析结果 (analysis_results)
     # ================================
@@ -209,18 +524,94 @@ class SupabaseService:
             是否下载成功
         """
         try:
-            # 从 analysis-videos bucket 下载
-            data = self.client.storage.from_("analysis-videos").download(file_path)
+            # 从 analysis-videos bucket 下载（同步客户端放到线程中执行，不阻塞事件循环）
+            data = await asyncio.to_thread(
+                self.client.storage.from_("analysis-videos").download, file_path
+            )
             
             # 保存到本地
-            with open(local_path, "wb") as f:
-                f.write(data)
+            await asyncio.to_thread(_write_file, local_path, data)
             
             logger.info(f"视频下载成功: {file_path} -> {local_path}")
             return True
         except Exception as e:
             logger.error(f"视频下载失败: {e}")
             return False
+    
+    async def create_video_url(self, file_path: str, expires_in: int = 600) -> Optional[str]:
+        """
+        生成视频的签名下载地址（供工作进程边下载边解码）
+        
+        Args:
+            file_path: Storage 中的文件路径
+            expires_in: 有效期（秒）
+        
+        Returns:
+            签名 URL，失败时返回 None
+        """
+        try:
+            data = await asyncio.to_thread(
+                self.client.storage.from_("analysis-videos").create_signed_url,
+                file_path,
+                expires_in
+            )
+            return data["signedURL"]
+        except Exception as e:
+            logger.error(f"生成视频下载地址失败: {e}")
+            return None
+    
+    async def upload_artifact(self, file_path: str, data: bytes) -> bool:
+        """
+        上传预处理产物到 Storage（覆盖同名文件）
+        
+        Args:
+            file_path: Storage 中的文件路径
+            data: 文件内容
+        
+        Returns:
+            是否上传成功
+        """
+        try:
+            await asyncio.to_thread(
+                self.client.storage.from_("analysis-videos").upload,
+                file_path,
+                data,
+                {"content-type": "application/octet-stream", "upsert": "true"}
+            )
+            logger.info(f"产物上传成功: {file_path} ({len(data)} 字节)")
+            return True
+        except Exception as e:
+            logger.error(f"产物上传失败: {e}")
+            return False
+    
+    async def download_artifact(self, file_path: str) -> Optional[bytes]:
+        """从 Storage 下载预处理产物（不存在时返回 None）"""
+        try:
+            return await asyncio.to_thread(
+                self.client.storage.from_("analysis-videos").download, file_path
+            )
+        except Exception as e:
+            logger.error(f"产物下载失败: {e}")
+            return None
+    
+    async def update_reference_features(self, video_id: str, features_path: str) -> bool:
+        """记录参考视频预处理产物的 Storage 路径"""
+        try:
+            data = {
+                "features_path": features_path,
+                "features_prepared_at": datetime.utcnow().isoformat()
+            }
+            self.client.table("video_uploads").update(data).eq("id", video_id).execute()
+            logger.info(f"参考视频 {video_id} 预处理产物已记录: {features_path}")
+            return True
+        except Exception as e:
+            logger.error(f"记录预处理产物失败: {e}")
+            return False
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
 
 
 # 单例模式
@@ -0,0 +1,112 @@
+"""
+分析任务去重
+
+功能:
+- 幂等提交: 同一用户重复提交相同的 idempotency_key 时返回第一次创建的任务
+- 相同任务复用: 同一用户对相同 (参考视频, 用户视频, 动作类型) 重复提交时
+  - 已有任务在等待或处理中 → 直接返回该任务
+  - 已有任务在复用期限内完成 → 复制其结果到新任务，不重新计算
+- 输出去重率等指标
+"""
+
+import os
+from typing import Any, Dict, NamedTuple, Optional
+import logging
+
+from models.schemas import TaskStatus
+from services.supabase_service import SupabaseService
+
+logger = logging.getLogger(__name__)
+
+
+class ReusedTask(NamedTuple):
+    """去重命中的任务"""
+    task_id: str
+    status: TaskStatus
+    reason: str  # replayed / attached / cloned
+
+
+class TaskDeduplicator:
+    """分析任务去重（命中计数按 API 进程统计）"""
+
+    MESSAGES = {
+        "replayed": "重复提交，返回已创建的任务",
+        "attached": "相同的分析任务正在处理中",
+        "cloned": "相同的分析已完成，已复用结果"
+    }
+
+    def __init__(self, result_ttl: float = 86400.0):
+        """
+        Args:
+            result_ttl: 已完成结果的复用期限 (秒)，0 表示不复用已完成的结果
+        """
+        self.result_ttl = float(result_ttl)
+        self.submitted = 0
+        self.hits = {reason: 0 for reason in self.MESSAGES}
+
+    async def resolve(
+        self,
+        supabase: SupabaseService,
+        user_id: str,
+        reference_video_id: str,
+        user_video_id: str,
+        exercise_type_id: int,
+        idempotency_key: Optional[str] = None
+    ) -> Optional[ReusedTask]:
+        """
+        查找可复用的任务（每次提交调用一次，计入去重率）
+
+        Returns:
+            命中时返回复用的任务，否则返回 None（调用方正常创建任务）
+        """
+        self.submitted += 1
+
+        if idempotency_key:
+            task = await supabase.find_task_by_idempotency_key(user_id, idempotency_key)
+            if task:
+                return self._hit(task["id"], TaskStatus(task["status"]), "replayed")
+
+        task = await supabase.find_latest_task(
+            user_id, reference_video_id, user_video_id, exercise_type_id,
+            statuses=[TaskStatus.PENDING, TaskStatus.PROCESSING, TaskStatus.COMPLETED],
+            completed_within=self.result_ttl
+        )
+        if task is None:
+            return None
+        if task["status"] != TaskStatus.COMPLETED.value:
+            return self._hit(task["id"], TaskStatus(task["status"]), "attached")
+
+        task_id = await supabase.clone_completed_task(task, idempotency_key)
+        if task_id is None:
+            return None
+        return self._hit(task_id, TaskStatus.COMPLETED, "cloned")
+
+    def _hit(self, task_id: str, status: TaskStatus, reason: str) -> ReusedTask:
+        self.hits[reason] += 1
+        logger.info(f"任务去重命中 ({reason}): {task_id}")
+        return ReusedTask(task_id, status, reason)
+
+    def message(self, reused: ReusedTask) -> str:
+        return self.MESSAGES[reused.reason]
+
+    def stats(self) -> Dict[str, Any]:
+        deduplicated = sum(self.hits.values())
+        return {
+            "submitted": self.submitted,
+            "deduplicated": deduplicated,
+            **self.hits,
+            "dedup_rate": round(deduplicated / self.submitted, 4) if self.submitted else 0.0
+        }
+
+
+# 单例模式
+_task_deduplicator_instance: Optional[TaskDeduplicator] = None
+
+def get_task_deduplicator() -> TaskDeduplicator:
+    """获取分析任务去重单例"""
+    global _task_deduplicator_instance
+    if _task_deduplicator_instance is None:
+        _task_deduplicator_instance = TaskDeduplicator(
+            result_ttl=float(os.getenv("ANALYSIS_RESULT_REUSE_SECONDS", 86400))
+        )
+    return _task_deduplicator_instance
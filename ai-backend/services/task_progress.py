@@ -0,0 +1,187 @@
+"""
+分析任务进度推送
+
+功能:
+- API 进程内记录每个任务的当前阶段和最新进度（不写数据库）
+- 阶段: queued → loading → extracting (逐帧进度) → analyzing → saving → completed / failed
+- 工作进程的解码进度经执行引擎的进度通道汇总到这里，
+  同一任务的多个视频（参考视频 / 用户视频 / 分段）合计为一个帧进度
+- 订阅者（SSE 连接）通过 asyncio 队列接收进度事件
+- 已结束或长时间无更新的任务在保留期后清理
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 帧进度的来源: ((task_id, ...), 视频标签)，参考视频在批量任务中属于多个任务
+ProgressKey = Tuple[Tuple[str, ...], str]
+
+# 各阶段的默认提示和进度百分比
+STAGES = {
+    "queued": ("排队等待处理", 0),
+    "loading": ("正在读取视频", 5),
+    "extracting": ("姿态识别中", 10),
+    "analyzing": ("动作对比分析中", 85),
+    "saving": ("正在生成分析报告", 95),
+    "completed": ("分析完成", 100),
+    "failed": ("分析失败", 100)
+}
+TERMINAL_STAGES = ("completed", "failed")
+
+# 逐帧进度映射到的百分比区间 [extracting, analyzing)
+_EXTRACT_SPAN = STAGES["analyzing"][1] - STAGES["extracting"][1]
+
+
+class TaskProgress:
+    """分析任务进度（按 API 进程记录，由独立 Worker 处理的任务不在这里）"""
+
+    def __init__(self, retention: float = 600.0, subscriber_buffer: int = 32):
+        """
+        Args:
+            retention: 已结束 / 无更新的任务进度的保留时长（秒）
+            subscriber_buffer: 每个订阅者最多积压的事件数，超过时丢弃最旧的事件
+        """
+        self.retention = float(retention)
+        self.subscriber_buffer = subscriber_buffer
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._frames: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._updated_at: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.published = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """绑定 API 进程的事件循环（report_frames 从其他线程调用时转交到该循环）"""
+        self._loop = loop
+
+    def publish(
+        self,
+        task_ids: Sequence[str],
+        stage: str,
+        message: Optional[str] = None,
+        **fields
+    ):
+        """
+        记录阶段变化并推送给订阅者（在事件循环线程中调用）
+
+        Args:
+            task_ids: 任务 ID 列表（批量任务的参考视频阶段同时属于多个任务）
+            stage: STAGES 中的阶段
+            message: 提示文字（默认使用阶段的提示）
+            fields: 附加字段，如 error_message / overall_score
+        """
+        default_message, percent = STAGES[stage]
+        for task_id in task_ids:
+            if stage != "extracting":
+                self._frames.pop(task_id, None)
+            self._emit(task_id, {
+                "task_id": task_id,
+                "stage": stage,
+                "message": message or default_message,
+                "progress": percent,
+                **fields
+            })
+        self._prune()
+
+    def report_frames(self, key: ProgressKey, frames_done: int, frames_total: int):
+        """
+        记录一个视频的解码进度（线程安全，由执行引擎的进度通道调用）
+
+        Args:
+            key: (任务 ID 元组, 视频标签)
+            frames_done: 已解码到的原始帧数
+            frames_total: 视频（或分段）的总帧数
+        """
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._apply_frames, key, frames_done, frames_total)
+        else:
+            self._apply_frames(key, frames_done, frames_total)
+
+    def _apply_frames(self, key: ProgressKey, frames_done: int, frames_total: int):
+        task_ids, label = key
+        for task_id in task_ids:
+            state = self._states.get(task_id)
+            # 进度通道有延迟: 已进入后续阶段后到达的帧进度直接丢弃
+            if state is None or state["stage"] not in ("loading", "extracting"):
+                continue
+            frames = self._frames.setdefault(task_id, {})
+            frames[label] = (frames_done, max(frames_total, frames_done))
+            done = sum(d for d, _ in frames.values())
+            total = sum(t for _, t in frames.values())
+            ratio = done / total if total else 0.0
+            self._emit(task_id, {
+                "task_id": task_id,
+                "stage": "extracting",
+                "message": f"已解码 {done}/{total} 帧",
+                "progress": STAGES["extracting"][1] + int(_EXTRACT_SPAN * ratio),
+                "frames_done": done,
+                "frames_total": total
+            })
+
+    def _emit(self, task_id: str, event: Dict[str, Any]):
+        self._states[task_id] = event
+        self._updated_at[task_id] = time.monotonic()
+        self.published += 1
+        for queue in self._subscribers.get(task_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def latest(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """任务的最新进度（本进程未处理过该任务时返回 None）"""
+        return self._states.get(task_id)
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """订阅任务的进度事件，结束时必须调用 unsubscribe"""
+        queue = asyncio.Queue(maxsize=self.subscriber_buffer)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[task_id]
+
+    def _prune(self):
+        """清理超过保留期且无人订阅的任务进度"""
+        deadline = time.monotonic() - self.retention
+        expired: List[str] = [
+            task_id for task_id, updated_at in self._updated_at.items()
+            if updated_at < deadline and task_id not in self._subscribers
+        ]
+        for task_id in expired:
+            self._states.pop(task_id, None)
+            self._frames.pop(task_id, None)
+            del self._updated_at[task_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tracked": len(self._states),
+            "active": sum(
+                1 for state in self._states.values()
+                if state["stage"] not in TERMINAL_STAGES
+            ),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published
+        }
+
+
+# 单例模式
+_task_progress_instance: Optional[TaskProgress] = None
+
+def get_task_progress() -> TaskProgress:
+    """获取分析任务进度单例"""
+    global _task_progress_instance
+    if _task_progress_instance is None:
+        _task_progress_instance = TaskProgress(
+            retention=float(os.getenv("ANALYSIS_PROGRESS_RETENTION", 600))
+        )
+    return _task_progress_instance
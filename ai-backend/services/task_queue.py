@@ -0,0 +1,298 @@
+"""
+持久化任务队列（本地 SQLite）
+
+功能:
+- 任务写入本地 SQLite 文件，进程崩溃或机器停止后重启仍可继续
+- 租约 + 可见性超时: 领取任务时记录持有者和到期时间，运行中定期续约；
+  持有者失联、租约到期后任务重新变为可领取
+- 失败按指数退避重试，超过最大次数后进入 dead 状态
+- 同一文件只应由一台机器上的进程使用（Fly 上放在挂载卷中）
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+_SCHEMA = """
+create table if not exists jobs (
+    id integer primary key autoincrement,
+    kind text not null,
+    payload text not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    max_attempts integer not null,
+    available_at real not null,
+    lease_owner text,
+    lease_expires_at real,
+    last_error text,
+    created_at real not null,
+    updated_at real not null
+);
+create index if not exists jobs_status_available_idx on jobs(status, available_at);
+"""
+
+
+class QueuedJob(NamedTuple):
+    """已领取的任务"""
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int        # 含本次在内的执行次数
+    max_attempts: int
+
+    @property
+    def final(self) -> bool:
+        """是否为最后一次尝试"""
+        return self.attempts >= self.max_attempts
+
+
+class TaskQueue:
+    """基于 SQLite 的持久化任务队列（线程安全，每次操作使用独立连接）"""
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = 3,
+        visibility_timeout: float = 300.0,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+        retention: float = 86400.0
+    ):
+        """
+        Args:
+            path: SQLite 文件路径
+            max_attempts: 每个任务最多执行次数
+            visibility_timeout: 租约时长 (秒)，持有者超过该时间未续约则视为失联
+            backoff_base: 第 1 次失败后的重试等待 (秒)，之后每次翻倍
+            backoff_max: 重试等待上限 (秒)
+            retention: 已完成 / dead 任务的保留时长 (秒)
+        """
+        self.path = path
+        self.max_attempts = max(1, int(max_attempts))
+        self.visibility_timeout = float(visibility_timeout)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.retention = float(retention)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务（BEGIN IMMEDIATE，多个线程 / 进程同时领取时互斥）"""
+        with self._connect() as conn:
+            conn.execute("begin immediate")
+            try:
+                yield conn
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        """写入新任务，返回任务 ID"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "insert into jobs (kind, payload, max_attempts, available_at, created_at, updated_at)"
+                " values (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), self.max_attempts, now, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, owner: str) -> Optional[QueuedJob]:
+        """领取最早可执行的任务并加租约，没有可执行任务时返回 None"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "select * from jobs where status = ? and available_at <= ?"
+                " order by available_at, id limit 1",
+                (PENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "update jobs set status = ?, attempts = attempts + 1, lease_owner = ?,"
+                " lease_expires_at = ?, updated_at = ? where id = ?",
+                (PROCESSING, owner, now + self.visibility_timeout, now, row["id"])
+            )
+        return QueuedJob(
+            id=row["id"],
+            kind=row["kind"],
+            payload=json.loads(row["payload"]),
+            attempts=row["attempts"] + 1,
+            max_attempts=row["max_attempts"]
+        )
+
+    def heartbeat(self, job_id: int, owner: str) -> bool:
+        """续约；租约已被回收（超时后被重新领取）时返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "update jobs set lease_expires_at = ?, updated_at = ?"
+                " where id = ? and status = ? and lease_owner = ?",
+                (now + self.visibility_timeout, now, job_id, PROCESSING, owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, owner: str) -> bool:
+        """标记完成（仍持有租约时才生效）"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "update jobs set status = ?, lease_owner = null, lease_expires_at = null,"
+                " updated_at = ? where id = ? and status = ? and lease_owner = ?",
+                (DONE, time.time(), job_id, PROCESSING, owner)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, owner: str, error: str) -> bool:
+        """
+        记录一次失败: 还有剩余次数时按退避时间重新排队，否则进入 dead
+
+        Returns:
+            是否会重试
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "select attempts, max_attempts from jobs"
+                " where id = ? and status = ? and lease_owner = ?",
+                (job_id, PROCESSING, owner)
+            ).fetchone()
+            if row is None:
+                return False
+            retry = row["attempts"] < row["max_attempts"]
+            conn.execute(
+                "update jobs set status = ?, available_at = ?, lease_owner = null,"
+                " lease_expires_at = null, last_error = ?, updated_at = ? where id = ?",
+                (
+                    PENDING if retry else DEAD,
+                    now + self.backoff(row["attempts"]) if retry else now,
+                    error,
+                    now,
+                    job_id
+                )
+            )
+        return retry
+
+    def backoff(self, attempts: int) -> float:
+        """第 attempts 次失败后的重试等待 (秒)"""
+        return min(self.backoff_base * 2 ** max(attempts - 1, 0), self.backoff_max)
+
+    def release(self, owners: List[str]) -> int:
+        """
+        让指定持有者的租约立即到期（进程重启时用于上一个进程遗留的任务，
+        不必等待可见性超时），下一次 reap 时按剩余次数重新排队或进入 dead
+
+        Returns:
+            到期的任务数
+        """
+        if not owners:
+            return 0
+        placeholders = ",".join("?" * len(owners))
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"update jobs set lease_expires_at = 0"
+                f" where status = ? and lease_owner in ({placeholders})",
+                (PROCESSING, *owners)
+            )
+            return cursor.rowcount
+
+    def lease_owners(self) -> List[str]:
+        """当前持有租约的持有者"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "select distinct lease_owner from jobs where status = ?", (PROCESSING,)
+            ).fetchall()
+        return [row["lease_owner"] for row in rows]
+
+    def reap(self) -> List[QueuedJob]:
+        """
+        回收租约已到期的任务: 还有剩余次数的重新排队，已用完的进入 dead；
+        同时清理超过保留时长的已完成 / dead 任务
+
+        Returns:
+            本次进入 dead 的任务（调用方据此把对应业务记录标记为失败）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            expired = conn.execute(
+                "select * from jobs where status = ? and lease_expires_at < ?",
+                (PROCESSING, now)
+            ).fetchall()
+            dead = []
+            for row in expired:
+                retry = row["attempts"] < row["max_attempts"]
+                conn.execute(
+                    "update jobs set status = ?, available_at = ?, lease_owner = null,"
+                    " lease_expires_at = null, last_error = ?, updated_at = ? where id = ?",
+                    (
+                        PENDING if retry else DEAD,
+                        now + self.backoff(row["attempts"]) if retry else now,
+                        "租约超时",
+                        now,
+                        row["id"]
+                    )
+                )
+                if not retry:
+                    dead.append(QueuedJob(
+                        id=row["id"],
+                        kind=row["kind"],
+                        payload=json.loads(row["payload"]),
+                        attempts=row["attempts"],
+                        max_attempts=row["max_attempts"]
+                    ))
+            conn.execute(
+                "delete from jobs where status in (?, ?) and updated_at < ?",
+                (DONE, DEAD, now - self.retention)
+            )
+        if expired:
+            logger.warning(f"回收租约超时的任务 {len(expired)} 个，其中 {len(dead)} 个不再重试")
+        return dead
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._connect() as conn:
+            rows = conn.execute("select status, count(*) as n from jobs group by status").fetchall()
+        counts = {status: 0 for status in (PENDING, PROCESSING, DONE, DEAD)}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+# 单例模式
+_task_queue_instance: Optional[TaskQueue] = None
+
+def get_task_queue() -> TaskQueue:
+    """获取持久化任务队列单例"""
+    global _task_queue_instance
+    if _task_queue_instance is None:
+        _task_queue_instance = TaskQueue(
+            path=os.getenv("ANALYSIS_QUEUE_PATH", "/tmp/movechecker/queue.sqlite3"),
+            max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", 3)),
+            visibility_timeout=float(os.getenv("ANALYSIS_VISIBILITY_TIMEOUT", 300)),
+            backoff_base=float(os.getenv("ANALYSIS_RETRY_BACKOFF", 5))
+        )
+    return _task_queue_instance
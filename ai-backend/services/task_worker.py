@@ -0,0 +1,166 @@
+"""
+独立 Worker 的任务领取循环
+
+功能:
+- 直接以 analysis_tasks 表为队列: 通过 SupabaseService 条件更新领取 pending 任务并加租约，
+  多个 Worker 节点可同时运行，同一任务只会被一个 Worker 处理
+- 领取到任务后顺带领取同一参考视频 / 动作类型的其他待处理任务，合并为一次批量分析
+- 处理期间定期续约；Worker 失联、租约过期后任务可被其他 Worker 重新领取
+- 失败按退避重试，次数用完后标记为失败；停止时释放未完成任务的租约
+"""
+
+import asyncio
+import os
+import socket
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from services.exercise_registry import SQUAT
+from services.supabase_service import SupabaseService
+
+logger = logging.getLogger(__name__)
+
+# 处理单个任务: run_task(task_id)
+TaskRunner = Callable[[str], Awaitable[None]]
+# 处理同一参考视频的多个任务: run_batch(reference_video_id, [(task_id, user_video_id)], exercise_type_id)
+BatchRunner = Callable[[str, List[Tuple[str, str]], int], Awaitable[None]]
+
+
+class TaskWorker:
+    """从 analysis_tasks 领取并处理任务的 Worker"""
+
+    def __init__(
+        self,
+        supabase: SupabaseService,
+        run_task: TaskRunner,
+        run_batch: BatchRunner,
+        concurrency: int = 1,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        batch_size: int = 8,
+        poll_interval: float = 2.0,
+        backoff_base: float = 5.0,
+        owner: Optional[str] = None
+    ):
+        """
+        Args:
+            supabase: 数据库服务
+            run_task: 单个任务的处理函数，抛出异常表示失败
+            run_batch: 批量任务的处理函数，抛出异常表示失败
+            concurrency: 同时处理的任务（批）数
+            lease_seconds: 租约时长（秒），处理期间每 1/3 续约一次
+            max_attempts: 每个任务最多领取次数
+            batch_size: 一次最多合并处理的任务数（1 表示不合并）
+            poll_interval: 没有任务时的轮询间隔（秒）
+            backoff_base: 首次失败后的重试等待（秒），之后每次翻倍
+            owner: Worker 标识（默认 主机名:进程号）
+        """
+        self.supabase = supabase
+        self.run_task = run_task
+        self.run_batch = run_batch
+        self.concurrency = max(1, int(concurrency))
+        self.lease_seconds = float(lease_seconds)
+        self.max_attempts = max(1, int(max_attempts))
+        self.batch_size = max(1, int(batch_size))
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def run(self, stop: asyncio.Event):
+        """运行直到 stop 被设置；停止时中断处理中的任务并释放租约"""
+        slots = [
+            asyncio.create_task(self._slot(), name=f"task-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Worker 已启动: {self.owner}, 并发 {self.concurrency}")
+        await stop.wait()
+        for slot in slots:
+            slot.cancel()
+        await asyncio.gather(*slots, return_exceptions=True)
+        logger.info(f"Worker 已停止: {self.owner}, {self.stats()}")
+
+    async def _slot(self):
+        while True:
+            tasks = await self.claim()
+            if not tasks:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.process(tasks)
+
+    async def claim(self) -> List[Dict]:
+        """领取一个任务，并凑上同一参考视频 / 动作类型的其他待处理任务"""
+        tasks = await self.supabase.claim_analysis_tasks(
+            self.owner, self.lease_seconds, 1, self.max_attempts
+        )
+        if tasks and self.batch_size > 1:
+            first = tasks[0]
+            tasks += await self.supabase.claim_analysis_tasks(
+                self.owner,
+                self.lease_seconds,
+                self.batch_size - 1,
+                self.max_attempts,
+                reference_video_id=first["reference_video_id"],
+                exercise_type_id=first["exercise_type_id"]
+            )
+        return tasks
+
+    async def process(self, tasks: List[Dict]):
+        """处理已领取的任务（同一参考视频的多个任务合并为一次批量分析）"""
+        task_ids = [task["id"] for task in tasks]
+        heartbeat = asyncio.create_task(self._heartbeat(task_ids))
+        self.running += 1
+        try:
+            if len(tasks) == 1:
+                await self.run_task(task_ids[0])
+            else:
+                first = tasks[0]
+                await self.run_batch(
+                    first["reference_video_id"],
+                    [(task["id"], task["user_video_id"]) for task in tasks],
+                    first.get("exercise_type_id") or SQUAT.exercise_type_id
+                )
+            self.completed += len(tasks)
+        except asyncio.CancelledError:
+            # Worker 停止: 立即放回队列，由其他 Worker 接手
+            for task_id in task_ids:
+                await self.supabase.release_task_lease(task_id, self.owner, "Worker 停止", 0)
+            raise
+        except Exception as e:
+            for task in tasks:
+                await self._release(task, str(e))
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+
+    async def _release(self, task: Dict, error: str):
+        """释放处理失败的任务: 还有剩余次数时按退避时间重新排队，否则标记为失败"""
+        attempts = task.get("attempts") or 1
+        if attempts >= self.max_attempts:
+            if await self.supabase.release_task_lease(task["id"], self.owner, error):
+                self.failed += 1
+                logger.error(f"任务 {task['id']} 处理失败，不再重试: {error}")
+            return
+        delay = self.backoff_base * 2 ** (attempts - 1)
+        if await self.supabase.release_task_lease(task["id"], self.owner, error, delay):
+            self.retried += 1
+            logger.warning(f"任务 {task['id']} 处理失败，{delay:.0f} 秒后重试: {error}")
+
+    async def _heartbeat(self, task_ids: List[str]):
+        interval = max(self.lease_seconds / 3, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            extended = await self.supabase.extend_task_leases(task_ids, self.owner, self.lease_seconds)
+            if extended < len(task_ids):
+                logger.warning(f"部分任务的租约已失效: {extended}/{len(task_ids)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried
+        }
@@ -0,0 +1,110 @@
+"""
+动作轨迹时间对齐
+
+功能:
+- Sakoe-Chiba 带约束的动态时间规整 (DTW)，对齐参考与用户的逐帧特征序列
+- 带宽随两段长度比例倾斜，整体节奏不同的两段也能对齐
+- 逐行向量化: 行内横向递推用前缀和 + 累积最小值一次求出，
+  计算量和内存都是 O(n × band)，不构造完整的 n × m 矩阵
+"""
+
+import math
+import numpy as np
+from typing import Tuple
+
+
+def band_limits(n: int, m: int, band: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    每一行（参考帧）允许对齐的用户帧范围 [lo, hi]
+
+    带中心沿 (0, 0) → (n-1, m-1) 的对角线倾斜，带宽至少为对角线斜率，保证相邻行可连通
+    """
+    slope = (m - 1) / (n - 1) if n > 1 else 0.0
+    band = max(band, math.ceil(slope), 1)
+    center = np.arange(n) * slope
+    lo = np.clip(np.ceil(center - band), 0, m - 1).astype(np.int64)
+    hi = np.clip(np.floor(center + band), 0, m - 1).astype(np.int64)
+    lo[0], hi[-1] = 0, m - 1
+    return lo, hi
+
+
+def banded_dtw(
+    reference: np.ndarray,
+    user: np.ndarray,
+    band: int
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    带约束的 DTW
+
+    Args:
+        reference: (n, d) 参考特征序列
+        user: (m, d) 用户特征序列
+        band: Sakoe-Chiba 带宽（帧）
+
+    Returns:
+        (参考帧下标, 用户帧下标, 平均对齐代价)，下标为对齐路径上按时间排序的 int 数组
+    """
+    reference = np.asarray(reference, dtype=np.float64).reshape(len(reference), -1)
+    user = np.asarray(user, dtype=np.float64).reshape(len(user), -1)
+    n, m = len(reference), len(user)
+    if n == 0 or m == 0:
+        raise ValueError("对齐的序列不能为空")
+
+    lo, hi = band_limits(n, m, band)
+    width = int((hi - lo).max()) + 1
+    # 带内坐标: 第 i 行第 k 列对应用户帧 lo[i] + k
+    columns = lo[:, None] + np.arange(width)[None, :]
+    inside = columns <= hi[:, None]
+    # 带内所有帧对的局部距离一次算出
+    local = np.linalg.norm(
+        user[np.minimum(columns, m - 1)] - reference[:, None, :], axis=2
+    )
+    local[~inside] = np.inf
+
+    cost = np.full((n, width), np.inf)
+    cost[0] = np.cumsum(local[0])
+    steps = np.arange(width)
+    for i in range(1, n):
+        # 上一行中正上方 / 左上方单元的带内列号
+        up_index = steps + (lo[i] - lo[i - 1])
+        up = np.where(up_index < width, cost[i - 1, np.minimum(up_index, width - 1)], np.inf)
+        # 带的下沿一次右移超过一列时，左上方可能落在上一行的带外
+        diag = np.where(
+            (up_index >= 1) & (up_index - 1 < width),
+            cost[i - 1, np.clip(up_index - 1, 0, width - 1)],
+            np.inf
+        )
+        vertical = local[i] + np.minimum(up, diag)
+
+        # 行内横向递推 D[k] = min(vertical[k], D[k-1] + local[k])
+        # 展开为 D[k] = S[k] + min_{l<=k}(vertical[l] - S[l])，S 为 local 的前缀和
+        row = int(hi[i] - lo[i]) + 1
+        prefix = np.cumsum(local[i, :row])
+        cost[i, :row] = prefix + np.minimum.accumulate(vertical[:row] - prefix)
+
+    path_ref, path_user = _backtrack(cost, lo, hi)
+    total = float(cost[n - 1, m - 1 - lo[n - 1]])
+    return path_ref, path_user, total / len(path_ref)
+
+
+def _backtrack(
+    cost: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """从终点沿最小累积代价回溯对齐路径（相等时优先对角线）"""
+
+    def value(i: int, j: int) -> float:
+        if i < 0 or j < lo[i] or j > hi[i]:
+            return math.inf
+        return cost[i, j - lo[i]]
+
+    i, j = len(lo) - 1, int(hi[-1])
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        steps = ((i - 1, j - 1), (i - 1, j), (i, j - 1))
+        i, j = min(steps, key=lambda step: value(*step))
+        path.append((i, j))
+    path.reverse()
+    indices = np.array(path, dtype=np.int64)
+    return indices[:, 0], indices[:, 1]
@@ -0,0 +1,202 @@
+"""
+内存视频流
+
+功能:
+- StreamingBuffer: 边下载边写入的内存缓冲区，读取方可在下载完成前开始解码
+- 读取超出已下载范围时阻塞等待，直到数据到达或下载结束
+- 通过 OpenCV 的 FFmpeg 流式读取接口直接解码内存数据，不落盘
+- 下载时同步计算内容哈希（用于关键点缓存）
+"""
+
+import cv2
+import hashlib
+import io
+import threading
+from typing import Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 下载分块大小
+CHUNK_SIZE = 256 * 1024
+
+
+class StreamingBuffer:
+    """只追加的内存缓冲区（一个写入方，任意多个读取方，线程安全）"""
+
+    def __init__(self, expected_size: Optional[int] = None):
+        """
+        Args:
+            expected_size: 预期总字节数（通常来自 Content-Length，用于 SEEK_END 时不必等待下载结束）
+        """
+        self.expected_size = expected_size
+        self._data = bytearray()
+        self._complete = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StreamingBuffer":
+        """由完整数据构建已结束的缓冲区"""
+        buffer = cls(expected_size=len(data))
+        buffer.write(data)
+        buffer.finish()
+        return buffer
+
+    def write(self, chunk: bytes):
+        """追加数据并唤醒等待中的读取方"""
+        with self._cond:
+            self._data += chunk
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """标记写入结束（error 不为 None 时读取方会抛出该异常）"""
+        with self._cond:
+            self._complete = True
+            self._error = error
+            self._cond.notify_all()
+
+    @property
+    def size(self) -> int:
+        """已写入的字节数"""
+        return len(self._data)
+
+    @property
+    def complete(self) -> bool:
+        return self._complete
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        """写入方结束时报告的异常"""
+        return self._error
+
+    def wait_for(self, end: Optional[int]) -> int:
+        """
+        阻塞直到已写入 end 字节或写入结束（end 为 None 时等待写入结束）
+
+        下载失败时不抛出异常（异常穿过 OpenCV 的读取回调会导致进程崩溃），
+        读取方看到的是提前结束的数据，调用方应在解码结束后检查 error
+
+        Returns:
+            当前可读的字节数
+        """
+        with self._cond:
+            while not self._complete and (end is None or len(self._data) < end):
+                self._cond.wait()
+            return len(self._data)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """读取 [offset, offset + size)，数据未到达时阻塞"""
+        available = self.wait_for(offset + size)
+        end = min(offset + size, available)
+        with self._cond:
+            return bytes(self._data[offset:end]) if offset < end else b""
+
+    def total_size(self) -> int:
+        """总字节数（未知时等待写入结束）"""
+        if self.expected_size is not None and self._error is None:
+            return self.expected_size
+        return self.wait_for(None)
+
+    def open(self) -> "BufferReader":
+        """创建独立游标的读取方"""
+        return BufferReader(self)
+
+
+class BufferReader(io.BufferedIOBase):
+    """StreamingBuffer 的只读文件对象（可 seek，供 cv2.VideoCapture 使用）"""
+
+    def __init__(self, buffer: StreamingBuffer):
+        super().__init__()
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._buffer.total_size() + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        self._position = max(0, position)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._buffer.total_size() - self._position
+        data = self._buffer.read_at(self._position, max(0, size))
+        self._position += len(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+VideoSource = Union[str, StreamingBuffer]
+
+
+def open_capture(source: VideoSource) -> cv2.VideoCapture:
+    """
+    打开视频源
+
+    Args:
+        source: 本地文件路径或 StreamingBuffer（内存流，无需落盘）
+    """
+    if isinstance(source, StreamingBuffer):
+        return cv2.VideoCapture(source.open(), cv2.CAP_FFMPEG, [])
+    return cv2.VideoCapture(source)
+
+
+def release_capture(cap: cv2.VideoCapture, source: VideoSource):
+    """
+    释放 open_capture 打开的视频
+
+    内存流不能调用 cap.release(): OpenCV 在释放 GIL 的状态下销毁 Python 流对象，
+    会导致解释器中止；交给引用计数在对象回收时释放
+    """
+    if not isinstance(source, StreamingBuffer):
+        cap.release()
+
+
+def download_to_buffer(
+    url: str,
+    buffer: StreamingBuffer,
+    digest: Optional["hashlib._Hash"] = None,
+    timeout: float = 60.0
+):
+    """
+    分块下载 url 到 buffer（通常在后台线程中执行），可选同步更新内容哈希
+
+    无论成功与否都会调用 buffer.finish()，读取方不会永久阻塞
+    """
+    import httpx
+
+    error = None
+    try:
+        with httpx.stream("GET", url, timeout=timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+            length = response.headers.get("content-length")
+            if length and buffer.expected_size is None:
+                buffer.expected_size = int(length)
+            for chunk in response.iter_bytes(CHUNK_SIZE):
+                if digest is not None:
+                    digest.update(chunk)
+                buffer.write(chunk)
+    except Exception as e:
+        logger.error(f"视频流下载失败: {e}")
+        error = e
+    finally:
+        buffer.finish(error)
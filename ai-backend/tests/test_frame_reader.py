@@ -0,0 +1,197 @@
+"""
+FrameReader 视频帧读取测试
+使用 OpenCV 生成的合成视频，验证抽帧、预取线程与缓冲区复用
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from services.frame_reader import FrameReader
+
+
+def write_test_video(path, frames=40, size=(64, 48), fps=30):
+    """生成每帧亮度递增的测试视频"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(frames):
+        frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        frame[:, :, 2] = i * 5  # BGR 中的 R 通道
+        writer.write(frame)
+    writer.release()
+
+
+def read_all(path, **kwargs):
+    cap = cv2.VideoCapture(str(path))
+    reader = FrameReader(cap, **kwargs)
+    frames = []
+    for frame_index, frame_rgb in reader:
+        frames.append((frame_index, int(frame_rgb[0, 0, 0])))
+        reader.recycle(frame_rgb)
+    cap.release()
+    return frames, reader
+
+
+def test_sync_and_prefetch_read_the_same_frames(tmp_path):
+    path = tmp_path / "video.mp4"
+    write_test_video(path)
+
+    sync_frames, _ = read_all(path, stride=3)
+    prefetch_frames, reader = read_all(path, stride=3, queue_depth=2)
+
+    assert [i for i, _ in sync_frames] == list(range(0, 40, 3))
+    assert prefetch_frames == sync_frames
+    # RGB 转换后 R 通道在第 0 维
+    assert abs(sync_frames[1][1] - 15) <= 3
+    assert reader.timings["frames_read"] == len(sync_frames)
+
+
+def test_prefetch_stops_early(tmp_path):
+    path = tmp_path / "video.mp4"
+    write_test_video(path)
+
+    frames, _ = read_all(path, max_frames=5, queue_depth=4)
+    assert [i for i, _ in frames] == [0, 1, 2, 3, 4]
+
+    cap = cv2.VideoCapture(str(path))
+    reader = FrameReader(cap, queue_depth=2)
+    for frame_index, frame_rgb in reader:
+        if frame_index == 2:
+            break
+        reader.recycle(frame_rgb)
+    reader.close()
+    cap.release()
+
+
+def test_seek_then_read_with_stride(tmp_path):
+    path = tmp_path / "video.mp4"
+    write_test_video(path)
+
+    cap = cv2.VideoCapture(str(path))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 12)
+    frames = [(i, int(rgb[0, 0, 0])) for i, rgb in FrameReader(cap, stride=3, max_frames=3)]
+    cap.release()
+
+    assert [i for i, _ in frames] == [12, 15, 18]
+    assert abs(frames[0][1] - 60) <= 3
+
+
+
+def test_decode_from_streaming_buffer_while_writing(tmp_path):
+    import threading
+    import time
+    from services.video_stream import StreamingBuffer, open_capture
+
+    path = tmp_path / "video.mp4"
+    write_test_video(path)
+    data = path.read_bytes()
+    expected, _ = read_all(path, stride=3)
+
+    buffer = StreamingBuffer()
+
+    def feed():
+        for offset in range(0, len(data), 512):
+            buffer.write(data[offset:offset + 512])
+            time.sleep(0.002)
+        buffer.finish()
+
+    writer = threading.Thread(target=feed)
+    writer.start()
+    cap = open_capture(buffer)
+    reader = FrameReader(cap, stride=3, queue_depth=2)
+    frames = []
+    for frame_index, frame_rgb in reader:
+        frames.append((frame_index, int(frame_rgb[0, 0, 0])))
+        reader.recycle(frame_rgb)
+    writer.join()
+
+    assert frames == expected
+
+
+def test_max_size_downscales_into_reused_buffer(tmp_path):
+    path = tmp_path / "video.mp4"
+    write_test_video(path, size=(128, 96))
+
+    cap = cv2.VideoCapture(str(path))
+    reader = FrameReader(cap, max_size=64)
+    shapes = set()
+    for frame_index, frame_rgb in reader:
+        shapes.add(frame_rgb.shape)
+        if frame_index == 3:
+            assert abs(int(frame_rgb[10, 10, 0]) - 15) <= 3
+    cap.release()
+
+    assert shapes == {(48, 64, 3)}
+    assert reader._small.shape == (48, 64, 3)
+
+
+def test_person_roi_round_trip():
+    from services.mediapipe_service import person_roi, roi_to_frame
+
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 0] = np.linspace(0.4, 0.6, 33)
+    landmarks[:, 1] = np.linspace(0.2, 0.9, 33)
+    landmarks[:, 3] = 0.9
+
+    roi = person_roi(landmarks, 1000, 500, padding=0.25)
+    np.testing.assert_allclose(roi, (350, 12, 650, 500), atol=1)
+
+    # ROI 内的归一化坐标映射回整帧后应与原坐标一致
+    x0, y0, x1, y1 = roi
+    local = landmarks.copy()
+    local[:, 0] = (landmarks[:, 0] * 1000 - x0) / (x1 - x0)
+    local[:, 1] = (landmarks[:, 1] * 500 - y0) / (y1 - y0)
+    np.testing.assert_allclose(roi_to_frame(local, roi, 1000, 500), landmarks, atol=1e-5)
+
+    landmarks[:, 3] = 0.1
+    assert person_roi(landmarks, 1000, 500) is None
+
+
+def test_chunked_extraction_covers_every_sampled_frame(tmp_path):
+    from models.pose_sequence import PoseSequence
+    from services.analysis_pipeline import extract_chunk, split_chunks
+    from services.mediapipe_service import MediaPipeService
+    import services.mediapipe_service as mediapipe_service
+
+    path = tmp_path / "video.mp4"
+    write_test_video(path, frames=30)
+    service = MediaPipeService(target_fps=15)
+    mediapipe_service._mediapipe_service_instance = service
+    try:
+        whole = service.extract_pose_landmarks(str(path))["sequence"]
+        parts = [
+            extract_chunk(str(path), *chunk)
+            for chunk in split_chunks(30, stride=2, parts=3, warmup_frames=4)
+        ]
+    finally:
+        mediapipe_service._mediapipe_service_instance = None
+        service.pose_pool.close()
+
+    stitched = PoseSequence.concatenate(parts)
+    np.testing.assert_array_equal(stitched.frame_indices, whole.frame_indices)
+
+
+def test_closing_landmark_stream_early_returns_pose_to_pool(tmp_path):
+    from services.mediapipe_service import MediaPipeService
+
+    path = tmp_path / "video.mp4"
+    write_test_video(path, frames=30)
+    service = MediaPipeService(target_fps=15)
+    try:
+        frames = service.iter_pose_landmarks(str(path))
+        next(frames)
+        assert service.pose_pool.stats()["idle"] == 0
+        # 提前停止（CycleStopCondition / 分段 end_frame）时关闭生成器
+        frames.close()
+        assert service.pose_pool.stats()["idle"] == 1
+
+        # 归还的实例仍可用，下一个视频直接复用
+        result = service.extract_pose_landmarks(str(path), end_frame=6)
+        assert result["total_frames"] == 30
+        assert service.pose_pool.stats() == {"idle": 1, "created": 1, "reused": 1}
+    finally:
+        service.pose_pool.close()
@@ -0,0 +1,148 @@
+"""
+JobScheduler 任务调度器测试
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import socket
+
+import pytest
+
+from services.job_scheduler import JobScheduler, SchedulerSaturated
+from services.task_queue import TaskQueue
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_concurrency_limit_and_backpressure(tmp_path):
+    async def scenario():
+        queue = TaskQueue(str(tmp_path / "queue.sqlite3"))
+        scheduler = JobScheduler(queue, max_concurrency=2, max_queue=1, poll_interval=0.05)
+        release = asyncio.Event()
+        active = []
+        peak = []
+
+        async def job(n: int):
+            active.append(n)
+            peak.append(len(active))
+            await release.wait()
+            active.remove(n)
+
+        scheduler.register("job", job)
+        await scheduler.start()
+        for n in range(3):
+            await scheduler.submit("job", {"n": n})
+        await wait_until(lambda: scheduler.running == 2)
+        assert await scheduler.queued() == 1
+
+        # 2 个运行 + 1 个等待 → 已满
+        with pytest.raises(SchedulerSaturated) as error:
+            await scheduler.submit("job", {"n": 3})
+        assert error.value.retry_after >= 1
+        assert scheduler.stats()["rejected"] == 1
+
+        release.set()
+        await wait_until(lambda: scheduler.completed == 3)
+        assert max(peak) == 2
+        assert scheduler.stats()["queue_depth"] == 0
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_is_retried_then_reported(tmp_path):
+    async def scenario():
+        queue = TaskQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2, backoff_base=0)
+        scheduler = JobScheduler(queue, max_concurrency=1, poll_interval=0.05)
+        failures = []
+
+        async def broken(task_id: str):
+            raise RuntimeError("boom")
+
+        async def on_failure(payload, error, final):
+            failures.append((payload["task_id"], error, final))
+
+        scheduler.register("broken", broken, on_failure)
+        await scheduler.start()
+        await scheduler.submit("broken", {"task_id": "a"})
+        await wait_until(lambda: len(failures) == 2)
+        await scheduler.shutdown()
+        return failures, scheduler.stats()
+
+    failures, stats = asyncio.run(scenario())
+    assert failures == [("a", "boom", False), ("a", "boom", True)]
+    assert stats["retried"] == 1 and stats["failed"] == 1
+    assert stats["queue"]["dead"] == 1
+
+
+def test_restart_resumes_interrupted_job_once(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    runs = []
+
+    async def first_process():
+        scheduler = JobScheduler(TaskQueue(path, backoff_base=0), poll_interval=0.05)
+        started = asyncio.Event()
+
+        async def job(task_id: str):
+            runs.append(task_id)
+            started.set()
+            await asyncio.sleep(60)
+
+        scheduler.register("job", job)
+        await scheduler.start()
+        await scheduler.submit("job", {"task_id": "a"})
+        await asyncio.wait_for(started.wait(), timeout=2)
+        # 进程被停止: 运行中的任务被中断
+        await scheduler.shutdown()
+
+    async def second_process():
+        scheduler = JobScheduler(TaskQueue(path, backoff_base=0), poll_interval=0.05)
+
+        async def job(task_id: str):
+            runs.append(task_id)
+
+        scheduler.register("job", job)
+        await scheduler.start()
+        await wait_until(lambda: scheduler.completed == 1)
+        await asyncio.sleep(0.1)
+        await scheduler.shutdown()
+        return scheduler.stats()
+
+    asyncio.run(first_process())
+    stats = asyncio.run(second_process())
+    assert runs == ["a", "a"]
+    assert stats["queue"]["done"] == 1 and stats["queue"]["pending"] == 0
+
+
+def test_start_recovers_jobs_of_crashed_process(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = TaskQueue(path, backoff_base=0)
+    queue.enqueue("job", {"task_id": "a"})
+    # 上一个进程领取后直接崩溃（未调用 shutdown，租约仍未到期）
+    crashed_owner = f"{socket.gethostname()}:{2 ** 22 + 1}"
+    assert queue.claim(crashed_owner) is not None
+    runs = []
+
+    async def scenario():
+        scheduler = JobScheduler(TaskQueue(path, backoff_base=0), poll_interval=0.05)
+
+        async def job(task_id: str):
+            runs.append(task_id)
+
+        scheduler.register("job", job)
+        await scheduler.start()
+        await wait_until(lambda: scheduler.completed == 1)
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+    assert runs == ["a"]
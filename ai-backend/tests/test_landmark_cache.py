@@ -0,0 +1,87 @@
+"""
+LandmarkCache 关键点缓存测试
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.landmark_cache import LandmarkCache, hash_file, storage_content_id
+from test_pose_sequence import make_squat_sequence
+
+PARAMS = {"model_complexity": 1, "min_detection_confidence": 0.5,
+          "min_tracking_confidence": 0.5, "target_fps": 15.0}
+
+
+def test_round_trip_and_metrics(tmp_path):
+    cache = LandmarkCache(str(tmp_path))
+    sequence = make_squat_sequence(reps=2, stride=2, missing={4})
+    key = cache.make_key("abc", PARAMS)
+
+    assert cache.get(key) is None
+    cache.put(key, sequence)
+    cached = cache.get(key)
+
+    assert cached is not None
+    np.testing.assert_array_equal(cached.landmarks, sequence.landmarks)
+    assert cached.valid.tolist() == sequence.valid.tolist()
+    assert cached.stride == 2 and cached.fps == sequence.fps
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # 提取参数不同 → 不同的键
+    assert cache.make_key("abc", {**PARAMS, "model_complexity": 2}) != key
+
+
+def test_lru_eviction_under_byte_budget(tmp_path):
+    sequence = make_squat_sequence(reps=1)
+    probe = LandmarkCache(str(tmp_path / "probe"))
+    probe.put("probe", sequence)
+    entry_size = probe.stats()["bytes"]
+
+    cache = LandmarkCache(str(tmp_path / "cache"), max_bytes=entry_size * 2)
+    cache.put("a", sequence)
+    cache.put("b", sequence)
+    cache.get("a")  # a 成为最近使用
+    cache.put("c", sequence)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+    # 重启后从磁盘重建索引
+    reopened = LandmarkCache(str(tmp_path / "cache"), max_bytes=entry_size * 2)
+    assert reopened.stats()["entries"] == 2
+
+
+def test_alias_and_hash(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"not really a video")
+    cache = LandmarkCache(str(tmp_path / "cache"))
+
+    assert cache.resolve_alias("user/video.mp4") is None
+    cache.record_alias("user/video.mp4", hash_file(str(video)))
+    assert cache.resolve_alias("user/video.mp4") == hash_file(str(video))
+
+
+def test_storage_content_id_uses_strong_etag(monkeypatch):
+    import httpx
+
+    headers = {}
+
+    def head(url, **kwargs):
+        return httpx.Response(200, headers=headers, request=httpx.Request("HEAD", url))
+
+    monkeypatch.setattr(httpx, "head", head)
+
+    headers.update({"ETag": '"9b2cf535f27731c974343645a3985328"', "Content-Length": "1024"})
+    assert storage_content_id("https://storage/v.mp4") == "etag:9b2cf535f27731c974343645a3985328:1024"
+
+    # 弱 ETag 不保证内容一致，没有 ETag 时退回下载计算内容哈希
+    headers["ETag"] = 'W/"abc"'
+    assert storage_content_id("https://storage/v.mp4") is None
+    del headers["ETag"]
+    assert storage_content_id("https://storage/v.mp4") is None
@@ -48,14 +48,14 @@ def test_mediapipe_service():
     )
     
     if result["success"]:
-        print(f"成功提取 {len(result['frames'])} 帧")
+        sequence = result["sequence"]  # PoseSequence
+        print(f"成功提取 {len(sequence)} 帧")
         print(f"视频信息: {result['video_width']}x{result['video_height']}")
         
-        # 查看第一帧的关键点
-        first_frame = result["frames"][0]
-        if first_frame["landmarks"]:
-            print(f"第一帧有 {len(first_frame['landmarks'])} 个关键点")
-            print(f"鼻子坐标: {first_frame['landmarks'][0]}")
+        # 查看第一帧的关键点 (33, 4) = (x, y, z, visibility)
+        if sequence.valid[0]:
+            print(f"第一帧有 {sequence.landmarks.shape[1]} 个关键点")
+            print(f"鼻子坐标: {sequence.landmarks[0, 0]}")
     else:
         print(f"失败: {result.get('error')}")
     """)
@@ -0,0 +1,629 @@
+"""
+PoseSequence 列式关键点序列测试
+使用合成的深蹲关键点数据，无需视频文件
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from models.pose_sequence import PoseSequence, PoseSequenceBuilder, NUM_LANDMARKS
+from services.squat_segmentation import SquatSegmentationService
+from services.squat_analyzer import SquatAnalyzer
+
+
+def make_squat_sequence(reps=3, frames_per_rep=30, fps=30.0, missing=(), stride=1):
+    """
+    生成合成深蹲序列: 髋部纵坐标按余弦曲线上下起伏
+
+    Args:
+        reps: 深蹲次数
+        frames_per_rep: 每次深蹲的帧数
+        fps: 帧率
+        missing: 未检测到人体的帧号
+        stride: 采样步长（模拟 target_fps 抽帧）
+    """
+    total = reps * frames_per_rep
+    builder = PoseSequenceBuilder(capacity=8)
+    for i in range(0, total, stride):
+        timestamp = i / fps
+        if i in missing:
+            builder.append(i, timestamp, None)
+            continue
+        phase = (1 - np.cos(2 * np.pi * i / frames_per_rep)) / 2  # 0=站立, 1=最低点
+        points = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        points[:, 3] = 0.9
+        hip_y = 0.5 + 0.2 * phase
+        points[11, :2] = (0.50, hip_y - 0.3 + 0.1 * phase)  # 左肩
+        points[12, :2] = (0.55, hip_y - 0.3 + 0.1 * phase)  # 右肩
+        points[23, :2] = (0.50 - 0.1 * phase, hip_y)        # 左髋
+        points[24, :2] = (0.55 - 0.1 * phase, hip_y)        # 右髋
+        points[25, :2] = (0.52, 0.75)                       # 左膝
+        points[26, :2] = (0.57, 0.75)                       # 右膝
+        points[27, :2] = (0.50, 0.95)                       # 左踝
+        points[28, :2] = (0.55, 0.95)                       # 右踝
+        builder.append(i, timestamp, points)
+    return builder.build(
+        fps=fps, width=640, height=480, total_frames=total, stride=stride
+    )
+
+
+def test_builder_grows_and_masks_missing_frames():
+    sequence = make_squat_sequence(reps=1, missing={3})
+
+    assert len(sequence) == 30
+    assert sequence.landmarks.shape == (30, NUM_LANDMARKS, 4)
+    assert sequence.landmarks.dtype == np.float32
+    assert sequence.valid_count == 29
+    assert not sequence.valid[3]
+    assert np.isnan(sequence.landmarks[3]).all()
+    assert sequence.detection_confidence[3] == 0.0
+    assert abs(sequence.detection_confidence[0] - 0.9) < 1e-6
+
+
+def test_slice_frames_by_frame_index():
+    sequence = make_squat_sequence(reps=2)
+
+    part = sequence.slice_frames(10, 19)
+
+    assert part.frame_indices.tolist() == list(range(10, 20))
+    assert np.shares_memory(part.landmarks, sequence.landmarks)
+    assert sequence.position_of_frame(15) == 15
+    assert sequence.position_of_frame(999) == -1
+
+
+def test_frames_round_trip():
+    sequence = make_squat_sequence(reps=1, missing={0})
+
+    frames = sequence.to_frames()
+    assert frames[0]["landmarks"] is None
+    assert set(frames[1]["landmarks"][23]) == {"x", "y", "z", "visibility"}
+
+    restored = PoseSequence.from_frames(frames, fps=sequence.fps)
+    assert restored.valid.tolist() == sequence.valid.tolist()
+    np.testing.assert_allclose(
+        restored.landmarks[1:], sequence.landmarks[1:], atol=1e-6
+    )
+
+
+def test_segmentation_and_analysis_on_sequence():
+    sequence = make_squat_sequence(reps=3)
+
+    cycles = SquatSegmentationService().segment_squat_cycles(sequence)
+    assert len(cycles) >= 1
+    for cycle in cycles:
+        assert cycle["start_frame"] <= cycle["bottom_frame"] <= cycle["end_frame"]
+
+    result = SquatAnalyzer().analyze_squat_comparison(sequence, sequence)
+    for dimension in ("depth", "knee_tracking", "torso_lean", "balance"):
+        assert result[dimension]["status"] == "pass"
+        assert isinstance(result[dimension]["user_value"], float)
+
+
+def test_segmentation_accepts_strided_sequence():
+    sequence = make_squat_sequence(reps=4, fps=60.0, frames_per_rep=60, stride=4)
+    assert sequence.sample_fps == 15.0
+    assert sequence.timestamps[1] == 4 / 60.0
+
+    cycles = SquatSegmentationService().segment_squat_cycles(sequence)
+    assert len(cycles) >= 1
+    for cycle in cycles:
+        assert cycle["start_frame"] % 4 == 0
+        assert cycle["start_frame"] <= cycle["bottom_frame"] <= cycle["end_frame"]
+
+
+def test_resolve_stride():
+    from services.mediapipe_service import MediaPipeService
+
+    service = MediaPipeService(target_fps=15)
+    assert service.resolve_stride(60.0) == 4
+    assert service.resolve_stride(30.0) == 2
+    assert service.resolve_stride(10.0) == 1
+    assert service.resolve_stride(60.0, stride=3) == 3
+    assert service.resolve_stride(0.0) == 1
+
+
+def test_extraction_params_track_escalation_settings():
+    from services.mediapipe_service import MediaPipeService
+
+    cascade = MediaPipeService(model_complexity=0, escalation_complexity=1, escalation_padding=2)
+    wider = MediaPipeService(model_complexity=0, escalation_complexity=1, escalation_padding=4)
+    assert cascade.extraction_params()["escalation_padding"] == 2
+    assert cascade.extraction_params() != wider.extraction_params()
+
+    # 不启用级联时级联参数不影响结果，也不影响缓存键
+    plain = MediaPipeService(model_complexity=0, escalation_padding=4)
+    assert plain.extraction_params() == MediaPipeService(model_complexity=0).extraction_params()
+    for service in (cascade, wider, plain):
+        service.pose_pool.close()
+
+
+def test_frame_features_match_single_frame_angles():
+    from services.pose_features import compute_frame_features
+
+    sequence = make_squat_sequence(reps=1, missing={2})
+    features = compute_frame_features(sequence)
+    analyzer = SquatAnalyzer()
+
+    assert np.isnan(features["knee_angle"][2])
+    for i in (0, 7, 15):
+        lm = sequence.landmarks[i]
+        expected = analyzer.calculate_angle(lm[23], lm[25], lm[27])
+        assert abs(features["knee_angle"][i] - expected) < 1e-4
+
+
+def test_reference_artifact_round_trip():
+    from models.reference_artifact import ReferenceArtifact
+    from services.pose_features import compute_frame_features
+
+    sequence = make_squat_sequence(reps=2)
+    cycles = SquatSegmentationService().segment_squat_cycles(sequence)
+    params = {"model_complexity": 1, "target_fps": None}
+    artifact = ReferenceArtifact(
+        sequence, cycles, compute_frame_features(sequence), params
+    )
+
+    restored = ReferenceArtifact.from_bytes(artifact.to_bytes())
+
+    assert restored.cycles == cycles
+    assert restored.is_compatible(params)
+    assert not restored.is_compatible({**params, "model_complexity": 2})
+    np.testing.assert_array_equal(restored.sequence.landmarks, sequence.landmarks)
+    np.testing.assert_allclose(
+        restored.features["hip_angle"], artifact.features["hip_angle"]
+    )
+
+
+def test_low_confidence_windows_are_padded_and_merged():
+    from services.mediapipe_service import low_confidence_windows
+
+    sequence = make_squat_sequence(reps=1, missing={3, 20})
+    sequence.landmarks[6, 25, 3] = 0.2  # 左膝可见度低
+    sequence.landmarks[27, 27, 3] = 0.2  # 左踝可见度低
+
+    assert low_confidence_windows(sequence, threshold=0.5) == [
+        (3, 3), (6, 6), (20, 20), (27, 27)
+    ]
+    assert low_confidence_windows(sequence, threshold=0.5, padding=2) == [
+        (1, 8), (18, 22), (25, 29)
+    ]
+    assert low_confidence_windows(make_squat_sequence(reps=1), threshold=0.5) == []
+
+
+def push_sequence(segmenter, sequence):
+    """逐帧喂入增量切分器，返回每个周期确定时的帧号"""
+    emitted_at = []
+    for i in range(len(sequence)):
+        landmarks = sequence.landmarks[i] if sequence.valid[i] else None
+        for _ in segmenter.push(int(sequence.frame_indices[i]), landmarks):
+            emitted_at.append(int(sequence.frame_indices[i]))
+    return emitted_at
+
+
+def test_incremental_segmenter_emits_cycles_as_they_settle():
+    sequence = make_squat_sequence(reps=4, missing={40})
+    service = SquatSegmentationService()
+    segmenter = service.incremental(stride=sequence.stride, sample_fps=sequence.sample_fps)
+
+    emitted_at = push_sequence(segmenter, sequence)
+
+    # 周期在下一个最低点之后约 min_peak_distance 帧确定即产出，不需要等待整段视频
+    # （最后一个最低点之后的帧数不足，后两个周期由 finish 产出）
+    assert len(emitted_at) == 2
+    for n, frame in enumerate(emitted_at):
+        next_bottom = (n + 1) * 30 + 15
+        assert next_bottom + 15 <= frame <= next_bottom + 20
+    segmenter.finish()
+    assert segmenter.cycles == service.segment_squat_cycles(sequence)
+    for n, cycle in enumerate(segmenter.cycles):
+        assert abs(cycle["bottom_frame"] - (n * 30 + 15)) <= 1
+        assert cycle["start_frame"] < cycle["bottom_frame"] < cycle["end_frame"]
+
+
+@pytest.mark.parametrize("fps, frames_per_rep, stride", [(30.0, 30, 1), (60.0, 60, 3), (24.0, 40, 2)])
+def test_incremental_segmenter_matches_batch_segmentation(fps, frames_per_rep, stride):
+    sequence = make_squat_sequence(reps=5, fps=fps, frames_per_rep=frames_per_rep, stride=stride)
+    # 加入噪声，站立段的最低点不再唯一
+    rng = np.random.default_rng(stride)
+    sequence.landmarks[:, 23:25, 1] += rng.normal(scale=0.01, size=(len(sequence), 1))
+    service = SquatSegmentationService()
+    batch = service.segment_squat_cycles(sequence)
+
+    segmenter = service.incremental(stride=stride, sample_fps=sequence.sample_fps)
+    push_sequence(segmenter, sequence)
+    streamed = list(segmenter.cycles)
+    segmenter.finish()
+
+    assert len(batch) == 5
+    assert streamed == batch[:len(streamed)] and len(streamed) >= 3
+    assert segmenter.cycles == batch
+
+
+def test_incremental_segmenter_keeps_a_bounded_window_on_long_streams():
+    sequence = make_squat_sequence(reps=60, frames_per_rep=30)
+    # 每次深蹲幅度不同（有时比上一次更深），并加入噪声
+    rng = np.random.default_rng(7)
+    depth = np.repeat(rng.uniform(0.6, 1.2, size=60), 30)[:, None]
+    hip_y = sequence.landmarks[:, 23:25, 1]
+    sequence.landmarks[:, 23:25, 1] = 0.5 + (hip_y - 0.5) * depth + rng.normal(
+        scale=0.01, size=(len(sequence), 1)
+    )
+    service = SquatSegmentationService()
+    batch = service.segment_squat_cycles(sequence)
+
+    segmenter = service.incremental(stride=1, sample_fps=sequence.sample_fps)
+    window = 0
+    for i in range(len(sequence)):
+        segmenter.push(int(sequence.frame_indices[i]), sequence.landmarks[i])
+        window = max(window, len(segmenter._values))
+    segmenter.finish()
+
+    assert len(batch) == 60
+    assert segmenter.cycles == batch
+    # 窗口只覆盖最后一个已确定周期和尚未确定的部分，与视频长度无关
+    assert window <= 4 * 30
+
+
+def test_cycle_stop_condition_matches_truncated_sequence():
+    from services.squat_segmentation import CycleStopCondition
+
+    sequence = make_squat_sequence(reps=6)
+    sequence.landmarks[:, 23:25, 1] += np.random.default_rng(0).normal(
+        scale=0.01, size=(len(sequence), 1)
+    )
+    condition = CycleStopCondition(cycles=2, margin_seconds=0.5)
+    info = {"stride": 1, "video_fps": 30.0}
+
+    stopped_at = None
+    for i in range(len(sequence)):
+        if condition(int(sequence.frame_indices[i]), sequence.landmarks[i], info):
+            stopped_at = i
+            break
+
+    cycles = condition.segmenter.prefix_cycles
+    assert len(cycles) >= 2
+    assert cycles[1]["end_frame"] + 15 <= stopped_at < 90
+    # 截断后的序列批量切分得到相同的周期
+    truncated = sequence.slice_frames(0, stopped_at)
+    assert SquatSegmentationService().segment_squat_cycles(truncated) == cycles
+
+
+def make_deadlift_sequence(reps=5, frames_per_rep=40, fps=30.0):
+    """生成合成硬拉序列: 髋部几乎不动，躯干绕髋部前倾 0-80°（髋角 180° → 100°）"""
+    builder = PoseSequenceBuilder(capacity=8)
+    for i in range(reps * frames_per_rep):
+        phase = (1 - np.cos(2 * np.pi * i / frames_per_rep)) / 2
+        lean = np.radians(80 * phase)
+        points = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        points[:, 3] = 0.9
+        for side, x in ((0, 0.50), (1, 0.55)):
+            hip = np.array([x, 0.55 + 0.01 * phase])
+            points[23 + side, :2] = hip
+            points[11 + side, :2] = hip + 0.3 * np.array([np.sin(lean), -np.cos(lean)])
+            points[25 + side, :2] = (x, 0.75)
+            points[27 + side, :2] = (x, 0.95)
+        builder.append(i, i / fps, points)
+    return builder.build(
+        fps=fps, width=640, height=480, total_frames=reps * frames_per_rep, stride=1
+    )
+
+
+def test_cycle_stop_condition_uses_exercise_signal():
+    from services.exercise_registry import DEADLIFT
+    from services.squat_segmentation import CycleStopCondition
+
+    sequence = make_deadlift_sequence()
+    service = SquatSegmentationService()
+    info = {"stride": 1, "video_fps": 30.0}
+
+    # 按深蹲的髋部纵坐标永远凑不够周期，整段视频都会被提取
+    squat_condition = CycleStopCondition(cycles=2, margin_seconds=0.5)
+    assert not any(
+        squat_condition(int(sequence.frame_indices[i]), sequence.landmarks[i], info)
+        for i in range(len(sequence))
+    )
+
+    condition = CycleStopCondition(cycles=2, margin_seconds=0.5, exercise=DEADLIFT)
+    stopped_at = next(
+        i for i in range(len(sequence))
+        if condition(int(sequence.frame_indices[i]), sequence.landmarks[i], info)
+    )
+
+    cycles = condition.segmenter.prefix_cycles
+    assert [cycle["bottom_frame"] for cycle in cycles[:2]] == [20, 60]
+    assert stopped_at < 120
+    truncated = sequence.slice_frames(0, stopped_at)
+    assert service.segment_exercise_cycles(truncated, DEADLIFT) == cycles
+
+
+def test_split_chunks_aligns_to_stride_and_overlaps():
+    from services.analysis_pipeline import split_chunks
+
+    chunks = split_chunks(total_frames=100, stride=3, parts=3, warmup_frames=5)
+
+    assert chunks == [(0, 33, 0), (33, 66, 27), (66, None, 60)]
+    assert all(start % 3 == 0 and warmup % 3 == 0 for start, _, warmup in chunks)
+    assert split_chunks(total_frames=4, stride=1, parts=8, warmup_frames=0) == [
+        (0, 1, 0), (1, 2, 1), (2, 3, 2), (3, None, 3)
+    ]
+
+
+def test_concatenate_chunks_matches_whole_sequence():
+    sequence = make_squat_sequence(reps=2, stride=2, missing={10})
+    parts = [
+        sequence.slice_frames(0, 19),
+        sequence.slice_frames(20, 39),
+        sequence.slice_frames(40, 59)
+    ]
+
+    stitched = PoseSequence.concatenate(parts)
+
+    np.testing.assert_array_equal(stitched.frame_indices, sequence.frame_indices)
+    np.testing.assert_array_equal(stitched.valid, sequence.valid)
+    np.testing.assert_array_equal(stitched.landmarks, sequence.landmarks)
+    assert stitched.stride == 2
+
+
+def test_find_peaks_filters_by_prominence_distance_and_width():
+    from services.squat_segmentation import find_peaks
+
+    values = np.array([0, 1, 0, 5, 4, 4.5, 4, 0, 3, 3, 3, 0], dtype=np.float64)
+
+    peaks, left, right = find_peaks(values)
+    assert peaks.tolist() == [1, 3, 5, 9]  # 平台取中点
+
+    peaks, left, right = find_peaks(values, min_prominence=2.0)
+    assert peaks.tolist() == [3, 9]
+    assert left.tolist() == [0, 7] and right.tolist() == [7, 11]
+
+    peaks, _, _ = find_peaks(values, min_prominence=2.0, min_distance=7)
+    assert peaks.tolist() == [3]  # 保留较高的峰
+
+    peaks, _, _ = find_peaks(values, min_prominence=2.0, min_width=6)
+    assert peaks.tolist() == [3]
+
+
+def test_segmentation_ignores_jitter_and_keeps_cycles_disjoint():
+    sequence = make_squat_sequence(reps=4)
+    rng = np.random.default_rng(0)
+    sequence.landmarks[:, 23:25, 1] += rng.normal(0, 0.01, (len(sequence), 1))
+
+    cycles = SquatSegmentationService().segment_squat_cycles(sequence)
+
+    assert len(cycles) == 4
+    for n, cycle in enumerate(cycles):
+        assert abs(cycle["bottom_frame"] - (n * 30 + 15)) <= 3
+        assert cycle["start_frame"] < cycle["bottom_frame"] < cycle["end_frame"]
+    for prev, cycle in zip(cycles, cycles[1:]):
+        assert prev["end_frame"] <= cycle["start_frame"]
+
+
+def test_pad_slices_masks_padding():
+    sequence = make_squat_sequence(reps=2, missing={5})
+
+    landmarks, valid = sequence.pad_slices([(0, 9), (20, 24)])
+
+    assert landmarks.shape == (2, 10, NUM_LANDMARKS, 4)
+    assert valid[0].tolist() == [True] * 5 + [False] + [True] * 4
+    assert valid[1].tolist() == [True] * 5 + [False] * 5
+    np.testing.assert_array_equal(landmarks[1, :5], sequence.landmarks[20:25])
+
+
+def test_analyze_reps_matches_single_rep_analysis_and_flags_fatigue():
+    reference = make_squat_sequence(reps=1)
+    user = make_squat_sequence(reps=4)
+    # 每次深蹲越来越浅: 最低点附近的髋部逐次抬高
+    for rep in range(4):
+        frames = slice(rep * 30 + 10, rep * 30 + 21)
+        user.landmarks[frames, 23:25, 1] -= 0.04 * rep
+    cycles = SquatSegmentationService().segment_squat_cycles(user)
+    analyzer = SquatAnalyzer()
+
+    result = analyzer.analyze_reps(reference, user, cycles)
+
+    assert result["summary"]["rep_count"] == len(cycles) == 4
+    for cycle, rep in zip(cycles, result["reps"]):
+        single = analyzer.analyze_squat_comparison(
+            reference, user.slice_frames(cycle["start_frame"], cycle["end_frame"])
+        )
+        for dimension in ("depth", "knee_tracking", "torso_lean", "balance"):
+            assert rep[dimension] == single[dimension]
+    assert result["depth"] == result["reps"][0]["depth"]
+    assert result["summary"]["best_rep"] == 1
+    assert result["summary"]["worst_rep"] == 4
+    assert result["summary"]["fatigue_trend"]["status"] == "declining"
+    assert result["summary"]["fatigue_trend"]["depth_slope"] > 0
+
+
+def test_comparison_reads_bottom_frame_from_feature_table():
+    sequence = make_squat_sequence(reps=1, missing={15})
+    analyzer = SquatAnalyzer()
+
+    features = analyzer.bottom_features(sequence)
+    # 第 15 帧缺失，最低点落在相邻的有效帧
+    bottom = sequence.landmarks[14]
+    assert features["hip_y"] == float(bottom[23:25, 1].mean())
+
+    result = analyzer.analyze_squat_comparison(sequence, sequence)
+    expected = analyzer.calculate_angle(bottom[23], bottom[25], bottom[27])
+    assert result["depth"]["user_value"] == round(expected, 1)
+    assert result["balance"]["reference_value"] == 0.0
+    assert result["depth"] == analyzer.analyze_squat_depth(sequence, sequence)
+
+
+def test_banded_dtw_matches_unconstrained_dtw_with_wide_band():
+    from services.trajectory_alignment import banded_dtw
+
+    rng = np.random.default_rng(0)
+    reference, user = rng.normal(size=(20, 2)), rng.normal(size=(33, 2))
+
+    # 完整 DTW 作为对照
+    cost = np.full((21, 34), np.inf)
+    cost[0, 0] = 0
+    for i in range(1, 21):
+        for j in range(1, 34):
+            local = np.linalg.norm(reference[i - 1] - user[j - 1])
+            cost[i, j] = local + min(cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1])
+
+    path_ref, path_user, mean_cost = banded_dtw(reference, user, band=100)
+
+    assert np.isclose(mean_cost * len(path_ref), cost[20, 33])
+    assert (path_ref[0], path_user[0]) == (0, 0)
+    assert (path_ref[-1], path_user[-1]) == (19, 32)
+    assert np.all(np.diff(path_ref) >= 0) and np.all(np.diff(path_user) >= 0)
+
+
+def test_banded_dtw_matches_brute_force_with_narrow_band():
+    from services.trajectory_alignment import band_limits, banded_dtw
+
+    rng = np.random.default_rng(1)
+    # n ≠ m 且带宽很窄: 带的下沿在相邻行之间会右移不止一列
+    for n, m, band in ((30, 60, 6), (17, 41, 2), (45, 20, 3)):
+        reference, user = rng.normal(size=(n, 2)), rng.normal(size=(m, 2))
+
+        # 限制在同一带内的 O(nm) DTW 作为对照
+        lo, hi = band_limits(n, m, band)
+        cost = np.full((n + 1, m + 1), np.inf)
+        cost[0, 0] = 0
+        for i in range(1, n + 1):
+            for j in range(lo[i - 1] + 1, hi[i - 1] + 2):
+                local = np.linalg.norm(reference[i - 1] - user[j - 1])
+                cost[i, j] = local + min(cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1])
+
+        path_ref, path_user, mean_cost = banded_dtw(reference, user, band)
+        path_cost = np.linalg.norm(reference[path_ref] - user[path_user], axis=1).sum()
+
+        assert np.isclose(mean_cost * len(path_ref), cost[n, m])
+        assert np.isclose(path_cost, cost[n, m])
+        assert np.all(path_user >= lo[path_ref]) and np.all(path_user <= hi[path_ref])
+        steps = np.diff(np.stack([path_ref, path_user]), axis=1)
+        assert np.all((steps >= 0) & (steps <= 1)) and np.all(steps.sum(axis=0) >= 1)
+
+
+def test_dtw_band_is_capped_for_long_unequal_takes():
+    from services.trajectory_alignment import band_limits, banded_dtw
+
+    analyzer = SquatAnalyzer()
+    assert analyzer.dtw_band(60, 90) == 9
+    band = analyzer.dtw_band(3000, 2000)
+    assert band == analyzer.DTW_MAX_BAND
+
+    # 用户以不均匀的节奏重复参考轨迹（整体慢 1.5 倍）
+    n = 2000
+    reference = np.stack([np.sin(np.linspace(0, 40, n)), np.cos(np.linspace(0, 17, n))], axis=1)
+    t = np.linspace(0, 1, 3000)
+    warp = t * (n - 1) + 12 * np.sin(3 * np.pi * t)
+    user = np.stack([np.interp(warp, np.arange(n), reference[:, k]) for k in range(2)], axis=1)
+
+    lo, hi = band_limits(n, len(user), band)
+    assert (hi - lo).max() + 1 <= 2 * band + 2
+    path_ref, path_user, mean_cost = banded_dtw(reference, user, band)
+
+    assert (path_ref[0], path_user[0]) == (0, 0)
+    assert (path_ref[-1], path_user[-1]) == (n - 1, len(user) - 1)
+    steps = np.diff(np.stack([path_ref, path_user]), axis=1)
+    assert np.all((steps >= 0) & (steps <= 1)) and np.all(steps.sum(axis=0) >= 1)
+    assert mean_cost < 0.01
+
+
+def test_trajectory_comparison_aligns_slower_user():
+    reference = make_squat_sequence(reps=1, frames_per_rep=30)
+    user = make_squat_sequence(reps=1, frames_per_rep=45)
+
+    result = SquatAnalyzer().analyze_trajectory(reference, user)
+
+    assert abs(result["tempo_ratio"] - 1.5) < 0.05
+    assert [p["phase"] for p in result["phases"]] == ["descent", "bottom", "ascent"]
+    for phase in result["phases"]:
+        # 同一动作只是节奏不同，对齐后各维度都应通过
+        assert set(phase["statuses"].values()) == {"pass"}
+        assert phase["pass_rate"]["depth"] == 1.0
+        assert phase["tempo_ratio"] > 1.2
+
+
+def test_analyze_batch_scores_each_submission_independently():
+    from services.analysis_pipeline import analyze_batch, analyze_sequences
+
+    reference = make_squat_sequence(reps=2)
+    users = [
+        make_squat_sequence(reps=3),
+        make_squat_sequence(reps=1, frames_per_rep=6),  # 太短，无法切分
+        make_squat_sequence(reps=2, frames_per_rep=45)
+    ]
+
+    results = analyze_batch(reference, users)
+
+    assert len(results) == 3
+    assert results[1] == {"error": "动作切分失败"}
+    for user, result in zip(users[::2], results[::2]):
+        assert result == analyze_sequences(reference, user)
+    assert results[0]["comparison_result"]["summary"]["rep_count"] == 3
+    assert results[2]["comparison_result"]["summary"]["rep_count"] == 2
+
+
+def test_analysis_reuses_reference_artifact_features(monkeypatch):
+    from models.reference_artifact import ReferenceArtifact
+    from services import exercise_analyzer
+    from services.analysis_pipeline import analyze_sequences, prepare_reference_artifact
+
+    reference = make_squat_sequence(reps=2, missing={5, 12})
+    user = make_squat_sequence(reps=3, frames_per_rep=36)
+    artifact = ReferenceArtifact.from_bytes(
+        prepare_reference_artifact(reference, {"exercise_type_id": 1})
+    )
+    expected = analyze_sequences(reference, user)
+
+    computed = []
+    original = exercise_analyzer.compute_frame_features
+    monkeypatch.setattr(
+        exercise_analyzer, "compute_frame_features",
+        lambda sequence, specs=None: computed.append(len(sequence)) or original(sequence, specs)
+    )
+    result = analyze_sequences(reference, user, artifact.cycles, 1, artifact.features)
+
+    assert result == expected
+    # 参考侧的最低点特征和轨迹特征都来自产物，只有用户周期的轨迹特征现场计算
+    assert len(computed) == 1
+
+
+def test_feature_engine_computes_shared_specs_once():
+    from services.pose_features import FeatureSpec, evaluate_features, landmark_features
+
+    sequence = make_squat_sequence(reps=1)
+    specs = {
+        "knee": FeatureSpec("angle", (23, 25, 27)),
+        "knee_again": FeatureSpec("angle", (23, 25, 27)),
+        "hip_y": FeatureSpec("height", (23, 24))
+    }
+
+    features = evaluate_features(sequence.landmarks, specs)
+
+    assert features["knee"] is features["knee_again"]
+    np.testing.assert_array_equal(
+        features["knee"], landmark_features(sequence.landmarks)["knee_angle"]
+    )
+
+
+def test_registry_drives_segmentation_and_analysis_for_other_exercises():
+    from services.analysis_pipeline import analyze_sequences
+    from services.exercise_registry import DEADLIFT, get_exercise
+
+    assert get_exercise(1).name == "squat"
+    with pytest.raises(ValueError):
+        get_exercise(999)
+
+    # 硬拉按髋角极小值切分
+    sequence = make_squat_sequence(reps=3)
+    cycles = SquatSegmentationService().segment_exercise_cycles(sequence, DEADLIFT)
+    assert len(cycles) == 3
+
+    result = analyze_sequences(sequence, sequence, exercise_type_id=DEADLIFT.exercise_type_id)
+    comparison = result["comparison_result"]
+    assert comparison["summary"]["rep_count"] == 3
+    assert comparison["depth"]["message"] == "屈髋幅度良好"
+    assert result["overall_score"] == 100
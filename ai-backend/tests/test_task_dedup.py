@@ -0,0 +1,83 @@
+"""
+TaskDeduplicator 任务去重测试
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from datetime import datetime, timedelta
+
+from models.schemas import TaskStatus
+from services.task_dedup import TaskDeduplicator
+from test_task_worker import make_service, task_rows
+
+REQUEST = ("user", "r0", "v0", 1)
+
+
+def submit(dedup, service, key=None):
+    return asyncio.run(dedup.resolve(service, *REQUEST, key))
+
+
+def seed_task(service, status: str, completed_ago: float = 60) -> str:
+    async def create():
+        return await service.create_analysis_task(*REQUEST, status=TaskStatus(status))
+
+    task_id = asyncio.run(create())
+    if status == "completed":
+        task_rows(service)[task_id]["processing_completed_at"] = (
+            datetime.utcnow() - timedelta(seconds=completed_ago)
+        ).isoformat()
+        service.client.tables.setdefault("analysis_results", []).append({
+            "id": "result0",
+            "task_id": task_id,
+            "comparison_result": {"depth": {"status": "pass"}},
+            "skeleton_data": None,
+            "overall_score": 88,
+            "overall_grade": "B"
+        })
+    return task_id
+
+
+def test_in_flight_duplicate_attaches_to_existing_task():
+    service = make_service(0)
+    dedup = TaskDeduplicator()
+    assert submit(dedup, service) is None
+
+    task_id = seed_task(service, "processing")
+    reused = submit(dedup, service)
+    assert reused.task_id == task_id and reused.reason == "attached"
+    assert reused.status == TaskStatus.PROCESSING
+    assert len(task_rows(service)) == 1
+    assert dedup.stats()["dedup_rate"] == 0.5
+
+
+def test_completed_duplicate_clones_result_without_recompute():
+    service = make_service(0)
+    dedup = TaskDeduplicator(result_ttl=3600)
+    source_id = seed_task(service, "completed")
+
+    reused = submit(dedup, service, key="refresh-1")
+    assert reused.reason == "cloned" and reused.status == TaskStatus.COMPLETED
+    clone = task_rows(service)[reused.task_id]
+    assert reused.task_id != source_id
+    assert clone["status"] == "completed" and clone["idempotency_key"] == "refresh-1"
+    results = service.client.tables["analysis_results"]
+    assert [r["overall_score"] for r in results if r["task_id"] == reused.task_id] == [88]
+
+    # 同一幂等键再次提交 → 返回同一个任务，不再复制
+    again = submit(dedup, service, key="refresh-1")
+    assert again.task_id == reused.task_id and again.reason == "replayed"
+    assert dedup.stats()["cloned"] == 1 and dedup.stats()["replayed"] == 1
+
+
+def test_stale_or_failed_results_are_recomputed():
+    service = make_service(0)
+    seed_task(service, "completed", completed_ago=7200)
+    seed_task(service, "failed")
+    assert submit(TaskDeduplicator(result_ttl=3600), service) is None
+    # 复用期限为 0 时不复用已完成的结果
+    assert submit(TaskDeduplicator(result_ttl=0), service) is None
@@ -0,0 +1,148 @@
+"""
+任务进度推送测试
+
+TaskProgress 的帧进度汇总、工作进程侧的进度上报，以及 SSE 事件流
+（数据库使用 test_task_worker 中的替身客户端）
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+from datetime import datetime
+
+import routers.analyze as analyze
+import services.process_executor as process_executor
+from services.analysis_pipeline import FrameProgress
+from services.task_progress import TaskProgress
+from test_task_worker import make_service
+
+
+def parse_sse(chunks):
+    """把事件流拆成 [(event, data), ...]（忽略保活消息）"""
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            continue
+        name, data = chunk.strip().split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_frame_progress_is_summed_per_task():
+    progress = TaskProgress()
+    progress.publish(["t1", "t2"], "loading")
+    queue = progress.subscribe("t1")
+
+    # 批量任务: 参考视频属于两个任务，用户视频各自独立
+    progress.report_frames((("t1", "t2"), "reference"), 100, 300)
+    progress.report_frames((("t1",), "user"), 240, 600)
+
+    latest = progress.latest("t1")
+    assert latest["stage"] == "extracting"
+    assert (latest["frames_done"], latest["frames_total"]) == (340, 900)
+    assert latest["message"] == "已解码 340/900 帧"
+    assert 10 < latest["progress"] < 85
+    assert progress.latest("t2")["frames_total"] == 300
+    assert queue.qsize() == 2
+
+    # 进入分析阶段后迟到的帧进度被丢弃
+    progress.publish(["t1"], "analyzing")
+    progress.report_frames((("t1",), "user"), 600, 600)
+    assert progress.latest("t1")["stage"] == "analyzing"
+
+    progress.unsubscribe("t1", queue)
+    assert progress.stats()["subscribers"] == 0
+
+
+def test_frame_progress_reports_through_sink(monkeypatch):
+    reports = []
+    monkeypatch.setattr(process_executor, "_progress_sink", lambda *args: reports.append(args))
+    monkeypatch.setenv("ANALYSIS_PROGRESS_INTERVAL", "60")
+
+    on_frame = FrameProgress((("t1",), "user#1"), start_frame=300, end_frame=600)
+    for frame_index in range(300, 450, 2):
+        on_frame(frame_index, {"total_frames": 900})
+    on_frame.finish()
+
+    # 间隔内只上报第一帧，结束时补报最终进度（按分段范围计算）
+    assert reports == [
+        ((("t1",), "user#1"), 1, 300),
+        ((("t1",), "user#1"), 149, 149)
+    ]
+
+
+def test_event_stream_pushes_progress_then_result(monkeypatch):
+    service = make_service(1)
+    service.client.tables["analysis_results"] = [{
+        "task_id": "t0",
+        "comparison_result": {
+            dimension: {"status": "pass", "message": "ok", "suggestion": ""}
+            for dimension in ("depth", "knee_tracking", "torso_lean", "balance")
+        },
+        "overall_score": 90,
+        "overall_grade": "excellent",
+        "created_at": datetime.utcnow().isoformat()
+    }]
+    progress = TaskProgress()
+    monkeypatch.setattr(analyze, "get_supabase_service", lambda: service)
+    monkeypatch.setattr(analyze, "get_task_progress", lambda: progress)
+
+    async def scenario():
+        progress.bind(asyncio.get_running_loop())
+        task = await service.get_analysis_task("t0")
+        chunks = []
+
+        async def consume():
+            async for chunk in analyze.task_event_stream(task):
+                chunks.append(chunk)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        progress.publish(["t0"], "loading")
+        await asyncio.sleep(0.01)
+        # 进度通道在其他线程中调用
+        await asyncio.to_thread(progress.report_frames, (("t0",), "user"), 340, 900)
+        await asyncio.sleep(0.01)
+        progress.publish(["t0"], "completed", overall_score=90)
+        await asyncio.wait_for(consumer, timeout=2)
+        return chunks
+
+    events = parse_sse(asyncio.run(scenario()))
+    assert [name for name, _ in events] == ["progress"] * 4 + ["result"]
+    assert [data["stage"] for _, data in events[:4]] == [
+        "queued", "loading", "extracting", "completed"
+    ]
+    assert events[2][1]["message"] == "已解码 340/900 帧"
+    assert events[-1][1]["overall_score"] == 90
+    assert progress.stats()["subscribers"] == 0
+
+
+def test_event_stream_falls_back_to_task_status(monkeypatch):
+    # 本进程没有该任务的进度（如由独立 Worker 处理）: 按间隔读取任务记录
+    service = make_service(1)
+    progress = TaskProgress()
+    monkeypatch.setattr(analyze, "get_supabase_service", lambda: service)
+    monkeypatch.setattr(analyze, "get_task_progress", lambda: progress)
+    monkeypatch.setenv("ANALYSIS_PROGRESS_POLL_SECONDS", "0.01")
+
+    async def scenario():
+        row = service.client.tables["analysis_tasks"][0]
+        task = await service.get_analysis_task("t0")
+        chunks = []
+        async for chunk in analyze.task_event_stream(task):
+            chunks.append(chunk)
+            if len(chunks) == 3:
+                row.update(status="failed", error_message="视频下载失败")
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert chunks[1:3] == [": keepalive\n\n"] * 2
+    assert parse_sse(chunks) == [
+        ("progress", {"task_id": "t0", "stage": "queued", "message": "排队等待处理", "progress": 0}),
+        ("failed", {"task_id": "t0", "error_message": "视频下载失败"})
+    ]
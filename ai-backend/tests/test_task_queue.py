@@ -0,0 +1,73 @@
+"""
+TaskQueue 持久化任务队列测试
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.task_queue import TaskQueue
+
+
+def test_claim_complete_and_survive_reopen(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = TaskQueue(path)
+    first = queue.enqueue("analysis", {"task_id": "a"})
+    queue.enqueue("analysis", {"task_id": "b"})
+
+    job = queue.claim("host:1")
+    assert job.id == first and job.payload == {"task_id": "a"} and job.attempts == 1
+    assert queue.complete(job.id, "host:1")
+
+    # 重新打开文件（模拟进程重启）: 已完成的任务不再被领取
+    reopened = TaskQueue(path)
+    job = reopened.claim("host:2")
+    assert job.payload == {"task_id": "b"}
+    assert reopened.claim("host:2") is None
+    assert reopened.counts() == {"pending": 0, "processing": 1, "done": 1, "dead": 0}
+
+
+def test_fail_retries_with_backoff_then_dead(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2, backoff_base=0)
+    queue.enqueue("analysis", {"task_id": "a"})
+
+    job = queue.claim("w")
+    assert not job.final
+    assert queue.fail(job.id, "w", "boom")
+
+    job = queue.claim("w")
+    assert job.attempts == 2 and job.final
+    assert not queue.fail(job.id, "w", "boom")
+    assert queue.claim("w") is None
+    assert queue.counts()["dead"] == 1
+
+    # 退避时间未到的任务不可领取
+    delayed = TaskQueue(str(tmp_path / "delayed.sqlite3"), backoff_base=60)
+    delayed.enqueue("analysis", {})
+    job = delayed.claim("w")
+    assert delayed.fail(job.id, "w", "boom")
+    assert delayed.claim("w") is None
+    assert delayed.backoff(1) == 60 and delayed.backoff(2) == 120
+
+
+def test_expired_lease_is_reaped_and_stale_owner_loses_it(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2, backoff_base=0)
+    queue.enqueue("analysis", {"task_id": "a"})
+
+    job = queue.claim("crashed")
+    assert queue.heartbeat(job.id, "crashed")
+    # 持有者失联: 租约到期后被回收并重新排队
+    assert queue.release(["crashed"]) == 1
+    assert queue.reap() == []
+    assert not queue.heartbeat(job.id, "crashed")
+    assert not queue.complete(job.id, "crashed")
+
+    job = queue.claim("alive")
+    assert job.attempts == 2
+    # 次数用完后租约再次到期 → dead，返回给调用方标记业务记录失败
+    queue.release(["alive"])
+    dead = queue.reap()
+    assert [j.payload for j in dead] == [{"task_id": "a"}]
+    assert queue.counts()["dead"] == 1
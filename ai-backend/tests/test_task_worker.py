@@ -0,0 +1,238 @@
+"""
+TaskWorker 任务领取测试
+
+用内存中的替身数据库（模拟 supabase 客户端的查询接口）运行多个 Worker
+"""
+
+import sys
+import os
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import copy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from services.supabase_service import SupabaseService
+from services.task_worker import TaskWorker
+
+
+class FakeQuery:
+    """supabase 查询构造器替身: 支持 select / update / insert 与常用过滤条件"""
+
+    def __init__(self, rows, action="select", data=None, count=None):
+        self.rows = rows
+        self.action = action
+        self.data = data
+        self.count = count
+        self.filters = []
+        self.order_by = None
+        self.max_rows = None
+
+    def select(self, *columns, count=None):
+        return FakeQuery(self.rows, "select", count=count)
+
+    def update(self, data):
+        return FakeQuery(self.rows, "update", data=data)
+
+    def insert(self, data):
+        return FakeQuery(self.rows, "insert", data=data)
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        # SQL 语义: NULL 不满足比较条件
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def execute(self):
+        if self.action == "insert":
+            row = {
+                "id": f"row{len(self.rows)}",
+                "created_at": datetime.utcnow().isoformat(),
+                **self.data
+            }
+            self.rows.append(row)
+            return SimpleNamespace(data=[dict(row)], count=None)
+        matched = [row for row in self.rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.data)
+            return SimpleNamespace(data=copy.deepcopy(matched), count=None)
+        if self.order_by:
+            column, desc = self.order_by
+            matched.sort(key=lambda row: row[column], reverse=desc)
+        if self.max_rows is not None:
+            matched = matched[:self.max_rows]
+        return SimpleNamespace(data=copy.deepcopy(matched), count=len(matched))
+
+
+class FakeClient:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return FakeQuery(self.tables.setdefault(name, []))
+
+
+def make_service(n_tasks: int, references=("r1",)) -> SupabaseService:
+    service = SupabaseService.__new__(SupabaseService)
+    service.client = FakeClient()
+    created = datetime.utcnow() - timedelta(minutes=1)
+    rows = service.client.tables.setdefault("analysis_tasks", [])
+    for i in range(n_tasks):
+        rows.append({
+            "id": f"t{i}",
+            "reference_video_id": references[i % len(references)],
+            "user_video_id": f"v{i}",
+            "exercise_type_id": 1,
+            "status": "pending",
+            "attempts": 0,
+            "available_at": created.isoformat(),
+            "created_at": (created + timedelta(seconds=i)).isoformat(),
+            "lease_owner": None,
+            "lease_expires_at": None
+        })
+    return service
+
+
+def task_rows(service: SupabaseService):
+    return {row["id"]: row for row in service.client.tables["analysis_tasks"]}
+
+
+async def run_workers(workers, until, timeout: float = 3.0):
+    stop = asyncio.Event()
+    runs = [asyncio.create_task(worker.run(stop)) for worker in workers]
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not until():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+    stop.set()
+    await asyncio.gather(*runs)
+
+
+def test_conditional_claim_hands_each_task_to_one_worker():
+    async def scenario():
+        service = make_service(1)
+        first = await service.claim_analysis_tasks("a", 60)
+        second = await service.claim_analysis_tasks("b", 60)
+        return service, first, second
+
+    service, first, second = asyncio.run(scenario())
+    assert [task["id"] for task in first] == ["t0"] and second == []
+    row = task_rows(service)["t0"]
+    assert row["status"] == "processing" and row["lease_owner"] == "a" and row["attempts"] == 1
+
+
+def test_workers_process_every_task_exactly_once_and_batch_by_reference():
+    processed = []
+    batches = []
+
+    async def run_task(task_id):
+        await asyncio.sleep(0.01)
+        processed.append(task_id)
+        task_rows(service)[task_id]["status"] = "completed"
+
+    async def run_batch(reference_video_id, submissions, exercise_type_id):
+        await asyncio.sleep(0.01)
+        batches.append(len(submissions))
+        for task_id, _ in submissions:
+            # 合并的任务都属于同一参考视频
+            assert task_rows(service)[task_id]["reference_video_id"] == reference_video_id
+            processed.append(task_id)
+            task_rows(service)[task_id]["status"] = "completed"
+
+    service = make_service(9, references=("r1", "r2", "r3"))
+    workers = [
+        TaskWorker(service, run_task, run_batch, concurrency=2, batch_size=2,
+                   poll_interval=0.01, owner=f"worker-{i}")
+        for i in range(3)
+    ]
+    asyncio.run(run_workers(workers, lambda: len(processed) == 9))
+
+    assert sorted(processed) == sorted(task_rows(service))
+    assert batches and all(size == 2 for size in batches)
+    assert all(row["attempts"] == 1 for row in task_rows(service).values())
+
+
+def test_failed_task_is_retried_then_marked_failed():
+    attempts = []
+
+    async def run_task(task_id):
+        attempts.append(task_id)
+        raise Exception("视频下载失败")
+
+    service = make_service(1)
+    worker = TaskWorker(service, run_task, None, max_attempts=2, backoff_base=0,
+                        batch_size=1, poll_interval=0.01, owner="w")
+    asyncio.run(run_workers([worker], lambda: task_rows(service)["t0"]["status"] == "failed"))
+
+    row = task_rows(service)["t0"]
+    assert attempts == ["t0", "t0"]
+    assert row["error_message"] == "视频下载失败" and row["lease_owner"] is None
+    assert worker.stats()["retried"] == 1 and worker.stats()["failed"] == 1
+
+
+def test_expired_lease_is_reclaimed_by_another_worker():
+    async def scenario():
+        service = make_service(1)
+        # Worker a 领取后失联，租约过期
+        await service.claim_analysis_tasks("a", -1)
+        reclaimed = await service.claim_analysis_tasks("b", 60, max_attempts=3)
+        # a 恢复后不能再释放或续约已被接手的任务
+        released = await service.release_task_lease("t0", "a", "late")
+        extended = await service.extend_task_leases(["t0"], "a", 60)
+        return service, reclaimed, released, extended
+
+    service, reclaimed, released, extended = asyncio.run(scenario())
+    assert [task["id"] for task in reclaimed] == ["t0"]
+    assert not released and extended == 0
+    row = task_rows(service)["t0"]
+    assert row["lease_owner"] == "b" and row["attempts"] == 2
+
+    async def exhausted():
+        service = make_service(1)
+        await service.claim_analysis_tasks("a", -1)
+        claimed = await service.claim_analysis_tasks("b", 60, max_attempts=1)
+        return service, claimed
+
+    service, claimed = asyncio.run(exhausted())
+    assert claimed == [] and task_rows(service)["t0"]["status"] == "failed"
+
+
+def test_stopping_worker_releases_in_flight_task():
+    async def scenario():
+        service = make_service(1)
+        running = asyncio.Event()
+
+        async def run_task(task_id):
+            running.set()
+            await asyncio.sleep(60)
+
+        worker = TaskWorker(service, run_task, None, batch_size=1, poll_interval=0.01, owner="w")
+        stop = asyncio.Event()
+        run = asyncio.create_task(worker.run(stop))
+        await asyncio.wait_for(running.wait(), timeout=2)
+        stop.set()
+        await run
+        return service
+
+    service = asyncio.run(scenario())
+    row = task_rows(service)["t0"]
+    assert row["status"] == "pending" and row["lease_owner"] is None
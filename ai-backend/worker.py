@@ -0,0 +1,60 @@
+"""
+AI 动作分析 Worker - 独立进程入口
+对应: 横向扩展（一个 API 节点 + N 个 Worker 节点）
+
+功能:
+- 不启动 HTTP 服务，只从 analysis_tasks 领取 pending 任务并运行分析流水线
+- 多个 Worker 节点可同时运行，任务通过数据库租约分配
+- API 节点设置 ANALYSIS_DISPATCH=workers 后只创建任务记录，不在本进程处理
+
+用法:
+    python worker.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+from dotenv import load_dotenv
+
+# 加载环境变量（执行引擎、数据库服务等单例在首次使用时读取）
+load_dotenv()
+
+from routers.analyze import process_analysis_task, process_batch_task
+from services.process_executor import get_analysis_executor
+from services.supabase_service import get_supabase_service
+from services.task_worker import TaskWorker
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """启动执行引擎和 Worker，收到 SIGTERM / SIGINT 时释放租约后退出"""
+    executor = get_analysis_executor()
+    await asyncio.to_thread(executor.start)
+    
+    worker = TaskWorker(
+        get_supabase_service(),
+        run_task=process_analysis_task,
+        run_batch=process_batch_task,
+        concurrency=int(os.getenv("ANALYSIS_MAX_CONCURRENCY", 1)),
+        lease_seconds=float(os.getenv("ANALYSIS_VISIBILITY_TIMEOUT", 300)),
+        max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", 3)),
+        batch_size=int(os.getenv("ANALYSIS_WORKER_BATCH_SIZE", 8)),
+        backoff_base=float(os.getenv("ANALYSIS_RETRY_BACKOFF", 5))
+    )
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    
+    try:
+        await worker.run(stop)
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -4,7 +4,7 @@ import { useEffect, useState } from 'react';
 import { useRouter, useParams } from 'next/navigation';
 import { Card, CardContent } from '@/components/ui/card';
 import { Loader2, CheckCircle2 } from 'lucide-react';
-import { getTaskStatus } from '@/lib/ai-api-client';
+import { getTaskStatus, subscribeTaskEvents } from '@/lib/ai-api-client';
 
 /**
  * 分析处理中页面 - 完整集成版
@@ -17,9 +17,59 @@ export default function ProcessingPage() {
 
     const [status, setStatus] = useState<'pending' | 'processing' | 'completed' | 'failed'>('pending');
     const [progress, setProgress] = useState(0);
+    const [progressMessage, setProgressMessage] = useState('');
     const [errorMessage, setErrorMessage] = useState('');
+    const [streamFailed, setStreamFailed] = useState(false);
 
     useEffect(() => {
+        // 订阅进度推送；连接不上（如后端不支持）时改为轮询
+        if (streamFailed) {
+            return;
+        }
+
+        let received = false;
+        const unsubscribe = subscribeTaskEvents(taskId, {
+            onProgress: (event) => {
+                received = true;
+                setStatus(event.stage === 'queued' ? 'pending' : 'processing');
+                setProgress(event.progress);
+                setProgressMessage(event.message);
+            },
+            onResult: () => {
+                setProgress(100);
+                setStatus('completed');
+            },
+            onFailed: (message) => {
+                setProgress(0);
+                setErrorMessage(message || '分析失败');
+                setStatus('failed');
+            },
+            onError: () => {
+                // 已收到过事件时由 EventSource 自动重连
+                if (!received) {
+                    unsubscribe();
+                    setStreamFailed(true);
+                }
+            },
+        });
+
+        return unsubscribe;
+    }, [taskId, streamFailed]);
+
+    useEffect(() => {
+        if (status === 'completed') {
+            const timer = setTimeout(() => {
+                router.push(`/analysis/results/${taskId}`);
+            }, 1000);
+            return () => clearTimeout(timer);
+        }
+    }, [taskId, status, router]);
+
+    useEffect(() => {
+        if (!streamFailed || status === 'completed' || status === 'failed') {
+            return;
+        }
+
         // 轮询任务状态
         const pollInterval = setInterval(async () => {
             try {
@@ -30,9 +80,9 @@ export default function ProcessingPage() {
 
                     // 根据状态设置进度
                     if (taskStatus.status === 'pending') {
-                        setProgress(20);
+                        setProgress(10);
                     } else if (taskStatus.status === 'processing') {
-                        setProgress(60);
+                        setProgress(85);
                     } else if (taskStatus.status === 'completed') {
                         setProgress(100);
                     } else if (taskStatus.status === 'failed') {
@@ -45,27 +95,15 @@ export default function ProcessingPage() {
             }
         }, 2000); // 每2秒轮询一次
 
-        // 状态为 completed 时跳转到结果页
-        if (status === 'completed') {
-            clearInterval(pollInterval);
-            setTimeout(() => {
-                router.push(`/analysis/results/${taskId}`);
-            }, 1000);
-        }
-
-        // 失败时停止轮询
-        if (status === 'failed') {
-            clearInterval(pollInterval);
-        }
-
         return () => clearInterval(pollInterval);
-    }, [taskId, status, router]);
+    }, [taskId, status, streamFailed]);
 
+    // 进度推送: 姿态识别 10-85，对比分析 85，生成报告 95
     const steps = [
         { label: '视频上传完成', completed: true },
-        { label: '姿态识别中', completed: progress > 30 },
-        { label: '动作对比分析', completed: progress > 60 },
-        { label: '生成分析报告', completed: progress > 90 },
+        { label: '姿态识别中', completed: progress >= 85 },
+        { label: '动作对比分析', completed: progress >= 95 },
+        { label: '生成分析报告', completed: progress >= 100 },
     ];
 
     if (status === 'failed') {
@@ -111,7 +149,7 @@ export default function ProcessingPage() {
                             <p className="text-muted-foreground">
                                 {status === 'completed'
                                     ? '即将跳转到结果页面...'
-                                    : '预计需要 10-30 秒，请稍候'}
+                                    : progressMessage || '预计需要 10-30 秒，请稍候'}
                             </p>
                         </div>
 
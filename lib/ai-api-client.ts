@@ -10,6 +10,24 @@ export interface AnalysisRequest {
     reference_video_id: string;
     user_video_id: string;
     exercise_type_id: number;
+    idempotency_key?: string; // 重复提交相同的键时返回已创建的任务
+}
+
+export interface BatchAnalysisRequest {
+    user_id: string;
+    reference_video_id: string;
+    user_video_ids: string[];
+    exercise_type_id: number;
+}
+
+export interface BatchAnalysisResponse {
+    reference_video_id: string;
+    submissions: {
+        user_video_id: string;
+        task_id: string;
+        status: string;
+    }[];
+    message: string;
 }
 
 export interface TaskStatusResponse {
@@ -32,6 +50,45 @@ export interface ComparisonDimension {
     suggestion: string;
 }
 
+export interface RepResult {
+    rep: number;
+    start_frame: number;
+    bottom_frame: number;
+    end_frame: number;
+    depth: ComparisonDimension;
+    knee_tracking: ComparisonDimension;
+    torso_lean: ComparisonDimension;
+    balance: ComparisonDimension;
+    score: number;
+}
+
+export interface RepSummary {
+    rep_count: number;
+    best_rep: number;
+    worst_rep: number;
+    fatigue_trend: {
+        score_slope: number;
+        depth_slope: number;
+        status: 'stable' | 'declining';
+    };
+}
+
+export interface PhaseDeviation {
+    phase: 'descent' | 'bottom' | 'ascent';
+    reference_frames: number;
+    user_frames: number;
+    tempo_ratio: number;
+    deviations: Record<string, number>;
+    statuses: Record<string, 'pass' | 'warn' | 'fail'>;
+    pass_rate: Record<string, number>;
+}
+
+export interface TrajectoryComparison {
+    alignment_cost: number;
+    tempo_ratio: number;
+    phases: PhaseDeviation[];
+}
+
 export interface AnalysisResultResponse {
     task_id: string;
     comparison_result: {
@@ -39,6 +96,9 @@ export interface AnalysisResultResponse {
         knee_tracking: ComparisonDimension;
         torso_lean: ComparisonDimension;
         balance: ComparisonDimension;
+        reps?: RepResult[];
+        summary?: RepSummary;
+        trajectory?: TrajectoryComparison;
     };
     skeleton_data?: any;
     overall_score?: number;
@@ -73,6 +133,33 @@ export async function submitAnalysis(
     }
 }
 
+/**
+ * 批量提交分析任务（一个参考视频对多个用户视频，每个提交对应一个独立任务）
+ */
+export async function submitBatchAnalysis(
+    request: BatchAnalysisRequest
+): Promise<BatchAnalysisResponse | null> {
+    try {
+        const response = await fetch(`${AI_BACKEND_URL}/api/analyze/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(request),
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        const data = await response.json();
+        return data;
+    } catch (error) {
+        console.error('Submit batch analysis failed:', error);
+        return null;
+    }
+}
+
 /**
  * 查询任务状态
  */
@@ -94,6 +181,65 @@ export async function getTaskStatus(
     }
 }
 
+export type TaskStage =
+    | 'queued'
+    | 'loading'
+    | 'extracting'
+    | 'analyzing'
+    | 'saving'
+    | 'completed'
+    | 'failed';
+
+export interface TaskProgressEvent {
+    task_id: string;
+    stage: TaskStage;
+    message: string;
+    progress: number;  // 0-100
+    frames_done?: number;  // 仅 extracting 阶段
+    frames_total?: number;
+    error_message?: string;
+}
+
+export interface TaskEventHandlers {
+    onProgress?: (event: TaskProgressEvent) => void;
+    onResult?: (result: AnalysisResultResponse) => void;
+    onFailed?: (errorMessage: string) => void;
+    // 连接无法建立或中断（EventSource 会自动重连；调用方可改为轮询 getTaskStatus）
+    onError?: (error: Event) => void;
+}
+
+/**
+ * 订阅任务进度（Server-Sent Events），代替轮询 getTaskStatus
+ *
+ * 收到 result / failed 事件后自动关闭连接
+ *
+ * @returns 取消订阅的函数
+ */
+export function subscribeTaskEvents(
+    taskId: string,
+    handlers: TaskEventHandlers
+): () => void {
+    const source = new EventSource(`${AI_BACKEND_URL}/api/tasks/${taskId}/events`);
+
+    source.addEventListener('progress', (event) => {
+        handlers.onProgress?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('result', (event) => {
+        source.close();
+        handlers.onResult?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('failed', (event) => {
+        source.close();
+        handlers.onFailed?.(JSON.parse((event as MessageEvent).data).error_message);
+    });
+    source.onerror = (error) => {
+        console.error('Task event stream error:', error);
+        handlers.onError?.(error);
+    };
+
+    return () => source.close();
+}
+
 /**
  * 获取分析结果
  */
@@ -115,6 +261,30 @@ export async function getAnalysisResult(
     }
 }
 
+/**
+ * 预处理参考视频（参考视频上传后调用一次）
+ */
+export async function prepareReferenceVideo(
+    videoId: string
+): Promise<{ video_id: string; status: string; features_path?: string } | null> {
+    try {
+        const response = await fetch(
+            `${AI_BACKEND_URL}/api/references/${videoId}/prepare`,
+            { method: 'POST' }
+        );
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        const data = await response.json();
+        return data;
+    } catch (error) {
+        console.error('Prepare reference video failed:', error);
+        return null;
+    }
+}
+
 /**
  * 健康检查
  */
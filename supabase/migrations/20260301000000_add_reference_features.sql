@@ -0,0 +1,14 @@
+-- ========================================
+-- 参考视频预处理产物
+-- ========================================
+-- 目标: 参考视频上传后预先完成姿态提取、动作切分和逐帧特征计算，
+--       分析任务只需处理用户视频
+-- 产物以 .npz 文件存放在 analysis-videos bucket 中参考视频旁边，
+-- 此处仅记录其路径
+
+alter table video_uploads
+  add column if not exists features_path text,              -- 预处理产物的 Storage 路径
+  add column if not exists features_prepared_at timestamptz; -- 预处理完成时间
+
+comment on column video_uploads.features_path is '参考视频预处理产物（关键点 + 动作周期 + 逐帧特征）的 Storage 路径';
+comment on column video_uploads.features_prepared_at is '参考视频预处理完成时间';
@@ -0,0 +1,29 @@
+-- ========================================
+-- 新增动作类型: 弓步蹲 (Lunge)、硬拉 (Deadlift)
+-- ========================================
+-- 目标: 与 AI 后端动作注册表 (services/exercise_registry.py) 中的定义对应，
+--       id 需与注册表中的 exercise_type_id 一致
+
+insert into exercise_types (id, name, display_name, description, enabled)
+values
+  (
+    2,
+    'lunge',
+    jsonb_build_object('en', 'Lunge', 'zh', '弓步蹲', 'ja', 'ランジ'),
+    'Forward lunge - single-leg lower body movement',
+    true
+  ),
+  (
+    3,
+    'deadlift',
+    jsonb_build_object('en', 'Deadlift', 'zh', '硬拉', 'ja', 'デッドリフト'),
+    'Conventional deadlift - hip hinge movement',
+    true
+  )
+on conflict (name) do nothing;
+
+-- 显式指定 id 后同步序列，避免后续插入冲突
+select setval(
+  pg_get_serial_sequence('exercise_types', 'id'),
+  greatest((select max(id) from exercise_types), 1)
+);
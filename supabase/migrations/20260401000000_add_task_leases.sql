@@ -0,0 +1,23 @@
+-- ========================================
+-- 分析任务租约（独立 Worker 横向扩展）
+-- ========================================
+-- 目标: API 节点只创建 pending 任务，多个 Worker 节点从 analysis_tasks 领取并处理
+-- 领取方式: 条件更新（status 与 attempts 与读取时一致才生效），同一任务只会被一个 Worker 领取
+-- Worker 处理期间定期延长租约；租约过期（Worker 失联）的任务可被其他 Worker 重新领取
+
+alter table analysis_tasks
+  add column if not exists lease_owner text,                    -- 持有租约的 Worker
+  add column if not exists lease_expires_at timestamptz,        -- 租约到期时间
+  add column if not exists attempts int not null default 0,     -- 已领取次数
+  add column if not exists available_at timestamptz default now(); -- 最早可领取时间（失败重试时推后）
+
+-- 领取查询: status + available_at / lease_expires_at，按创建时间排序
+create index if not exists analysis_tasks_claim_idx
+  on analysis_tasks(status, available_at, created_at);
+create index if not exists analysis_tasks_lease_idx
+  on analysis_tasks(status, lease_expires_at);
+
+comment on column analysis_tasks.lease_owner is '正在处理该任务的 Worker 标识（主机名:进程号）';
+comment on column analysis_tasks.lease_expires_at is '租约到期时间，过期后任务可被其他 Worker 重新领取';
+comment on column analysis_tasks.attempts is '任务被领取的次数，达到上限后不再重试';
+comment on column analysis_tasks.available_at is '任务最早可被领取的时间，失败重试时按退避时间推后';
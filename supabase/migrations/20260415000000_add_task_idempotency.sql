@@ -0,0 +1,19 @@
+-- ========================================
+-- 分析任务幂等提交与去重
+-- ========================================
+-- 目标: 页面刷新等重复提交不再重新分析
+-- - idempotency_key: 同一用户内唯一，重复提交相同的键返回第一次创建的任务
+-- - 相同 (参考视频, 用户视频, 动作类型) 的任务在处理中或已完成时直接复用
+
+alter table analysis_tasks
+  add column if not exists idempotency_key text;  -- 客户端提供的幂等键
+
+create unique index if not exists analysis_tasks_idempotency_idx
+  on analysis_tasks(user_id, idempotency_key)
+  where idempotency_key is not null;
+
+-- 查找相同任务: 按用户 + 视频组合取最近的任务
+create index if not exists analysis_tasks_dedup_idx
+  on analysis_tasks(user_id, reference_video_id, user_video_id, exercise_type_id, created_at desc);
+
+comment on column analysis_tasks.idempotency_key is '客户端提供的幂等键，同一用户内唯一';